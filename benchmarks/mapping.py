@@ -0,0 +1,114 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from imageanalysis.mapping import createDetectorQBasis, mapScan
+from imageanalysis.structures import Project
+
+
+# Sample project in the repository
+SAMPLE_PROJECT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "sample_project"
+)
+SAMPLE_FILES = {
+    "spec": "pmn_pt011_2_1.spec",
+    "instrument": "6IDB_Instrument.xml",
+    "detector": "6IDB_DetectorGeometry.xml"
+}
+
+
+def getMappingTimes(scan, n_points: int, repeat: int=3) -> list:
+    """Returns (backend, seconds, largest HKL difference) for each backend.
+
+    - Differences are from the xrayutilities RSM of the same points
+    - Times are the fastest of repeated runs, and include reading the
+      instrument and detector configs
+    """
+
+    project = scan.project
+    points = range(min(n_points, scan.n_pts))
+
+    def run(**kwargs):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rsm = mapScan(
+                spec_scan=scan.spec_scan,
+                instrument_path=project.instrument_path,
+                detector_path=project.detector_path,
+                points=points,
+                **kwargs
+            )
+            times.append(time.perf_counter() - start)
+        return min(times), rsm
+
+    results = []
+    xu_time, expected = run()
+    results.append(("xrayutilities", xu_time, 0.0))
+
+    start = time.perf_counter()
+    createDetectorQBasis(project.instrument_path, project.detector_path)
+    basis_time = time.perf_counter() - start
+    results.append(("NumPy basis setup", basis_time, np.nan))
+
+    for dtype in [np.float64, np.float32]:
+        basis = createDetectorQBasis(
+            project.instrument_path, project.detector_path, dtype=dtype
+        )
+        numpy_time, rsm = run(basis=basis)
+        results.append((
+            f"NumPy ({np.dtype(dtype).name})",
+            numpy_time,
+            float(np.amax(np.abs(rsm - expected)))
+        ))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compares RSM mapping with xrayutilities and NumPy."
+    )
+    parser.add_argument("-p", "--project", default=SAMPLE_PROJECT_PATH,
+        help="project directory, the sample project by default")
+    for name, path in SAMPLE_FILES.items():
+        parser.add_argument(f"--{name}", default=path,
+            help=f"{name} file in the project directory")
+    parser.add_argument("-s", "--scan", type=int, default=None,
+        help="scan number, the project's first scan by default")
+    parser.add_argument("-n", "--points", type=int, default=100,
+        help="number of scan points to map")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+        help="number of runs of each backend")
+    args = parser.parse_args()
+
+    project = Project(
+        args.project,
+        os.path.join(args.project, args.spec),
+        os.path.join(args.project, args.instrument),
+        os.path.join(args.project, args.detector)
+    )
+    scan_number = args.scan or list(project.scans.keys())[0]
+    scan = project.scans[scan_number]
+
+    print(f"Scan {scan.number}, {min(args.points, scan.n_pts)} points")
+    results = getMappingTimes(scan, args.points, args.repeat)
+    xu_time = results[0][1]
+    for backend, seconds, difference in results:
+        line = f"{backend:>20}: {seconds:8.3f} s"
+        if not np.isnan(difference) and backend != "xrayutilities":
+            line += f"  {xu_time / seconds:6.1f}x  max |dHKL| {difference:.2e}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+# Runs in a fresh interpreter, so nothing is imported beforehand
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from PyQt5 import QtWidgets
+from imageanalysis.ui.main_window import MainWindow
+imported = time.perf_counter()
+app = QtWidgets.QApplication([])
+window = MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print(f"{imported - start} {shown - start}")
+"""
+
+# Modules that should only be imported when first used
+DEFERRED_MODULES = [
+    "PIL", "rsMap3D", "sklearn", "spec2nexus", "tifffile", "vtk",
+    "xrayutilities"
+]
+
+
+def getImportTimes(module: str="imageanalysis.ui.main_window") -> list:
+    """Returns (module, self seconds, cumulative seconds) for every import.
+
+    - Times come from python -X importtime in a fresh interpreter
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue # Header line
+        times.append((fields[2].strip(), self_us / 1e6, cumulative_us / 1e6))
+
+    return times
+
+
+def getStartupTimes() -> tuple:
+    """Returns seconds until imports finish and the main window is shown."""
+
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=environment
+    )
+    imported, shown = result.stdout.split()[-2:]
+
+    return float(imported), float(shown)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measures application startup and import costs."
+    )
+    parser.add_argument("-n", "--top", type=int, default=15,
+        help="number of slowest imports to list")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+        help="number of startup runs")
+    args = parser.parse_args()
+
+    runs = [getStartupTimes() for _ in range(args.repeat)]
+    imported, shown = min(runs, key=lambda run: run[1])
+    print(f"Imports finished: {imported:.3f} s")
+    print(f"Main window shown: {shown:.3f} s")
+
+    times = getImportTimes()
+    print("\nSlowest imports (cumulative):")
+    for name, self_time, cumulative in sorted(
+        times, key=lambda t: t[2], reverse=True
+    )[:args.top]:
+        print(f"{cumulative:8.3f} s {self_time:8.3f} s  {name}")
+
+    imported_modules = {name.split(".")[0] for name, _, _ in times}
+    deferred = [m for m in DEFERRED_MODULES if m in imported_modules]
+    if deferred:
+        print(f"\nImported at startup but should be deferred: {deferred}")
+
+
+if __name__ == "__main__":
+    main()
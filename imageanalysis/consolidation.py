@@ -0,0 +1,196 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import os
+
+import numpy as np
+
+from imageanalysis.io import readFrame
+
+# h5py is imported by the functions that use it, to keep startup fast
+
+
+# Target size of one chunk of consolidated frames
+CHUNK_BYTES = 2 ** 20
+# Largest number of frames in one chunk
+MAX_CHUNK_FRAMES = 16
+# Chunk cache of an open file, enough for every chunk across a frame
+CHUNK_CACHE_BYTES = 2 ** 26
+
+
+class ConsolidatedScan:
+    """Frames of a scan consolidated into one chunked, compressed HDF5 file.
+
+    - "frames" holds raw frames indexed as (point, x, y)
+    - "normalization" holds the factor each frame is scaled by
+    - "spec" holds the scan's SPEC section and data columns
+    - Chunks span a few frames and a square tile of pixels, so reading a
+      frame or the values of a pixel over the scan both decompress a small
+      part of the file
+    """
+
+    def __init__(self, path: str) -> None:
+
+        import h5py
+
+        self.path = path
+        self.file = h5py.File(path, "r", rdcc_nbytes=CHUNK_CACHE_BYTES)
+        self.frames = self.file["frames"]
+        self.normalization = self.file["normalization"][()]
+        self.n_frames = self.frames.shape[0]
+        self.frame_shape = self.frames.shape[1:]
+
+    def __enter__(self) -> "ConsolidatedScan":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the file."""
+
+        self.file.close()
+
+    def getFrame(self, point: int) -> np.ndarray:
+        """Returns a normalized frame."""
+
+        return self.frames[point] * self.normalization[point]
+
+    def getPixel(self, x: int, y: int) -> np.ndarray:
+        """Returns the normalized values of a pixel at every point."""
+
+        return self.frames[:, x, y] * self.normalization
+
+    def getBlocks(self):
+        """Yields (start point, normalized frames) one chunk row at a time."""
+
+        n_rows = self.frames.chunks[0] if self.frames.chunks else 1
+        for start in range(0, self.n_frames, n_rows):
+            block = self.frames[start:start + n_rows]
+            yield start, block * self.normalization[
+                start:start + n_rows, np.newaxis, np.newaxis
+            ]
+
+
+def getConsolidatedPath(image_path: str) -> str:
+    """Returns the consolidated file path of a scan image directory."""
+
+    return f"{image_path.rstrip('/')}.h5"
+
+
+def openConsolidatedScan(image_path: str, n_pts: int) -> ConsolidatedScan:
+    """Opens a scan's consolidated file, if it is usable.
+
+    - Returns None if the file is missing, h5py is not installed, or the
+      file does not have a frame for every point
+    """
+
+    path = getConsolidatedPath(image_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        consolidated = ConsolidatedScan(path)
+    except (ImportError, OSError, KeyError):
+        return None
+
+    if consolidated.n_frames != n_pts:
+        consolidated.close()
+        return None
+
+    return consolidated
+
+
+def getChunkShape(
+    shape: tuple,
+    itemsize: int,
+    chunk_bytes: int=CHUNK_BYTES,
+    max_frames: int=MAX_CHUNK_FRAMES
+) -> tuple:
+    """Returns a chunk shape for frames indexed as (point, x, y).
+
+    - A few frames per chunk keeps single frame reads cheap
+    - The rest of the chunk is a square tile of pixels, so a pixel's values
+      over the scan span one chunk per few frames
+    """
+
+    n_frames = max(1, min(shape[0], max_frames))
+    side = int(np.sqrt(chunk_bytes / (itemsize * n_frames)))
+    side = max(1, side)
+
+    return (n_frames, min(shape[1], side), min(shape[2], side))
+
+
+def consolidateScan(
+    scan,
+    path: str=None,
+    compression: str="gzip",
+    compression_level: int=4
+) -> str:
+    """Writes a scan's frames, normalization, and SPEC data to HDF5.
+
+    - Frames are stored as read, in their detector data type
+    - Frames are written a chunk row at a time, and the file only replaces
+      an existing one once it is complete
+    - The partial file is removed if reading or writing fails
+    - Returns the path of the file
+    """
+
+    import h5py
+
+    if path is None:
+        path = getConsolidatedPath(scan.image_path)
+    tmp_path = f"{path}.tmp"
+
+    missing_points = scan.frame_index.getMissingPoints(scan.n_pts)
+    if len(missing_points) > 0:
+        raise FileNotFoundError(
+            f"Frames for points {missing_points} not found in "
+            f"'{scan.image_path}'."
+        )
+
+    try:
+        with h5py.File(tmp_path, "w") as f:
+            f.attrs["scan_number"] = str(scan.number)
+            f.attrs["spec_path"] = os.path.abspath(scan.project.spec_path)
+            f.attrs["command"] = scan.spec_scan.scanCmd
+            f["normalization"] = scan._getNormalizationFactors()
+
+            spec_group = f.create_group("spec")
+            spec_group["raw"] = scan.spec_scan.raw
+            data_group = spec_group.create_group("data")
+            for label, values in scan.spec_scan.data.items():
+                data_group[label.replace("/", "_")] = np.asarray(values)
+
+            frames = None
+            block = []
+            for point in range(scan.n_pts):
+                frame = readFrame(scan.frame_index.getPath(point))
+                if frames is None:
+                    shape = (scan.n_pts,) + frame.shape
+                    frames = f.create_dataset(
+                        "frames",
+                        shape=shape,
+                        dtype=frame.dtype,
+                        chunks=getChunkShape(shape, frame.dtype.itemsize),
+                        compression=compression,
+                        compression_opts=compression_level,
+                        shuffle=True
+                    )
+                block.append(frame)
+                if len(block) == frames.chunks[0] or point == scan.n_pts - 1:
+                    start = point + 1 - len(block)
+                    frames[start:point + 1] = np.array(block)
+                    block = []
+    except BaseException:
+        # Partial files are not left next to the images
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, path)
+
+    return path
@@ -0,0 +1,332 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+from collections import OrderedDict
+import zlib
+
+import numpy as np
+
+from imageanalysis.statistics import DataStatistics, getSampleStep
+
+
+# Largest block of dense frames returned at once by getBlocks
+MAX_BLOCK_BYTES = 2 ** 24
+# Number of recently read frames kept decompressed by compressed stores
+HOT_FRAMES = 16
+# zlib level of compressed stores, favoring speed over ratio
+COMPRESSION_LEVEL = 1
+
+
+class FrameStore:
+    """Frames of a scan held in a form other than a dense array.
+
+    - Frames are indexed as (point, x, y) like raw data arrays, and
+      indexing returns dense NumPy arrays, so a store can be used where
+      raw data arrays are
+    - Frames are added in point order with append, e.g. while loading
+    - Subclasses implement _addFrame and getFrame, and keep nbytes as the
+      number of bytes held in memory
+    """
+
+    ndim = 3
+
+    def __init__(self, frame_shape: tuple, dtype=np.float64) -> None:
+
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.shape = (0,) + self.frame_shape
+        self.size = 0
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        # Frames are selected by the first index and indexed one at a time
+        if not isinstance(key, tuple):
+            key = (key,)
+        points, pixels = key[0], key[1:]
+
+        if isinstance(points, (int, np.integer)):
+            return self.getFrame(points)[pixels]
+
+        points = np.arange(self.shape[0])[points]
+        frames = [self._readFrame(point)[pixels] for point in points]
+        if len(frames) == 0:
+            return np.zeros((0,) + self.frame_shape, self.dtype)[
+                (slice(None),) + pixels
+            ]
+
+        return np.array(frames)
+
+    def __array__(self, dtype=None) -> np.ndarray:
+        data = self[:]
+
+        return data if dtype is None else data.astype(dtype)
+
+    def append(self, frame: np.ndarray) -> None:
+        """Adds the frame for the next point."""
+
+        if frame.shape != self.frame_shape:
+            raise ValueError("Frame shape does not match store.")
+
+        self._addFrame(np.asarray(frame, dtype=self.dtype))
+        self.shape = (self.shape[0] + 1,) + self.frame_shape
+        self.size += frame.size
+
+    def getFrame(self, point: int) -> np.ndarray:
+        """Returns the dense frame of a point."""
+
+        raise NotImplementedError
+
+    def getBlocks(self, max_block_bytes: int=MAX_BLOCK_BYTES):
+        """Yields (start point, dense frames) for consecutive blocks."""
+
+        frame_size = int(np.prod(self.frame_shape))
+        frame_bytes = max(1, self.dtype.itemsize * frame_size)
+        n_frames = max(1, max_block_bytes // frame_bytes)
+        for start in range(0, self.shape[0], n_frames):
+            yield start, self[start:start + n_frames]
+
+    def _addFrame(self, frame: np.ndarray) -> None:
+        """Stores a frame."""
+
+        raise NotImplementedError
+
+    def _readFrame(self, point: int) -> np.ndarray:
+        """Returns the dense frame of a point for reads of many frames."""
+
+        return self.getFrame(point)
+
+
+class SparseFrameStore(FrameStore):
+    """Frames stored as lists of the pixels that are above a threshold.
+
+    - Each frame keeps the flat indices and values of pixels whose
+      magnitude is above the threshold, and other pixels read as zero
+    - With the default threshold of 0, frames are stored exactly
+    - Projections, masked reductions, and statistics only visit stored
+      pixels, so their cost follows the number of nonzero pixels
+    """
+
+    def __init__(
+        self,
+        frame_shape: tuple,
+        dtype=np.float64,
+        threshold: float=0.0
+    ) -> None:
+        super(SparseFrameStore, self).__init__(frame_shape, dtype)
+
+        self.threshold = threshold
+        self.indices = [] # Flat pixel indices stored for each frame
+        self.values = [] # Pixel values stored for each frame
+        self.n_stored = 0 # Number of stored pixels in every frame
+        frame_size = int(np.prod(self.frame_shape))
+        self.index_dtype = np.int32 if frame_size < 2 ** 31 else np.int64
+
+    def getFrame(self, point: int) -> np.ndarray:
+        """Returns the dense frame of a point."""
+
+        frame = np.zeros(int(np.prod(self.frame_shape)), dtype=self.dtype)
+        frame[self.indices[point]] = self.values[point]
+
+        return frame.reshape(self.frame_shape)
+
+    def getProjection(self, calculation: str, dim: int) -> np.ndarray:
+        """Returns the max or sum projection along a dimension.
+
+        - Projections match those of Projections for the dense frames
+        """
+
+        if calculation not in ["max", "sum"]:
+            raise ValueError("Calculation type not valid.")
+        if dim not in (0, 1, 2):
+            raise ValueError("Dimension not valid.")
+
+        n_points = self.shape[0]
+        n_x, n_y = self.frame_shape
+        indices = self._getStoredIndices()
+        values = self._getStoredValues()
+        if dim == 0:
+            cells, shape, n_reduced = indices, (n_x, n_y), n_points
+        else:
+            points = np.repeat(
+                np.arange(n_points), [len(i) for i in self.indices]
+            )
+            if dim == 1:
+                cells, shape = points * n_y + indices % n_y, (n_points, n_y)
+                n_reduced = n_x
+            else:
+                cells, shape = points * n_x + indices // n_y, (n_points, n_x)
+                n_reduced = n_y
+
+        n_cells = int(np.prod(shape))
+        if calculation == "sum":
+            projection = np.bincount(
+                cells, weights=values, minlength=n_cells
+            )
+        else:
+            projection = np.full(n_cells, -np.inf)
+            np.maximum.at(projection, cells, values)
+            # Cells with any unstored pixel also reduce a zero
+            counts = np.bincount(cells, minlength=n_cells)
+            has_zeros = counts < n_reduced
+            projection[has_zeros] = np.maximum(projection[has_zeros], 0)
+            projection = projection.astype(self.dtype)
+
+        return projection.reshape(shape)
+
+    def reduceMasked(self, mask: np.ndarray, calculation: str) -> np.ndarray:
+        """Reduces the masked pixels of every frame to one value.
+
+        - Calculation can be "sum", "mean", or "max", as in reduceMaskedStack
+        """
+
+        flat_mask = mask.ravel()
+        n_masked = int(np.count_nonzero(flat_mask))
+        result = np.zeros(self.shape[0], dtype=np.float64)
+        if n_masked == 0:
+            return result
+
+        for point in range(self.shape[0]):
+            values = self.values[point][flat_mask[self.indices[point]]]
+            if calculation == "max":
+                value = np.amax(values) if len(values) > 0 else 0
+                # Unstored masked pixels are zeros
+                result[point] = value if len(values) == n_masked else \
+                    max(value, 0)
+            else:
+                result[point] = np.sum(values)
+
+        if calculation == "mean":
+            result /= n_masked
+
+        return result
+
+    def computeStatistics(self) -> DataStatistics:
+        """Returns DataStatistics of the frames from stored pixels."""
+
+        values = self._getStoredValues()
+        statistics = DataStatistics(sample_step=getSampleStep(values.size))
+        statistics.update(values)
+        if self.n_stored < self.size:
+            statistics.update(np.zeros(1, dtype=self.dtype))
+
+        return statistics
+
+    def _addFrame(self, frame: np.ndarray) -> None:
+        """Stores the pixels of a frame above the threshold."""
+
+        flat = frame.ravel()
+        indices = np.flatnonzero(np.abs(flat) > self.threshold)
+        self.indices.append(indices.astype(self.index_dtype))
+        self.values.append(flat[indices])
+        self.n_stored += len(indices)
+        self.nbytes += self.indices[-1].nbytes + self.values[-1].nbytes
+
+    def _getStoredIndices(self) -> np.ndarray:
+        """Returns flat pixel indices stored for every frame, in order."""
+
+        if len(self.indices) == 0:
+            return np.zeros(0, dtype=self.index_dtype)
+
+        return np.concatenate(self.indices)
+
+    def _getStoredValues(self) -> np.ndarray:
+        """Returns pixel values stored for every frame, in order."""
+
+        if len(self.values) == 0:
+            return np.zeros(0, dtype=self.dtype)
+
+        return np.concatenate(self.values)
+
+
+class CompressedFrameStore(FrameStore):
+    """Frames compressed losslessly in memory.
+
+    - Each frame is compressed with zlib, which finds the repeated values
+      of normalized detector counts
+    - Recently read frames are kept decompressed in a small cache, so
+      stepping through nearby frames does not decompress them again
+    - Reads of many frames, e.g. for gridding or ROIs, bypass the cache
+    """
+
+    def __init__(
+        self,
+        frame_shape: tuple,
+        dtype=np.float64,
+        compression_level: int=COMPRESSION_LEVEL,
+        hot_frames: int=HOT_FRAMES
+    ) -> None:
+        super(CompressedFrameStore, self).__init__(frame_shape, dtype)
+
+        self.compression_level = compression_level
+        self.hot_frames = hot_frames
+        self.frames = [] # Compressed bytes of each frame
+        self.cache = OrderedDict() # Hot frames, least recently read first
+        self.compressed_nbytes = 0 # Compressed bytes of every frame
+
+    def getFrame(self, point: int) -> np.ndarray:
+        """Returns the dense frame of a point, using the hot-frame cache."""
+
+        point = range(self.shape[0])[point]
+        if point in self.cache:
+            self.cache.move_to_end(point)
+            return self.cache[point]
+
+        frame = self._readFrame(point)
+        # Cached frames are shared, so they are read-only
+        frame.flags.writeable = False
+        self.cache[point] = frame
+        self.nbytes += frame.nbytes
+        while len(self.cache) > self.hot_frames:
+            _, evicted = self.cache.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+        return frame
+
+    def getCompressionRatio(self) -> float:
+        """Returns the ratio of dense to compressed bytes of the frames."""
+
+        if self.compressed_nbytes == 0:
+            return 1.0
+
+        return self.size * self.dtype.itemsize / self.compressed_nbytes
+
+    def _addFrame(self, frame: np.ndarray) -> None:
+        """Compresses a frame."""
+
+        compressed = zlib.compress(
+            np.ascontiguousarray(frame).tobytes(), self.compression_level
+        )
+        self.frames.append(compressed)
+        self.compressed_nbytes += len(compressed)
+        self.nbytes += len(compressed)
+
+    def _readFrame(self, point: int) -> np.ndarray:
+        """Decompresses a frame without caching it."""
+
+        frame = np.frombuffer(
+            bytearray(zlib.decompress(self.frames[point])), dtype=self.dtype
+        )
+
+        return frame.reshape(self.frame_shape)
+
+
+# Frame stores for each raw data storage option other than "dense"
+FRAME_STORES = {
+    "sparse": SparseFrameStore,
+    "compressed": CompressedFrameStore
+}
+
+
+def createFrameStore(storage: str, frame_shape: tuple) -> FrameStore:
+    """Returns an empty frame store for a raw data storage option."""
+
+    if storage not in FRAME_STORES:
+        raise ValueError("Raw data storage not valid.")
+
+    return FRAME_STORES[storage](frame_shape)
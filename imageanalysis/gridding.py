@@ -5,7 +5,8 @@ See LICENSE file.
 
 
 import numpy as np
-import xrayutilities as xu
+
+from imageanalysis.frames import FrameStore
 
 
 def gridScan(
@@ -15,33 +16,108 @@ def gridScan(
 ) -> tuple:
     """Creates a gridded array of raw image data from RSM coordinates."""
 
-    # See structures.py for grid_params creation
-    h_min = grid_params["H"]["min"]
-    k_min = grid_params["K"]["min"]
-    l_min = grid_params["L"]["min"]
-    h_max = grid_params["H"]["max"]
-    k_max = grid_params["K"]["max"]
-    l_max = grid_params["L"]["max"]
-    h_n = grid_params["H"]["n"]
-    k_n = grid_params["K"]["n"]
-    l_n = grid_params["L"]["n"]
-
-    # Splits RSM into separate maps for H, K, and L coordinates
-    h, k, l = rsm[:, :, :, 0], rsm[:, :, :, 1], rsm[:, :, :, 2]
-
-    # Process for gridding image data with given bounds and pixel counts
-    gridder = xu.Gridder3D(nx=h_n, ny=k_n, nz=l_n)
-    gridder.KeepData(True)
-    gridder.dataRange(
-        xmin=h_min, xmax=h_max,
-        ymin=k_min, ymax=k_max,
-        zmin=l_min, zmax=l_max,
-        fixed=True
-    )
-    gridder(h, k, l, raw_data)
-
-    grid_data = gridder.data
-    # TODO: Handle mismatched coordinate lengths
-    coords = np.array([gridder.xaxis, gridder.yaxis, gridder.zaxis])
-
-    return grid_data, coords
+    accumulator = GridAccumulator(grid_params)
+    accumulator.update(raw_data, rsm)
+
+    return accumulator.getData()
+
+
+class GridAccumulator:
+    """Grids raw image data added in blocks of frames.
+
+    - Bounds and pixel counts are fixed when the accumulator is created
+    - Intensities and counts are summed in place, so adding a block costs
+      the same however many blocks were added before it
+    """
+
+    def __init__(self, grid_params: dict) -> None:
+
+        # Imported here since xrayutilities is slow to import
+        import xrayutilities as xu
+
+        # See structures.py for grid_params creation
+        h_min = grid_params["H"]["min"]
+        k_min = grid_params["K"]["min"]
+        l_min = grid_params["L"]["min"]
+        h_max = grid_params["H"]["max"]
+        k_max = grid_params["K"]["max"]
+        l_max = grid_params["L"]["max"]
+        h_n = grid_params["H"]["n"]
+        k_n = grid_params["K"]["n"]
+        l_n = grid_params["L"]["n"]
+
+        self.n_frames = 0 # Number of frames added
+
+        # Process for gridding image data with given bounds and pixel counts
+        self.gridder = xu.Gridder3D(nx=h_n, ny=k_n, nz=l_n)
+        self.gridder.KeepData(True)
+        self.gridder.dataRange(
+            xmin=h_min, xmax=h_max,
+            ymin=k_min, ymax=k_max,
+            zmin=l_min, zmax=l_max,
+            fixed=True
+        )
+
+    def update(self, raw_data: np.ndarray, rsm: np.ndarray) -> None:
+        """Adds frames of raw image data and their RSM coordinates.
+
+        - Frame stores are gridded in blocks of dense frames
+        """
+
+        if raw_data.shape[0] == 0:
+            return
+
+        if isinstance(raw_data, FrameStore):
+            for start, block in raw_data.getBlocks():
+                self.update(block, rsm[start:start + block.shape[0]])
+            return
+
+        # Splits RSM into separate maps for H, K, and L coordinates
+        h, k, l = rsm[:, :, :, 0], rsm[:, :, :, 1], rsm[:, :, :, 2]
+        self.gridder(h, k, l, raw_data)
+        self.n_frames += raw_data.shape[0]
+
+    def getData(self) -> tuple:
+        """Returns gridded data normalized by counts, and grid coordinates."""
+
+        grid_data = self.gridder.data
+        # TODO: Handle mismatched coordinate lengths
+        coords = np.array([
+            self.gridder.xaxis, self.gridder.yaxis, self.gridder.zaxis
+        ])
+
+        return grid_data, coords
+
+
+def getFrameBounds(rsm: np.ndarray) -> np.ndarray:
+    """Returns the minimum and maximum HKL coordinates of every raw frame.
+
+    - Output is indexed as (min/max, frame, HKL)
+    """
+
+    return np.stack([rsm.min(axis=(1, 2)), rsm.max(axis=(1, 2))])
+
+
+def getContributingFrames(
+    frame_bounds: np.ndarray,
+    coords: list,
+    indices: tuple
+) -> np.ndarray:
+    """Returns indices of raw frames whose HKL bounds overlap a grid voxel.
+
+    - Frame bounds are boxes, so frames near the voxel can be included even
+      if none of their pixels were gridded into it
+    """
+
+    lower, upper = np.empty(3), np.empty(3)
+    for i in range(3):
+        center = coords[i][indices[i]]
+        if len(coords[i]) > 1:
+            half_width = abs(coords[i][1] - coords[i][0]) / 2
+        else:
+            half_width = 0
+        lower[i], upper[i] = center - half_width, center + half_width
+
+    overlap = (frame_bounds[0] <= upper) & (frame_bounds[1] >= lower)
+
+    return np.nonzero(np.all(overlap, axis=1))[0]
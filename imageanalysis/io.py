@@ -6,17 +6,325 @@ See LICENSE file.
 
 import numpy as np
 import os
-import vtk
-from vtk.util import numpy_support
+import re
 
-from rsMap3D.datasource.DetectorGeometryForXrayutilitiesReader import \
-    DetectorGeometryForXrayutilitiesReader  # isValidDetectorXMLFile
-from rsMap3D.datasource.InstForXrayutilitiesReader import \
-    InstForXrayutilitiesReader  # isValidInstrumentXMLFile
-from spec2nexus import spec  # isValidSPECFile
+# spec2nexus, rsMap3D, tifffile, PIL, and VTK are imported by the functions
+# that use them, since importing them at startup delays the main window
+
+
+# Zero padding of point numbers in frame file names
+FRAME_NUMBER_WIDTH = 5
+
+# Cached XML classifications, keyed by path
+# Each entry holds the file's (mtime, size) and its classification
+_xml_classifications = {}
+
+
+class ProjectIndex:
+    """Classifies every entry of a project directory in a single pass.
+
+    - SPEC and XML files are found with one os.scandir of the project path
+    - XML files are classified as instrument or detector configurations,
+      with results cached by modification time and size
+    - Scan image directories under "images" are only listed when a SPEC
+      file's scans are requested, and their TIFF counts only when those
+      are requested, so large image trees are not walked up front
+    """
+
+    def __init__(self, path: str) -> None:
+
+        self.path = path
+        self.spec_paths = [] # SPEC file basepaths
+        self.xml_paths = [] # XML file basepaths
+        self.instrument_paths = [] # Valid instrument configuration basepaths
+        self.detector_paths = [] # Valid detector configuration basepaths
+        self.image_path = None # "images" subdirectory
+        self.scan_directories = {} # Scan directory names, by image directory
+        self.image_directories = {} # TIFF counts of scan directories, likewise
+
+        self._scan()
+
+    def isValid(self) -> bool:
+        """Checks if the directory is a valid Project path.
+
+        A valid project directory includes: A SPEC file (.spec), instrument
+        and detector configuration files (.xml), and an "images"
+        subdirectory.
+        """
+
+        return (
+            len(self.spec_paths) > 0 and
+            len(self.instrument_paths) > 0 and
+            len(self.detector_paths) > 0 and
+            self.image_path is not None
+        )
+
+    def getScanDirectories(self, spec_path: str) -> set:
+        """Returns names of the scan directories of a SPEC file.
+
+        - The SPEC file's image directory is listed the first time
+        """
+
+        name = os.path.splitext(os.path.basename(spec_path))[0]
+        if name not in self.scan_directories:
+            scan_dirs = set()
+            if self.image_path is not None:
+                path = os.path.join(self.image_path, name)
+                try:
+                    with os.scandir(path) as entries:
+                        scan_dirs = {e.name for e in entries if e.is_dir()}
+                except (FileNotFoundError, NotADirectoryError):
+                    pass
+            self.scan_directories[name] = scan_dirs
+
+        return self.scan_directories[name]
+
+    def getScanImageDirectories(self, spec_path: str) -> dict:
+        """Returns TIFF counts for each scan directory of a SPEC file.
+
+        - Counts are found the first time, one directory listing per scan
+        """
+
+        name = os.path.splitext(os.path.basename(spec_path))[0]
+        if name not in self.image_directories:
+            counts = {}
+            if len(self.getScanDirectories(spec_path)) > 0:
+                counts = getImageDirectoryCounts(
+                    os.path.join(self.image_path, name)
+                )
+            self.image_directories[name] = counts
+
+        return self.image_directories[name]
+
+    def _scan(self) -> None:
+        """Lists and classifies project entries."""
+
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if entry.name == "images":
+                        self.image_path = entry.path
+                elif entry.is_file():
+                    if entry.name.endswith(".spec"):
+                        self.spec_paths.append(entry.name)
+                    elif entry.name.endswith(".xml"):
+                        self.xml_paths.append(entry.name)
+                        kind = classifyXMLFile(entry.path, entry.stat())
+                        if kind == "instrument":
+                            self.instrument_paths.append(entry.name)
+                        elif kind == "detector":
+                            self.detector_paths.append(entry.name)
+
+        for paths in [
+            self.spec_paths,
+            self.xml_paths,
+            self.instrument_paths,
+            self.detector_paths
+        ]:
+            paths.sort()
+
+
+class FrameIndex:
+    """Maps scan points to frame files named <name>_S<scan>_<point>.tif.
+
+    - Paths follow the file name template, so any frame is found without
+      listing the scan's image directory
+    - refresh lists the directory once, without sorting, to check which
+      points have frames and to find frames with other zero padding
+    """
+
+    def __init__(
+        self,
+        image_path: str,
+        name: str,
+        width: int=FRAME_NUMBER_WIDTH,
+        extension: str=".tif"
+    ) -> None:
+
+        self.image_path = image_path
+        self.prefix = f"{name}_{os.path.basename(image_path)}_"
+        self.width = width
+        self.extension = extension
+        self.paths = None # Frame paths found by refresh, keyed by point
+        self.pattern = re.compile(
+            re.escape(self.prefix) + r"(\d+)\.tiff?$"
+        )
+
+    def getPath(self, point: int) -> str:
+        """Returns the path of a point's frame."""
+
+        if self.paths is not None and point in self.paths:
+            return self.paths[point]
+
+        return f"{self.image_path}/{self.prefix}" \
+            f"{str(point).zfill(self.width)}{self.extension}"
+
+    def exists(self, point: int) -> bool:
+        """Checks if a point's frame has been written."""
+
+        return os.path.exists(self.getPath(point))
+
+    def refresh(self) -> None:
+        """Finds every frame in the scan's image directory."""
+
+        paths = {}
+        with os.scandir(self.image_path) as entries:
+            for entry in entries:
+                match = self.pattern.match(entry.name)
+                if match is not None:
+                    paths[int(match.group(1))] = entry.path
+        self.paths = paths
+
+    def getMissingPoints(self, n_pts: int) -> list:
+        """Returns points of a scan that do not have a frame."""
+
+        if self.paths is None:
+            self.refresh()
+
+        return [i for i in range(n_pts) if i not in self.paths]
+
+    def getExtraPoints(self, n_pts: int) -> list:
+        """Returns points with frames that are not in a scan."""
+
+        if self.paths is None:
+            self.refresh()
+
+        return sorted(i for i in self.paths if i >= n_pts)
+
+
+def readFrame(path: str) -> np.ndarray:
+    """Returns a TIFF frame indexed as (x, y).
+
+    - Uncompressed frames are memory-mapped and returned as a transposed
+      view, so pixels are only copied when they are used
+    - Compressed frames, which cannot be mapped, are decoded
+    """
+
+    import tifffile
+
+    try:
+        image = tifffile.memmap(path, mode="r")
+    except ValueError:
+        from PIL import Image
+
+        image = np.array(Image.open(path))
+
+    return image.T
+
+
+def reduceFrame(
+    frame: np.ndarray,
+    roi: list=None,
+    binning: int=1
+) -> np.ndarray:
+    """Crops a frame to a detector region and averages blocks of pixels.
+
+    - roi is [x_min, x_max, y_min, y_max] in detector pixels, as for
+      xrayutilities Ang2Q.init_area
+    - Blocks of binning x binning pixels are averaged, and blocks at the
+      edges of the region average the pixels they have, as in
+      xrayutilities blockAverage2D
+    - Without binning, the cropped frame is a view
+    """
+
+    if roi is not None:
+        frame = frame[roi[0]:roi[1], roi[2]:roi[3]]
+    if binning == 1:
+        return frame
+
+    starts = [np.arange(0, n, binning) for n in frame.shape]
+    sums = np.add.reduceat(
+        np.add.reduceat(frame, starts[0], axis=0, dtype=np.float64),
+        starts[1], axis=1
+    )
+    counts = np.multiply.outer(
+        np.diff(np.append(starts[0], frame.shape[0])),
+        np.diff(np.append(starts[1], frame.shape[1]))
+    )
+
+    return sums / counts
+
+
+def getImageDirectoryCounts(path: str) -> dict:
+    """Returns TIFF counts for each subdirectory of a directory."""
+
+    counts = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                with os.scandir(entry.path) as files:
+                    counts[entry.name] = sum(
+                        1 for file in files if file.name.endswith("tif")
+                    )
+
+    return counts
+
+
+def classifyXMLFile(path: str, stat: os.stat_result=None) -> str:
+    """Returns "instrument", "detector", or None for an XML file.
+
+    - Results are cached until the file's modification time or size changes
+    - The root element decides which configuration reader is tried first
+    """
+
+    if stat is None:
+        stat = os.stat(path)
+    key = os.path.abspath(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _xml_classifications.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    checks = [
+        ("instrument", isValidInstrumentXMLFile),
+        ("detector", isValidDetectorXMLFile)
+    ]
+    if "detector" in getXMLRootTag(path).lower():
+        checks.reverse()
+
+    kind = None
+    for name, isValid in checks:
+        if isValid(path):
+            kind = name
+            break
+    _xml_classifications[key] = (signature, kind)
+
+    return kind
+
+
+def getXMLRootTag(path: str) -> str:
+    """Returns the root element name of an XML file without parsing it all."""
+
+    import xml.etree.ElementTree as ElementTree
+
+    try:
+        for _, element in ElementTree.iterparse(path, events=("start",)):
+            # Removes namespace
+            return element.tag.rsplit("}", 1)[-1]
+    except ElementTree.ParseError:
+        pass
+
+    return ""
+
+
+def getDetectorShape(path: str) -> tuple:
+    """Returns the number of pixels along each direction of a detector.
+
+    - Read from the first Npixels element of a detector config, as by
+      rsMap3D's detector reader
+    """
+
+    import xml.etree.ElementTree as ElementTree
+
+    for element in ElementTree.parse(path).iter():
+        # Removes namespace
+        if element.tag.rsplit("}", 1)[-1] == "Npixels":
+            n_ch_1, n_ch_2 = element.text.split()[:2]
+            return (int(n_ch_1), int(n_ch_2))
+
+    raise ValueError(f"Detector config '{path}' has no pixel counts.")
 
 
-# TODO: Basic testing for all functions
 # TODO: Pathlib capabilities
 def isValidProjectPath(path: str) -> bool:
     """Checks if path is a valid Project path.
@@ -25,60 +333,29 @@ def isValidProjectPath(path: str) -> bool:
     detector configuration files (.xml), and an "images" subdirectory.
     """
 
-    # Hold status of each required element
-    spec, instr_config, det_config, images = False, False, False, False
-
-    # Evaluates every item in given directory path until conditions are met
-    for item in os.listdir(path):
-
-        item_path = f"{path}/{item}"
-
-        # Checks if item is a directory
-        if os.path.isdir(item_path):
-            # "images" subdirectory
-            if item == "images":
-                images = True
-
-        # Checks if item is a file
-        elif os.path.isfile(item_path):
-            # SPEC file
-            if item.endswith(".spec"):
-                    spec = True
-            # Configuration files
-            elif item.endswith(".xml"):
-                if isValidInstrumentXMLFile(item_path):
-                    instr_config = True
-                elif isValidDetectorXMLFile(item_path):
-                    det_config = True
-
-        # Checks if conditions for Project path are met
-        is_valid = False not in [spec, instr_config, det_config, images]
-        if is_valid:
-            break
-
-    return is_valid
+    return ProjectIndex(path).isValid()
 
 
 def isValidSPECFile(path: str) -> bool:
-    """Checks if given path is a valid SPEC file."""
+    """Checks if given path is a valid SPEC file.
+
+    - Only the index of SPEC sections is built, no scans are parsed
+    """
+
+    from imageanalysis.spec_index import SpecFileIndex
 
     try:
-        # Pip package version: Always returns as False on first runthrough
-        # Second try/except block added to catch this oddity.
-        # I have no idea why only the package version has this error.
-        spec_data = spec.SpecDataFile(path)
-        return True
-    except:
-        try:
-            spec_data = spec.SpecDataFile(path)
-            return True
-        except:
-            return False
+        return SpecFileIndex(path).isValid()
+    except OSError:
+        return False
 
 
 def isValidInstrumentXMLFile(path: str) -> bool:
     """Checks if given path is a valid instrument configuration file."""
 
+    from rsMap3D.datasource.InstForXrayutilitiesReader import \
+        InstForXrayutilitiesReader
+
     try:
         instrument_reader = InstForXrayutilitiesReader(path)
         # Raises an error if getSampleCircleDirections() is empty
@@ -92,6 +369,9 @@ def isValidInstrumentXMLFile(path: str) -> bool:
 def isValidDetectorXMLFile(path: str) -> bool:
     """Checks if given path is a valid detector configuration file."""
 
+    from rsMap3D.datasource.DetectorGeometryForXrayutilitiesReader import \
+        DetectorGeometryForXrayutilitiesReader
+
     try:
         detector_reader = DetectorGeometryForXrayutilitiesReader(path)
         # Raises an error if getDetectors() is empty
@@ -105,30 +385,29 @@ def isValidDetectorXMLFile(path: str) -> bool:
 def getSPECPaths(path: str) -> list:
     """Returns list of SPEC file basepaths in given directory."""
 
-    spec_paths = []
-
-    for item in os.listdir(path):
-        if item.endswith(".spec"):
-            spec_paths.append(item)
-
-    return spec_paths
+    with os.scandir(path) as entries:
+        return sorted(
+            entry.name for entry in entries
+            if entry.name.endswith(".spec") and entry.is_file()
+        )
 
 
 def getXMLPaths(path: str) -> list:
     """Returns list of XML file basepaths in given directory."""
 
-    xml_paths = []
-
-    for item in os.listdir(path):
-        if item.endswith(".xml"):
-            xml_paths.append(item)
-
-    return xml_paths
+    with os.scandir(path) as entries:
+        return sorted(
+            entry.name for entry in entries
+            if entry.name.endswith(".xml") and entry.is_file()
+        )
 
 
 def numpyToVTK(array: np.ndarray, coords, path) -> str:
     """Converts and saves numpy array to VTK image data."""
 
+    import vtk
+    from vtk.util import numpy_support
+
     data_array = numpy_support.numpy_to_vtk(array.flatten(order="F"))
     image_data = vtk.vtkImageData()
 
@@ -13,13 +13,36 @@ from spec2nexus import spec
 import xrayutilities as xu
 
 
+# Unit vectors of rotation axes and pixel directions, as in xrayutilities
+AXIS_VECTORS = {
+    "x": np.array([1.0, 0.0, 0.0]),
+    "y": np.array([0.0, 1.0, 0.0]),
+    "z": np.array([0.0, 0.0, 1.0])
+}
+# Product of wavelength in Angstroms and energy in eV, as in xrayutilities
+WAVELENGTH_ENERGY = 12398.419843320026
+
+
 # TODO: Make arbitrary enough to use as a static function
 def mapScan(
     spec_scan: spec.SpecDataFileScan,
     instrument_path: str,
-    detector_path: str
+    detector_path: str,
+    points: list=None,
+    roi: list=None,
+    binning: int=1,
+    basis: "DetectorQBasis"=None
 ) -> np.ndarray:
-    """Creates a reciprocal space map for each point in a scan."""
+    """Creates a reciprocal space map for each point in a scan.
+
+    - points limits mapping to some scan points, e.g. newly acquired ones
+    - roi limits mapping to a detector region, [x_min, x_max, y_min, y_max]
+    - binning maps averaged blocks of binning x binning pixels, matching
+      frames reduced by io.reduceFrame
+    - If a DetectorQBasis is given, points are mapped with NumPy from its
+      pixel directions instead of with xrayutilities, and roi and binning
+      are those of the basis
+    """
 
     point_rsm_list = []
     angle_names = []
@@ -63,17 +86,26 @@ def mapScan(
             break
 
     # Retrieve total number of scan points from spec
-    point_count = len(spec_scan.data_lines)
+    if points is None:
+        points = range(len(spec_scan.data_lines))
+
+    if basis is not None:
+        return _mapScanWithBasis(
+            spec_scan, rsm_params, sample_circle_names,
+            detector_circle_names, points, basis
+        )
 
     # Creates a reciprocal space map for every scan point
-    for i in range(point_count):
+    for i in points:
         point_rsm = mapScanPoint(
             point=i,
             spec_scan=spec_scan,
             rsm_params=rsm_params,
             angle_names=angle_names,
             instrument_reader=instrument_reader,
-            detector_reader=detector_reader
+            detector_reader=detector_reader,
+            roi=roi,
+            binning=binning
         )
         point_rsm_list.append(point_rsm)
 
@@ -91,7 +123,9 @@ def mapScanPoint(
     rsm_params: dict,
     angle_names: list,
     instrument_reader: InstForXrayutilitiesReader,
-    detector_reader: DetectorGeometryForXrayutilitiesReader
+    detector_reader: DetectorGeometryForXrayutilitiesReader,
+    roi: list=None,
+    binning: int=1
 ) -> np.ndarray:
     """Creates a reciprocal space map for a single scan point."""
 
@@ -129,13 +163,14 @@ def mapScanPoint(
     pixel_width_1 = detector_reader.getSize(detector)[0] / n_ch_1
     pixel_width_2 = detector_reader.getSize(detector)[1] / n_ch_2
     distance = detector_reader.getDistance(detector)
-    roi = [0, n_ch_1, 0, n_ch_2]
+    if roi is None:
+        roi = [0, n_ch_1, 0, n_ch_2]
     hxrd.Ang2Q.init_area(
         pixel_dir_1, pixel_dir_2,
         cch1=c_ch_1, cch2=c_ch_2,
         Nch1=n_ch_1, Nch2=n_ch_2,
         pwidth1=pixel_width_1, pwidth2=pixel_width_2,
-        distance=distance, roi=roi
+        distance=distance, roi=roi, Nav=[binning, binning]
     )
 
     # Retrieves angle values from parameter dictionary
@@ -146,3 +181,218 @@ def mapScanPoint(
     point_rsm = np.array([qx, qy, qz])
 
     return point_rsm
+
+
+class DetectorQBasis:
+    """Directions of detector pixels for converting angles to HKL with NumPy.
+
+    - Each pixel's direction from the sample is found once, at zero
+      detector angles, as in xrayutilities Ang2Q.init_area
+    - For each point, the circle rotations, wavevector, and inverse UB
+      matrix reduce to one 3x3 matrix and one offset, so HKL of every
+      pixel is a single matrix product
+    - Region and binning follow Ang2Q.init_area's roi and Nav
+    - Circle directions are xrayutilities axis strings, e.g. "z-"
+    """
+
+    def __init__(
+        self,
+        sample_circle_dirs: list,
+        detector_circle_dirs: list,
+        primary_beam_dir: list,
+        pixel_dir_1: str,
+        pixel_dir_2: str,
+        center_channel: tuple,
+        n_channels: tuple,
+        pixel_width: tuple,
+        distance: float,
+        roi: list=None,
+        binning: int=1,
+        dtype=np.float64
+    ) -> None:
+
+        self.sample_circle_dirs = list(sample_circle_dirs)
+        self.detector_circle_dirs = list(detector_circle_dirs)
+        self.dtype = np.dtype(dtype)
+
+        beam = np.asarray(primary_beam_dir, dtype=np.float64)
+        self.beam_dir = beam / np.linalg.norm(beam)
+
+        # Binned channels are scaled as in xrayutilities
+        if roi is None:
+            roi = [0, n_channels[0], 0, n_channels[1]]
+        starts = [roi[0] // binning, roi[2] // binning]
+        lengths = [
+            -(-(roi[1] - roi[0]) // binning), -(-(roi[3] - roi[2]) // binning)
+        ]
+        self.shape = tuple(lengths)
+
+        # Pixel offsets from the detector center along each direction
+        offsets = []
+        for i, direction in enumerate([pixel_dir_1, pixel_dir_2]):
+            channels = np.arange(starts[i], starts[i] + lengths[i])
+            offset = (channels - center_channel[i] / binning) * \
+                pixel_width[i] * binning
+            offsets.append(
+                np.multiply.outer(offset, _getAxisVector(direction))
+            )
+        pixels = distance * self.beam_dir + \
+            offsets[0][:, np.newaxis] + offsets[1][np.newaxis, :]
+
+        # Unit vectors indexed as (x, y, 3)
+        self.pixel_dirs = (
+            pixels / np.linalg.norm(pixels, axis=-1, keepdims=True)
+        ).astype(self.dtype)
+
+    def getHKL(
+        self,
+        sample_angles: np.ndarray,
+        detector_angles: np.ndarray,
+        energy: np.ndarray,
+        ub: np.ndarray
+    ) -> np.ndarray:
+        """Returns HKL of every pixel at every point.
+
+        - Angles are in degrees and indexed as (point, circle), with circles
+          from outermost to innermost
+        - Energy is in eV, for every point or all of them
+        - Returns an array indexed as (point, x, y, 3)
+        """
+
+        sample_angles = np.atleast_2d(sample_angles)
+        detector_angles = np.atleast_2d(detector_angles)
+        n_points = sample_angles.shape[0]
+        energy = np.broadcast_to(
+            np.asarray(energy, dtype=np.float64), n_points
+        )
+
+        # Wavevector magnitude in inverse Angstroms
+        k_0 = 2 * np.pi * energy / WAVELENGTH_ENERGY
+
+        sample_rotation = _getRotationMatrices(
+            self.sample_circle_dirs, sample_angles
+        )
+        detector_rotation = _getRotationMatrices(
+            self.detector_circle_dirs, detector_angles
+        )
+        inverse = np.linalg.inv(sample_rotation @ ub)
+
+        # HKL = k_0 * inverse @ (detector_rotation @ pixel_dir - beam_dir)
+        matrices = k_0[:, np.newaxis, np.newaxis] * inverse @ detector_rotation
+        offsets = k_0[:, np.newaxis] * (inverse @ self.beam_dir)
+
+        # Pixels are transformed as rows, so each point is one matrix product
+        hkl = np.matmul(
+            self.pixel_dirs.reshape(-1, 3),
+            matrices.transpose(0, 2, 1).astype(self.dtype)
+        )
+        hkl -= offsets.astype(self.dtype)[:, np.newaxis]
+
+        return hkl.reshape((n_points,) + self.shape + (3,))
+
+
+def createDetectorQBasis(
+    instrument_path: str,
+    detector_path: str,
+    roi: list=None,
+    binning: int=1,
+    dtype=np.float64
+) -> DetectorQBasis:
+    """Reads a DetectorQBasis from instrument and detector configs."""
+
+    instrument_reader = InstForXrayutilitiesReader(instrument_path)
+    detector_reader = DetectorGeometryForXrayutilitiesReader(detector_path)
+    detector = detector_reader.getDetectors()[0]
+    n_channels = detector_reader.getNpixels(detector)
+    size = detector_reader.getSize(detector)
+
+    return DetectorQBasis(
+        sample_circle_dirs=instrument_reader.getSampleCircleDirections(),
+        detector_circle_dirs=instrument_reader.getDetectorCircleDirections(),
+        primary_beam_dir=instrument_reader.getPrimaryBeamDirection(),
+        pixel_dir_1=detector_reader.getPixelDirection1(detector),
+        pixel_dir_2=detector_reader.getPixelDirection2(detector),
+        center_channel=detector_reader.getCenterChannelPixel(detector),
+        n_channels=n_channels,
+        pixel_width=(size[0] / n_channels[0], size[1] / n_channels[1]),
+        distance=detector_reader.getDistance(detector),
+        roi=roi,
+        binning=binning,
+        dtype=dtype
+    )
+
+
+def _mapScanWithBasis(
+    spec_scan: spec.SpecDataFileScan,
+    rsm_params: dict,
+    sample_circle_names: list,
+    detector_circle_names: list,
+    points: list,
+    basis: DetectorQBasis
+) -> np.ndarray:
+    """Creates reciprocal space maps for scan points with a DetectorQBasis.
+
+    - Parameters with a SPEC data column take their value at each point,
+      as in mapScanPoint, and others keep their initial value
+    """
+
+    points = list(points)
+    if len(points) == 0:
+        return np.zeros((0,) + basis.shape + (3,), dtype=basis.dtype)
+
+    values = {}
+    for name in sample_circle_names + detector_circle_names + ["Energy"]:
+        if name in spec_scan.L:
+            column = spec_scan.data[name]
+            values[name] = np.array([column[i] for i in points], dtype=float)
+        else:
+            values[name] = np.full(len(points), float(rsm_params[name]))
+
+    return basis.getHKL(
+        sample_angles=np.stack(
+            [values[name] for name in sample_circle_names], axis=1
+        ),
+        detector_angles=np.stack(
+            [values[name] for name in detector_circle_names], axis=1
+        ),
+        energy=values["Energy"],
+        ub=rsm_params["UB_Matrix"]
+    )
+
+
+def _getAxisVector(direction: str) -> np.ndarray:
+    """Returns the unit vector of an axis string, e.g. "z-"."""
+
+    if len(direction) != 2 or direction[0] not in AXIS_VECTORS or \
+            direction[1] not in "+-":
+        raise ValueError(f"Axis direction '{direction}' not valid.")
+
+    sign = 1.0 if direction[1] == "+" else -1.0
+
+    return sign * AXIS_VECTORS[direction[0]]
+
+
+def _getRotationMatrices(directions: list, angles: np.ndarray) -> np.ndarray:
+    """Returns the product of circle rotations at every point.
+
+    - Rotations are right-handed about each circle's axis, applied from
+      the outermost circle inwards
+    - Returns an array indexed as (point, 3, 3)
+    """
+
+    matrices = np.broadcast_to(np.eye(3), (angles.shape[0], 3, 3))
+    for i, direction in enumerate(directions):
+        axis = _getAxisVector(direction)
+        theta = np.radians(angles[:, i])
+        # Rodrigues' rotation formula
+        cross = np.array([
+            [0, -axis[2], axis[1]],
+            [axis[2], 0, -axis[0]],
+            [-axis[1], axis[0], 0]
+        ])
+        rotation = np.eye(3) + \
+            np.sin(theta)[:, np.newaxis, np.newaxis] * cross + \
+            (1 - np.cos(theta))[:, np.newaxis, np.newaxis] * (cross @ cross)
+        matrices = matrices @ rotation
+
+    return matrices
@@ -0,0 +1,205 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import copy
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+from imageanalysis.slicing import GridSlicer
+
+
+# Default memory budget for arrays of scans open in the DataView
+DEFAULT_BUDGET_BYTES = 2 ** 32
+
+
+class MemoryManager:
+    """Keeps the arrays of scans open in the DataView within a budget.
+
+    - Scans are registered by each tab that shows them, along with a
+      callback that releases the tab's references to the scan's arrays
+    - The scan in the current tab is active and is never evicted
+    - When registered arrays exceed the budget, inactive scans are evicted,
+      least recently used first
+    - Evicted arrays are spilled to .npy files in a cache directory, or
+      dropped and recomputed from project files if spilling is off
+    - Evicted arrays are rematerialized when their scan is activated
+    """
+
+    # Rematerialization order, since gridding needs raw data and the RSM
+    array_names = ["raw_data", "rsm", "grid_data"]
+
+    def __init__(
+        self,
+        budget_bytes: int=DEFAULT_BUDGET_BYTES,
+        spill: bool=True,
+        cache_dir: str=None
+    ) -> None:
+
+        self.budget_bytes = budget_bytes
+        self.spill = spill
+        self.cache_dir = cache_dir # Temporary directory made on first spill
+        self.active_scan = None
+        self.records = {} # Scan records, least recently used first
+
+    def register(self, scan, unload) -> None:
+        """Tracks the arrays of a scan for a tab.
+
+        - unload is called before the scan's arrays are evicted
+        """
+
+        if scan not in self.records:
+            self.records[scan] = {"unloads": [], "evicted": {}}
+        self.records[scan]["unloads"].append(unload)
+
+    def unregister(self, scan, unload) -> None:
+        """Stops tracking a scan for a tab.
+
+        - Once no tabs show a scan, its raw and gridded data are released
+          and an evicted RSM is restored for the project
+        """
+
+        record = self.records.get(scan)
+        if record is None:
+            return
+        if unload in record["unloads"]:
+            record["unloads"].remove(unload)
+        if len(record["unloads"]) > 0:
+            return
+
+        self._rematerialize(scan, names=["rsm"])
+        self._removeSpillFiles(scan)
+        scan.raw_data = None
+        scan.grid_data = None
+        scan.grid_slicer = None
+        del self.records[scan]
+        if scan is self.active_scan:
+            self.active_scan = None
+
+    def activate(self, scan) -> None:
+        """Marks a scan as in view, rematerializing its arrays if needed.
+
+        - Inactive scans are evicted if the budget is exceeded
+        """
+
+        if scan not in self.records:
+            return
+
+        self.active_scan = scan
+        self.records[scan] = self.records.pop(scan)
+        self._rematerialize(scan)
+        self._enforceBudget()
+
+    def setBudget(self, budget_bytes: int) -> None:
+        """Sets the budget, evicting inactive scans if it is exceeded."""
+
+        self.budget_bytes = budget_bytes
+        self._enforceBudget()
+
+    def getUsage(self, scan=None) -> int:
+        """Returns bytes held in memory by one or all registered scans."""
+
+        scans = self.records.keys() if scan is None else [scan]
+        usage = 0
+        for s in scans:
+            arrays = [getattr(s, name) for name in self.array_names]
+            if s.grid_slicer is not None:
+                arrays.append(s.grid_slicer.contiguous_stack)
+            for array in arrays:
+                if array is not None and not isinstance(array, np.memmap):
+                    usage += array.nbytes
+
+        return usage
+
+    def isEvicted(self, scan) -> bool:
+        """Returns whether any arrays of a scan are evicted."""
+
+        record = self.records.get(scan)
+
+        return record is not None and len(record["evicted"]) > 0
+
+    def evict(self, scan) -> None:
+        """Releases the arrays of a scan from memory."""
+
+        record = self.records[scan]
+        for unload in record["unloads"]:
+            unload()
+
+        for name in self.array_names:
+            array = getattr(scan, name)
+            if array is None:
+                continue
+            # Frame stores are not spilled, since they are smaller than
+            # dense arrays and are rebuilt by loading
+            path = None
+            if self.spill and isinstance(array, np.ndarray):
+                path = os.path.join(
+                    self._getCacheDir(), f"{id(scan)}_{name}.npy"
+                )
+                np.save(path, array)
+            record["evicted"][name] = path
+            setattr(scan, name, None)
+
+        # Slicer holds the gridded data and a contiguous copy of it
+        scan.grid_slicer = None
+
+    def _enforceBudget(self) -> None:
+        """Evicts inactive scans, least recently used first, until in budget."""
+
+        for scan in list(self.records.keys()):
+            if self.getUsage() <= self.budget_bytes:
+                return
+            if scan is not self.active_scan and self.getUsage(scan) > 0:
+                self.evict(scan)
+
+    def _rematerialize(self, scan, names: list=None) -> None:
+        """Restores evicted arrays from spill files or by recomputing them."""
+
+        evicted = self.records[scan]["evicted"]
+        for name in self.array_names:
+            if name not in evicted or (names is not None and name not in names):
+                continue
+            path = evicted.pop(name)
+            if path is not None:
+                setattr(scan, name, np.load(path))
+                os.remove(path)
+                if name == "grid_data":
+                    scan.grid_slicer = GridSlicer(
+                        scan.grid_data, scan.grid_coords
+                    )
+            elif name == "raw_data":
+                scan.loadRawData()
+            elif name == "rsm":
+                # Mapping resets grid parameters to the bounds of the RSM
+                grid_params = copy.deepcopy(scan.grid_params)
+                scan.map()
+                scan.grid_params = grid_params
+            elif name == "grid_data":
+                scan.grid()
+
+    def _removeSpillFiles(self, scan) -> None:
+        """Deletes spill files of a scan."""
+
+        evicted = self.records[scan]["evicted"]
+        for path in evicted.values():
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+        evicted.clear()
+
+    def _getCacheDir(self) -> str:
+        """Returns the spill directory, creating a temporary one if needed."""
+
+        if self.cache_dir is None:
+            self.cache_dir = tempfile.mkdtemp(prefix="imageanalysis_")
+            # Temporary directory is removed with the manager or at exit
+            weakref.finalize(self, shutil.rmtree, self.cache_dir, True)
+        else:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        return self.cache_dir
@@ -0,0 +1,158 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import numpy as np
+
+from imageanalysis.statistics import DataStatistics, computeStatistics
+
+
+# Largest block of an array that is reduced at once
+MAX_BLOCK_BYTES = 2 ** 24
+
+
+class Projections:
+    """Max and sum projections of a 3D array along each dimension.
+
+    - Blocks of the array are added along its first dimension with update,
+      so projections can be gathered while the array is loaded or gridded
+    - A projection along a dimension keeps the other two dimensions in
+      their original order
+    - Before any frames are added, projections are zero along the first
+      dimension and empty along the others
+    """
+
+    calculations = ["max", "sum"]
+
+    def __init__(self, frame_shape: tuple=None) -> None:
+
+        self.frame_shape = frame_shape # Shape of each frame, once known
+
+        # Projections along the first dimension are running reductions
+        # Projections along other dimensions are built from block results
+        self.projections = {}
+        self.blocks = {
+            (calculation, dim): []
+            for calculation in self.calculations for dim in (1, 2)
+        }
+        self.statistics = {} # DataStatistics for each projection
+
+    def update(self, block: np.ndarray) -> None:
+        """Adds a block of the array along its first dimension."""
+
+        self.frame_shape = block.shape[1:]
+        if block.shape[0] == 0:
+            return
+
+        maximum = block.max(axis=0)
+        total = block.sum(axis=0, dtype=np.float64)
+        if ("max", 0) not in self.projections:
+            self.projections[("max", 0)] = maximum
+            self.projections[("sum", 0)] = total
+        else:
+            np.maximum(
+                self.projections[("max", 0)],
+                maximum,
+                out=self.projections[("max", 0)]
+            )
+            self.projections[("sum", 0)] += total
+
+        for dim in (1, 2):
+            self.blocks[("max", dim)].append(block.max(axis=dim))
+            self.blocks[("sum", dim)].append(
+                block.sum(axis=dim, dtype=np.float64)
+            )
+
+        self.statistics = {}
+
+    def getProjection(self, calculation: str, dim: int) -> np.ndarray:
+        """Returns the projection of a calculation along a dimension."""
+
+        if calculation not in self.calculations:
+            raise ValueError("Calculation type not valid.")
+        if dim not in (0, 1, 2):
+            raise ValueError("Dimension not valid.")
+
+        # Block results are joined once, when first requested
+        if dim != 0:
+            blocks = self.blocks[(calculation, dim)]
+            if len(blocks) > 1:
+                blocks[:] = [np.concatenate(blocks)]
+            if len(blocks) == 1:
+                self.projections[(calculation, dim)] = blocks[0]
+
+        if (calculation, dim) not in self.projections:
+            return self._getEmptyProjection(dim)
+
+        return self.projections[(calculation, dim)]
+
+    def _getEmptyProjection(self, dim: int) -> np.ndarray:
+        """Returns the projection of an array with no frames."""
+
+        if self.frame_shape is None:
+            raise ValueError("Frame shape of projections is not known.")
+        shape = [0, *self.frame_shape]
+        del shape[dim]
+
+        return np.zeros(shape)
+
+    def getImage(self, calculation: str, dim_order: tuple) -> np.ndarray:
+        """Returns the projection along the last dimension of an order.
+
+        - Image axes follow the first two dimensions of the order
+        """
+
+        projection = self.getProjection(calculation, dim_order[2])
+        if dim_order[0] > dim_order[1]:
+            projection = projection.T
+
+        return projection
+
+    def getStatistics(self, calculation: str, dim: int) -> DataStatistics:
+        """Returns statistics for a projection."""
+
+        if (calculation, dim) not in self.statistics:
+            self.statistics[(calculation, dim)] = computeStatistics(
+                self.getProjection(calculation, dim)
+            )
+
+        return self.statistics[(calculation, dim)]
+
+
+def getBlocks(data: np.ndarray, max_block_bytes: int=MAX_BLOCK_BYTES):
+    """Yields views of consecutive blocks along the first dimension."""
+
+    row_bytes = max(1, data[:1].nbytes)
+    n_rows = max(1, max_block_bytes // row_bytes)
+    for i in range(0, data.shape[0], n_rows):
+        yield data[i:i + n_rows]
+
+
+def createProjections(
+    data: np.ndarray,
+    max_block_bytes: int=MAX_BLOCK_BYTES
+) -> Projections:
+    """Returns projections of an entire array in a single blocked pass."""
+
+    projections = Projections(frame_shape=data.shape[1:])
+    for block in getBlocks(data, max_block_bytes):
+        projections.update(block)
+
+    return projections
+
+
+def createSparseProjections(store) -> Projections:
+    """Returns projections of a SparseFrameStore from its stored pixels."""
+
+    projections = Projections()
+    for calculation in projections.calculations:
+        for dim in (0, 1, 2):
+            projection = store.getProjection(calculation, dim)
+            if dim == 0:
+                projections.projections[(calculation, dim)] = projection
+            else:
+                projections.blocks[(calculation, dim)] = [projection]
+
+    return projections
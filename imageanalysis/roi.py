@@ -0,0 +1,491 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import numpy as np
+
+from imageanalysis.frames import FrameStore, SparseFrameStore
+from imageanalysis.structures import Curve, Scan
+
+
+# Upper bound on the number of values gathered at once during a reduction
+MAX_BLOCK_SIZE = 2 ** 24
+
+
+def createPolygonMask(vertices: np.ndarray, shape: tuple) -> np.ndarray:
+    """Rasterizes a polygon into a boolean mask.
+
+    - Vertices are given in fractional pixel (index) coordinates
+    - A pixel is included if its center lies inside the polygon
+    """
+
+    vertices = np.asarray(vertices, dtype=np.float64)
+    mask = np.zeros(shape, dtype=bool)
+    if len(vertices) < 3:
+        return mask
+
+    # Polygon edges
+    x_0, y_0 = vertices[:, 0], vertices[:, 1]
+    x_1, y_1 = np.roll(x_0, -1), np.roll(y_0, -1)
+
+    # Scanlines through pixel centers along the second axis
+    j_min = max(int(np.floor(np.amin(y_0))), 0)
+    j_max = min(int(np.ceil(np.amax(y_0))), shape[1])
+    if j_min >= j_max:
+        return mask
+    rows = np.arange(j_min, j_max)
+    y_c = rows[:, np.newaxis] + 0.5
+
+    # Intersections between every scanline and every edge
+    crosses = (y_0 <= y_c) != (y_1 <= y_c)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_c = x_0 + (y_c - y_0) * (x_1 - x_0) / (y_1 - y_0)
+    x_c = np.where(crosses, x_c, np.inf)
+    x_c.sort(axis=1)
+
+    # Even-odd rule: pixels between consecutive intersection pairs are filled
+    starts, stops = x_c[:, 0::2], x_c[:, 1::2]
+    n_pairs = min(starts.shape[1], stops.shape[1])
+    starts, stops = starts[:, :n_pairs], stops[:, :n_pairs]
+    valid = np.isfinite(stops)
+    row_index = np.broadcast_to(rows[:, np.newaxis], starts.shape)[valid]
+    i_start = np.clip(np.ceil(starts[valid] - 0.5), 0, shape[0]).astype(int)
+    i_stop = np.clip(np.ceil(stops[valid] - 0.5), 0, shape[0]).astype(int)
+
+    # Spans are filled with a cumulative sum over a difference array
+    spans = np.zeros((shape[0] + 1, shape[1]), dtype=np.int32)
+    np.add.at(spans, (i_start, row_index), 1)
+    np.add.at(spans, (i_stop, row_index), -1)
+    mask[:] = np.cumsum(spans, axis=0)[:-1] > 0
+
+    return mask
+
+
+def reduceMaskedStack(
+    stack: np.ndarray,
+    mask: np.ndarray,
+    calculation: str="sum"
+) -> np.ndarray:
+    """Reduces the masked region of every image in a stack to one value.
+
+    - Stack is indexed as (image, x, y) and mask as (x, y)
+    - Calculation can be "sum", "mean", or "max"
+    - Sparse frame stores are reduced from their stored pixels
+    """
+
+    if calculation not in ["sum", "mean", "max"]:
+        raise ValueError("Calculation type not valid.")
+    if isinstance(stack, SparseFrameStore):
+        return stack.reduceMasked(mask, calculation)
+
+    n_images = stack.shape[0]
+    result = np.zeros(n_images, dtype=np.float64)
+    if not np.any(mask):
+        return result
+
+    # Only the bounding box of the mask is visited
+    x_idx, y_idx = np.nonzero(mask)
+    x_0, x_1 = np.amin(x_idx), np.amax(x_idx) + 1
+    y_0, y_1 = np.amin(y_idx), np.amax(y_idx) + 1
+    sub_mask = mask[x_0:x_1, y_0:y_1]
+    n_masked = len(x_idx)
+
+    # Images are reduced in blocks to bound the size of temporaries
+    block_size = max(1, MAX_BLOCK_SIZE // n_masked)
+    for i in range(0, n_images, block_size):
+        block = stack[i:i + block_size, x_0:x_1, y_0:y_1]
+        values = block[:, sub_mask]
+        if calculation == "max":
+            result[i:i + block_size] = np.amax(values, axis=1)
+        else:
+            result[i:i + block_size] = np.sum(values, axis=1)
+
+    if calculation == "mean":
+        result /= n_masked
+
+    return result
+
+
+def getLinePoints(start: tuple, end: tuple) -> np.ndarray:
+    """Returns pixel indices sampled at unit steps along a line segment.
+
+    - Endpoints are given in fractional pixel (index) coordinates
+    - Returns a (2, n) array of x and y indices
+    """
+
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    length = np.hypot(*(end - start))
+    n_pts = int(length)
+    if n_pts == 0:
+        return np.zeros((2, 0), dtype=int)
+
+    direction = (end - start) / length
+    steps = np.arange(n_pts)
+    points = start[:, np.newaxis] + direction[:, np.newaxis] * steps
+
+    return np.floor(points).astype(int)
+
+
+def sampleLine(stack: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Returns values along a line for every image in a stack.
+
+    - Stack is indexed as (image, x, y)
+    - Points outside of the image are given a value of 0
+    """
+
+    x, y = points
+    inside = (0 <= x) & (x < stack.shape[1]) & (0 <= y) & (y < stack.shape[2])
+    values = np.zeros((stack.shape[0], len(x)), dtype=stack.dtype)
+    values[:, inside] = stack[:, x[inside], y[inside]]
+
+    return values
+
+
+def getLineCoords(coords: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """Returns coordinates at given indices, with NaN outside of bounds."""
+
+    coords = np.asarray(coords, dtype=np.float64)
+    inside = (0 <= idx) & (idx < len(coords))
+    line_coords = np.full(len(idx), np.nan)
+    line_coords[inside] = coords[idx[inside]]
+
+    return line_coords
+
+
+def toPixelIndices(
+    points: list,
+    x_coords: np.ndarray,
+    y_coords: np.ndarray
+) -> np.ndarray:
+    """Converts points from coordinates to fractional pixel indices.
+
+    Pixel i covers [coords[i], coords[i + 1]), as in ImagePlot.
+    """
+
+    points = np.asarray(points, dtype=np.float64)
+    x_idx = (points[:, 0] - x_coords[0]) / (x_coords[1] - x_coords[0])
+    y_idx = (points[:, 1] - y_coords[0]) / (y_coords[1] - y_coords[0])
+
+    return np.stack([x_idx, y_idx], axis=1)
+
+
+class ROI:
+    """Base class for GUI-free ROI geometries.
+
+    - Geometry is given in the coordinates of the two image dimensions
+    - dim_order follows GriddedDataController: the first two dimensions form
+      the image and the last dimension is the stack
+    - calculation reduces values to a curve ("sum", "mean", or "max")
+    - Area ROIs define getMask, which returns the image pixels inside them
+    """
+
+    def __init__(
+        self,
+        dim_order: tuple=(0, 1, 2),
+        calculation: str="sum"
+    ) -> None:
+
+        if sorted(dim_order) != [0, 1, 2]:
+            raise ValueError("Invalid dimension order.")
+        if calculation not in ["sum", "mean", "max"]:
+            raise ValueError("Calculation type not valid.")
+
+        self.dim_order = tuple(dim_order)
+        self.calculation = calculation
+
+
+class LineROI(ROI):
+    """Line segment between two points.
+
+    If index is given, the curve holds the values along the line in that
+    image. Otherwise, values along the line are reduced over the stack.
+    """
+
+    def __init__(
+        self,
+        start: tuple,
+        end: tuple,
+        dim_order: tuple=(0, 1, 2),
+        calculation: str="sum",
+        index: int=None
+    ) -> None:
+        super(LineROI, self).__init__(dim_order, calculation)
+
+        self.start = tuple(start)
+        self.end = tuple(end)
+        self.index = index
+
+
+class BoxROI(ROI):
+    """Axis-aligned rectangle given by its bounds in each image dimension."""
+
+    def __init__(
+        self,
+        x_range: tuple,
+        y_range: tuple,
+        dim_order: tuple=(0, 1, 2),
+        calculation: str="sum"
+    ) -> None:
+        super(BoxROI, self).__init__(dim_order, calculation)
+
+        self.x_range = (min(x_range), max(x_range))
+        self.y_range = (min(y_range), max(y_range))
+
+    def getMask(self, x_coords: np.ndarray, y_coords: np.ndarray) -> np.ndarray:
+        """Returns a boolean mask of the image pixels inside the box."""
+
+        (x_0, x_1), (y_0, y_1) = self.x_range, self.y_range
+        vertices = [(x_0, y_0), (x_1, y_0), (x_1, y_1), (x_0, y_1)]
+        vertices = toPixelIndices(vertices, x_coords, y_coords)
+
+        return createPolygonMask(vertices, (len(x_coords), len(y_coords)))
+
+
+class RadialROI(ROI):
+    """Circle (or ring, if inner_radius is given) around a center point."""
+
+    def __init__(
+        self,
+        center: tuple,
+        radius: float,
+        inner_radius: float=0.0,
+        dim_order: tuple=(0, 1, 2),
+        calculation: str="sum"
+    ) -> None:
+        super(RadialROI, self).__init__(dim_order, calculation)
+
+        if radius <= inner_radius:
+            raise ValueError("Radius must be larger than inner radius.")
+
+        self.center = tuple(center)
+        self.radius = radius
+        self.inner_radius = inner_radius
+
+    def getMask(self, x_coords: np.ndarray, y_coords: np.ndarray) -> np.ndarray:
+        """Returns a boolean mask of the image pixels inside the circle."""
+
+        x_c, y_c = _getPixelCenters(x_coords), _getPixelCenters(y_coords)
+        r_2 = (
+            (x_c[:, np.newaxis] - self.center[0]) ** 2 +
+            (y_c[np.newaxis, :] - self.center[1]) ** 2
+        )
+
+        return (self.inner_radius ** 2 <= r_2) & (r_2 <= self.radius ** 2)
+
+
+class PolygonROI(ROI):
+    """Closed polygon given by its vertices."""
+
+    def __init__(
+        self,
+        vertices: list,
+        dim_order: tuple=(0, 1, 2),
+        calculation: str="sum"
+    ) -> None:
+        super(PolygonROI, self).__init__(dim_order, calculation)
+
+        if len(vertices) < 3:
+            raise ValueError("A polygon requires at least three vertices.")
+
+        self.vertices = [tuple(v) for v in vertices]
+
+    def getMask(self, x_coords: np.ndarray, y_coords: np.ndarray) -> np.ndarray:
+        """Returns a boolean mask of the image pixels inside the polygon."""
+
+        vertices = toPixelIndices(self.vertices, x_coords, y_coords)
+
+        return createPolygonMask(vertices, (len(x_coords), len(y_coords)))
+
+
+def apply(
+    roi: ROI,
+    scan_or_volume,
+    data_type: str="raw",
+    coords: list=None,
+    labels: list=None
+) -> Curve:
+    """Applies an ROI to a scan or a 3D array and returns a Curve.
+
+    - For a Scan, data_type selects "raw" or "gridded" data
+    - For an array, coords and labels describe each dimension and default
+      to pixel indices
+    """
+
+    volume, coords, labels = _getVolume(
+        scan_or_volume, data_type, coords, labels
+    )
+
+    # Stack is indexed as (image, x, y) for the ROI's dimension order
+    # Frame stores are already indexed as (t, x, y)
+    dim_order = roi.dim_order
+    if isinstance(volume, FrameStore) and tuple(dim_order) == (0, 1, 2):
+        stack = volume
+    else:
+        if isinstance(volume, FrameStore):
+            volume = np.moveaxis(np.asarray(volume), 0, 2)
+        stack = np.moveaxis(np.transpose(volume, dim_order), 2, 0)
+    x_coords, y_coords = coords[dim_order[0]], coords[dim_order[1]]
+    stack_coords = np.asarray(coords[dim_order[2]])
+
+    if isinstance(roi, LineROI):
+        start, end = toPixelIndices([roi.start, roi.end], x_coords, y_coords)
+        points = getLinePoints(start, end)
+        if roi.index is not None:
+            values = sampleLine(stack[roi.index:roi.index + 1], points)[0]
+        else:
+            values = _reduce(sampleLine(stack, points), roi.calculation)
+
+        # Points outside of the image are given NaN coordinates
+        curve_coords = [None, None, None]
+        curve_coords[dim_order[0]] = getLineCoords(x_coords, points[0])
+        curve_coords[dim_order[1]] = getLineCoords(y_coords, points[1])
+        if roi.index is not None:
+            stack_value = stack_coords[roi.index]
+        else:
+            stack_value = np.mean(stack_coords)
+        curve_coords[dim_order[2]] = np.full(len(values), stack_value)
+    else:
+        mask = roi.getMask(x_coords, y_coords)
+        values = reduceMaskedStack(stack, mask, roi.calculation)
+
+        # Centroid of the mask is used for the image dimensions
+        curve_coords = [None, None, None]
+        for i, (idx, dim_coords) in enumerate(
+            zip(np.nonzero(mask), (x_coords, y_coords))
+        ):
+            center = dim_coords[int(np.mean(idx))] if len(idx) else np.nan
+            curve_coords[dim_order[i]] = np.full(len(values), center)
+        curve_coords[dim_order[2]] = stack_coords
+
+    metadata = {"roi": type(roi).__name__, "calculation": roi.calculation}
+    if isinstance(scan_or_volume, Scan):
+        metadata.update({"scan": scan_or_volume.number, "data": data_type})
+
+    return Curve(
+        data=values,
+        labels=list(labels),
+        coords=curve_coords,
+        metadata=metadata
+    )
+
+
+def applyToScans(
+    roi: ROI,
+    scans: list,
+    data_type: str="raw",
+    max_workers: int=None
+) -> list:
+    """Applies an ROI to every scan in a list in parallel.
+
+    - Scan data that is not loaded yet is loaded (and gridded) as needed
+      and released afterwards to keep memory bounded
+    - Scans are gridded with their current grid parameters
+    - Returns a list of Curves in the same order as the scans
+    """
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        curves = executor.map(
+            lambda scan: _applyToScan(roi, scan, data_type), scans
+        )
+        return list(curves)
+
+
+def _applyToScan(roi: ROI, scan: Scan, data_type: str) -> Curve:
+    """Loads data for a single scan if needed and applies an ROI."""
+
+    loaded = {
+        "raw_data": scan.raw_data is None,
+        "rsm": scan.rsm is None and data_type == "gridded",
+        "grid_data": scan.grid_data is None and data_type == "gridded"
+    }
+
+    if loaded["raw_data"]:
+        scan.loadRawData()
+    if loaded["rsm"]:
+        # Mapping resets grid parameters to the bounds of the RSM
+        grid_params = copy.deepcopy(scan.grid_params)
+        scan.map()
+        scan.grid_params = grid_params
+    if loaded["grid_data"]:
+        scan.grid()
+
+    try:
+        curve = apply(roi, scan, data_type)
+    finally:
+        for attr in loaded.keys():
+            if loaded[attr]:
+                setattr(scan, attr, None)
+        if loaded["grid_data"]:
+            scan.grid_slicer = None
+
+    return curve
+
+
+def _getVolume(
+    scan_or_volume,
+    data_type: str,
+    coords: list,
+    labels: list
+) -> tuple:
+    """Returns a 3D array with coordinates and labels for each dimension."""
+
+    if isinstance(scan_or_volume, Scan):
+        scan = scan_or_volume
+        if data_type == "raw":
+            if scan.raw_data is None:
+                raise ValueError("Raw data has not been loaded.")
+            # Raw data is stored as (t, x, y)
+            # Frame stores are returned as they are, see apply
+            if isinstance(scan.raw_data, FrameStore):
+                volume = scan.raw_data
+                coords = [
+                    np.arange(n) for n in volume.shape[1:] + volume.shape[:1]
+                ]
+            else:
+                volume = np.moveaxis(scan.raw_data, 0, 2)
+                coords = [np.arange(n) for n in volume.shape]
+            labels = ["x", "y", "t"]
+        elif data_type == "gridded":
+            if scan.grid_data is None:
+                raise ValueError("Scan has not been gridded.")
+            volume = scan.grid_data
+            coords = scan.grid_coords
+            labels = ["H", "K", "L"]
+        else:
+            raise ValueError("Data type not valid.")
+    else:
+        volume = np.asarray(scan_or_volume)
+        if volume.ndim != 3:
+            raise ValueError("Volume must be a 3D array.")
+        if coords is None:
+            coords = [np.arange(n) for n in volume.shape]
+        if labels is None:
+            labels = ["x", "y", "z"]
+
+    return volume, coords, labels
+
+
+def _reduce(values: np.ndarray, calculation: str) -> np.ndarray:
+    """Reduces a 2D array along its first axis."""
+
+    if calculation == "sum":
+        return np.sum(values, axis=0)
+    elif calculation == "mean":
+        return np.mean(values, axis=0)
+    elif calculation == "max":
+        return np.amax(values, axis=0)
+    else:
+        raise ValueError("Calculation type not valid.")
+
+
+def _getPixelCenters(coords: np.ndarray) -> np.ndarray:
+    """Returns the coordinate at the center of every pixel."""
+
+    coords = np.asarray(coords, dtype=np.float64)
+
+    return coords + (coords[1] - coords[0]) / 2
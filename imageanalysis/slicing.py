@@ -0,0 +1,382 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# Largest array that is copied into a contiguous layout for the active order
+MAX_CONTIGUOUS_BYTES = 2 ** 30
+
+
+class GridSlicer:
+    """Returns 2D slices of a 3D array for any dimension order.
+
+    - dim_order follows GriddedDataController: the first two dimensions form
+      the image and the last dimension is sliced
+    - One transposed view is cached for every dimension order
+    - For the active order, a contiguous copy indexed as (slice, x, y) is
+      kept when the array is small enough, so every slice is a single block
+      of memory instead of a strided gather across the whole array
+    - The copy can be made on a background thread; slices are taken from
+      the strided view until it is ready
+    - Arrays larger than max_contiguous_bytes are always sliced from the
+      strided view, which is logged once per slicer
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        coords: list=None,
+        max_contiguous_bytes: int=MAX_CONTIGUOUS_BYTES
+    ) -> None:
+
+        self.data = data
+        self.coords = coords
+        self.max_contiguous_bytes = max_contiguous_bytes
+        self.views = {} # Transposed views, keyed by dimension order
+        self.stacks = {} # Views indexed as (slice, x, y)
+        self.inverse_orders = {} # Original dimension of each view dimension
+        self.active_order = None
+        self.contiguous_stack = None # Contiguous copy for the active order
+        self.contiguous_order = None # Dimension order of the contiguous copy
+        self.lock = threading.Lock()
+        self.executor = None # Single worker for background copies
+        self.copy_future = None # Future of the latest background copy
+        self.logged_fallback = False
+
+    def getView(self, dim_order: tuple) -> np.ndarray:
+        """Returns a view of the data transposed to a dimension order."""
+
+        dim_order = tuple(dim_order)
+        if dim_order not in self.views:
+            self.views[dim_order] = np.transpose(self.data, dim_order)
+
+        return self.views[dim_order]
+
+    def getStack(self, dim_order: tuple) -> np.ndarray:
+        """Returns the data indexed as (slice, x, y) for a dimension order."""
+
+        dim_order = tuple(dim_order)
+        with self.lock:
+            if dim_order == self.contiguous_order:
+                return self.contiguous_stack
+        if dim_order not in self.stacks:
+            self.stacks[dim_order] = np.moveaxis(self.getView(dim_order), 2, 0)
+
+        return self.stacks[dim_order]
+
+    def getSlice(self, dim_order: tuple, index: int) -> np.ndarray:
+        """Returns a 2D slice at an index along the last dimension."""
+
+        return self.getStack(dim_order)[index]
+
+    def getIndices(
+        self,
+        dim_order: tuple,
+        x: int,
+        y: int,
+        index: int
+    ) -> tuple:
+        """Maps an (x, y, slice) position to indices of the original data."""
+
+        dim_order = tuple(dim_order)
+        if dim_order not in self.inverse_orders:
+            self.inverse_orders[dim_order] = tuple(np.argsort(dim_order))
+        position = (x, y, index)
+
+        return tuple(position[i] for i in self.inverse_orders[dim_order])
+
+    def getValue(self, dim_order: tuple, x: int, y: int, index: int) -> float:
+        """Returns the single element at an (x, y, slice) position."""
+
+        return self.data[self.getIndices(dim_order, x, y, index)]
+
+    def setActiveOrder(
+        self,
+        dim_order: tuple,
+        contiguous: bool=True,
+        background: bool=False
+    ) -> None:
+        """Sets the dimension order that is sliced most often.
+
+        A contiguous copy is made for the new order if requested and if the
+        data is no larger than max_contiguous_bytes. With background, the
+        copy is made on a worker thread so the caller is not blocked.
+        """
+
+        dim_order = tuple(dim_order)
+        with self.lock:
+            if dim_order == self.active_order and (
+                dim_order == self.contiguous_order or not contiguous or
+                (self.copy_future is not None and not self.copy_future.done())
+            ):
+                return
+
+            # Previous copy is released before a new one is made
+            self.active_order = dim_order
+            self.contiguous_stack = None
+            self.contiguous_order = None
+
+        if not contiguous:
+            return
+        if self.data.nbytes > self.max_contiguous_bytes:
+            if not self.logged_fallback:
+                logger.info(
+                    f"Grid of {self.data.nbytes} bytes is larger than "
+                    f"{self.max_contiguous_bytes} bytes, so slices are "
+                    "gathered from strided views."
+                )
+                self.logged_fallback = True
+            return
+
+        if background:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1)
+            self.copy_future = self.executor.submit(
+                self._setContiguousStack, dim_order
+            )
+        else:
+            self._setContiguousStack(dim_order)
+
+    def _setContiguousStack(self, dim_order: tuple) -> None:
+        """Copies the stack of an order if it is still the active order."""
+
+        # Copies queued behind a later order change are skipped
+        if dim_order != self.active_order:
+            return
+        stack = np.ascontiguousarray(
+            np.moveaxis(self.getView(dim_order), 2, 0)
+        )
+        with self.lock:
+            if dim_order == self.active_order:
+                self.contiguous_stack = stack
+                self.contiguous_order = dim_order
+
+
+# Largest number of plane points interpolated at once
+MAX_CHUNK_POINTS = 2 ** 18
+
+
+class ObliquePlane:
+    """Sampling geometry of a plane through an HKL grid.
+
+    - The plane holds every point where normal . (h, k, l) = offset
+    - Pixel (i, j) is centered at center + u_coords[i] * u + v_coords[j] * v
+    - u and v are orthonormal, so an L plane (0, 0, 1) is sampled along H
+      and K like an axis-aligned slice
+    - Pixel spacing follows the grid spacing along each in-plane axis, up
+      to max_size pixels along each axis
+    """
+
+    def __init__(
+        self,
+        normal: tuple,
+        offset: float,
+        coords: list,
+        shape: tuple=None,
+        max_size: int=1024
+    ) -> None:
+
+        normal = np.asarray(normal, dtype=float)
+        norm = np.linalg.norm(normal)
+        if norm == 0 or not np.isfinite(norm):
+            raise ValueError("Plane normal must be a nonzero vector.")
+
+        self.normal = normal
+        self.offset = float(offset)
+
+        # Point on the plane closest to the center of the grid
+        lower = np.array([np.min(c) for c in coords], dtype=float)
+        upper = np.array([np.max(c) for c in coords], dtype=float)
+        grid_center = (lower + upper) / 2
+        self.center = grid_center + (
+            (self.offset - normal @ grid_center) / norm ** 2 * normal
+        )
+
+        # In-plane axes, starting from the grid axis least aligned with normal
+        unit_normal = normal / norm
+        axis = np.zeros(3)
+        axis[np.argmin(np.abs(unit_normal))] = 1
+        u = axis - (axis @ unit_normal) * unit_normal
+        self.u = u / np.linalg.norm(u)
+        self.v = np.cross(unit_normal, self.u)
+
+        # Extent of the grid box projected onto the plane
+        corners = np.array(
+            [[(lower, upper)[b][d] for d, b in enumerate(bits)]
+             for bits in np.ndindex(2, 2, 2)]
+        ) - self.center
+        u_range = (np.min(corners @ self.u), np.max(corners @ self.u))
+        v_range = (np.min(corners @ self.v), np.max(corners @ self.v))
+
+        if shape is None:
+            # Each pixel step moves at most one voxel along every grid axis
+            spacing = np.array([
+                abs(c[1] - c[0]) if len(c) > 1 and c[1] != c[0] else np.inf
+                for c in coords
+            ])
+            shape = []
+            for axis, (lo, hi) in [(self.u, u_range), (self.v, v_range)]:
+                with np.errstate(divide="ignore"):
+                    step = np.min(spacing / np.abs(axis))
+                if not np.isfinite(step):
+                    step = hi - lo
+                shape.append(min(max_size, np.ceil((hi - lo) / step) + 1))
+        self.shape = tuple(max(2, int(n)) for n in shape)
+
+        self.u_coords = np.linspace(*u_range, self.shape[0])
+        self.v_coords = np.linspace(*v_range, self.shape[1])
+
+    def getKey(self) -> tuple:
+        """Returns a hashable description of the plane."""
+
+        return (tuple(self.normal), self.offset, self.shape)
+
+    def getHKL(self, i: int, j: int) -> np.ndarray:
+        """Returns HKL coordinates of a pixel center."""
+
+        return self.center + self.u_coords[i] * self.u + self.v_coords[j] * self.v
+
+
+class ObliqueSlicer:
+    """Samples planes of any orientation from a 3D grid.
+
+    - Values are trilinearly interpolated in chunks of plane points, so
+      temporaries scale with the plane rather than the grid
+    - Points outside the grid are set to fill_value
+    - Recently sampled planes are cached for repeated renders
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        coords: list,
+        fill_value: float=0.0,
+        max_chunk_points: int=MAX_CHUNK_POINTS,
+        cache_size: int=8
+    ) -> None:
+
+        self.data = data
+        self.coords = coords
+        self.fill_value = fill_value
+        self.max_chunk_points = max_chunk_points
+        self.cache_size = cache_size
+        self.cache = {} # Sampled images, oldest first
+
+        self.origin = np.array([c[0] for c in coords], dtype=float)
+        self.spacing = np.array(
+            [(c[-1] - c[0]) / (len(c) - 1) if len(c) > 1 else 1.0
+             for c in coords],
+            dtype=float
+        )
+        self.spacing[self.spacing == 0] = 1.0
+        self.last_index = np.array(data.shape) - 1
+
+    def getPlane(
+        self,
+        normal: tuple,
+        offset: float,
+        shape: tuple=None
+    ) -> ObliquePlane:
+        """Returns the sampling geometry for a plane through the grid."""
+
+        return ObliquePlane(normal, offset, self.coords, shape)
+
+    def getImage(self, plane: ObliquePlane) -> np.ndarray:
+        """Returns the image of a plane, indexed as (u, v)."""
+
+        key = plane.getKey()
+        if key in self.cache:
+            # Moves cached image to the newest position
+            self.cache[key] = self.cache.pop(key)
+            return self.cache[key]
+
+        n_u, n_v = plane.shape
+        dtype = np.result_type(self.data.dtype, np.float32)
+        image = np.empty((n_u, n_v), dtype=dtype)
+        n_rows = max(1, self.max_chunk_points // n_v)
+        for i in range(0, n_u, n_rows):
+            u_coords = plane.u_coords[i:i + n_rows]
+            points = (
+                plane.center
+                + u_coords[:, np.newaxis, np.newaxis] * plane.u
+                + plane.v_coords[np.newaxis, :, np.newaxis] * plane.v
+            )
+            image[i:i + n_rows] = self.interpolate(
+                points.reshape(-1, 3)
+            ).reshape(len(u_coords), n_v)
+
+        self.cache[key] = image
+        while len(self.cache) > self.cache_size:
+            self.cache.pop(next(iter(self.cache)))
+
+        return image
+
+    def interpolate(self, points: np.ndarray) -> np.ndarray:
+        """Returns trilinearly interpolated values at (n, 3) HKL points."""
+
+        position = (points - self.origin) / self.spacing
+        inside = np.all(
+            (position >= 0) & (position <= self.last_index), axis=1
+        )
+        values = np.full(len(points), self.fill_value, dtype=np.float64)
+        position = position[inside]
+
+        # Lower corner of each cell, kept inside the grid at its far edges
+        lower = np.minimum(
+            np.floor(position).astype(np.intp),
+            np.maximum(self.last_index - 1, 0)
+        )
+        weight = position - lower
+        weights = [1 - weight, weight]
+
+        # Corners are gathered by flat index, which avoids a three array
+        # fancy index for each corner. Non-contiguous data is indexed
+        # directly, since flattening it would copy the whole grid.
+        flat_data = None
+        if self.data.flags["C_CONTIGUOUS"]:
+            flat_data = self.data.reshape(-1)
+            strides = np.cumprod([1, *self.data.shape[:0:-1]])[::-1]
+        elif self.data.flags["F_CONTIGUOUS"]:
+            flat_data = self.data.reshape(-1, order="F")
+            strides = np.cumprod([1, *self.data.shape[:2]])
+        base = lower @ strides if flat_data is not None else None
+
+        result = np.zeros(len(position))
+        for corner in np.ndindex(2, 2, 2):
+            corner_weight = (
+                weights[corner[0]][:, 0]
+                * weights[corner[1]][:, 1]
+                * weights[corner[2]][:, 2]
+            )
+            # Grid dimensions of length 1 have no upper neighbor
+            step = np.minimum(corner, self.last_index)
+            if flat_data is not None:
+                corner_values = flat_data[base + step @ strides]
+            else:
+                index = lower + step
+                corner_values = self.data[index[:, 0], index[:, 1], index[:, 2]]
+            result += corner_weight * corner_values
+        values[inside] = result
+
+        return values
+
+
+def getOffsetRange(normal: tuple, coords: list) -> tuple:
+    """Returns the range of plane offsets that intersect a grid."""
+
+    values = [
+        np.dot(normal, [(np.min(c), np.max(c))[b] for c, b in zip(coords, bits)])
+        for bits in np.ndindex(2, 2, 2)
+    ]
+
+    return (float(min(values)), float(max(values)))
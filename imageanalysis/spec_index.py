@@ -0,0 +1,292 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import json
+import os
+
+
+# Saved indexes are named after their SPEC file with this suffix
+INDEX_SUFFIX = ".index.json"
+# Saved indexes with a different version are rebuilt
+INDEX_VERSION = 1
+
+# Control keys that start a section, as in spec2nexus
+SECTION_KEYS = (b"#E", b"#F", b"#S")
+
+
+class SpecFileIndex:
+    """Byte offsets of the header and scan sections of a SPEC file.
+
+    - Sections start with #E, #F, or #S control lines, as in spec2nexus
+    - The index is built in one pass over the file and saved next to it,
+      then reused until the file's size or modification time changes
+    - If the file has only grown, indexing resumes from its last scan
+    - Scans are parsed with spec2nexus only when requested
+    """
+
+    def __init__(
+        self,
+        path: str,
+        index_path: str=None,
+        persist: bool=True
+    ) -> None:
+
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Path '{path}' not found.")
+
+        self.path = path
+        self.index_path = index_path or path + INDEX_SUFFIX
+        self.persist = persist
+        self.size = 0
+        self.mtime_ns = 0
+        self.headers = [] # (offset, length) of each #E section
+        self.scans = {} # Scan sections, keyed by scan number
+        self.parsed = {} # Parsed scans, keyed by scan number
+
+        self.update()
+
+    def update(self) -> bool:
+        """Brings the index up to date with the file.
+
+        - Returns whether the file changed
+        """
+
+        stat = os.stat(self.path)
+        if (stat.st_size, stat.st_mtime_ns) == (self.size, self.mtime_ns):
+            return False
+
+        if self.size == 0 and self.persist:
+            self._load()
+            if (stat.st_size, stat.st_mtime_ns) == (self.size, self.mtime_ns):
+                return True
+
+        self._build(stat)
+        if self.persist:
+            self._save()
+
+        return True
+
+    def isValid(self) -> bool:
+        """Checks if the file has any SPEC header or scan sections."""
+
+        return len(self.headers) > 0 or len(self.scans) > 0
+
+    def getScanNumbers(self) -> list:
+        """Returns scan numbers sorted by number, as in spec2nexus."""
+
+        try:
+            return sorted(self.scans.keys(), key=int)
+        except ValueError:
+            return sorted(self.scans.keys(), key=float)
+
+    def getScanCommand(self, scan_number) -> str:
+        """Returns the command of a scan from its #S line."""
+
+        return self.scans[str(scan_number)]["command"]
+
+    def getNumberOfPoints(self, scan_number) -> int:
+        """Returns the number of data lines in a scan."""
+
+        return self.scans[str(scan_number)]["n_pts"]
+
+    def getScan(self, scan_number):
+        """Returns a parsed spec2nexus SpecDataFileScan, or None if missing.
+
+        - Only the scan's section and its header section are read
+        """
+
+        scan_number = str(scan_number)
+        if scan_number not in self.scans:
+            return None
+        if scan_number not in self.parsed:
+            self.parsed[scan_number] = self._parseScan(scan_number)
+
+        return self.parsed[scan_number]
+
+    def _readSection(self, offset: int, length: int) -> str:
+        """Returns the text of a section with line endings normalized."""
+
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            buf = f.read(length).decode("utf-8", errors="replace")
+
+        # Sections are joined lines, as in SpecDataFile.dissect_file
+        buf = buf.replace("\r\n", "\n").replace("\r", "\n")
+        if buf.endswith("\n"):
+            buf = buf[:-1]
+
+        return buf
+
+    def _parseScan(self, scan_number: str):
+        """Parses one scan and its header section with spec2nexus."""
+
+        from spec2nexus import spec
+        from spec2nexus.control_lines import control_line_registry
+
+        entry = self.scans[scan_number]
+        spec_data = spec.SpecDataFile(None)
+        spec_data.fileName = self.path
+        spec_data.specFile = self.path
+
+        sections = []
+        if entry["header"] is not None:
+            sections.append(self._readSection(*self.headers[entry["header"]]))
+        sections.append(self._readSection(entry["offset"], entry["length"]))
+
+        # Follows SpecDataFile.read for these two sections
+        for section in sections:
+            key = control_line_registry.get_control_key(section.splitlines()[0])
+            control_line_registry.process(key, section, spec_data)
+        spec_scan = list(spec_data.scans.values())[-1]
+        for line in spec_scan.raw.splitlines()[1:]:
+            if len(line) > 0 and line.split()[0] == "#D":
+                control_line_registry.process("#D", line, spec_scan)
+                break
+
+        # Repeated scan numbers are suffixed in file order, as in spec2nexus
+        spec_scan.scanNum = scan_number
+
+        return spec_scan
+
+    def _build(self, stat: os.stat_result) -> None:
+        """Indexes the file, resuming from the last scan if it has grown."""
+
+        start = 0
+        scans = list(self.scans.items())
+        if 0 < self.size < stat.st_size and len(scans) > 0 and \
+                self._isScanStart(scans[-1][1]):
+            # Last scan may have grown, so it is indexed again
+            number, entry = scans[-1]
+            del self.scans[number]
+            self.parsed.pop(number, None)
+            start = entry["offset"]
+        else:
+            self.headers = []
+            self.scans = {}
+            self.parsed = {}
+
+        section = None # Section being read: [key, offset, n_pts, command]
+        offset = start
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                stripped = line.strip()
+                if stripped[:1] == b"#":
+                    key = stripped.split(None, 1)[0]
+                    if key in SECTION_KEYS:
+                        self._addSection(section, offset)
+                        command = stripped[2:].decode(
+                            "utf-8", errors="replace"
+                        ).strip()
+                        section = [key, offset, 0, command]
+                elif len(stripped) > 0 and stripped[:1] != b"@":
+                    if section is not None:
+                        section[2] += 1
+                offset += len(line)
+        self._addSection(section, offset)
+
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+
+    def _addSection(self, section: list, end: int) -> None:
+        """Adds a finished section to the index."""
+
+        if section is None:
+            return
+
+        key, offset, n_pts, command = section
+        if key == b"#E":
+            self.headers.append((offset, end - offset))
+        elif key == b"#S":
+            number = command.split()[0] if len(command.split()) > 0 else ""
+            if number in self.scans:
+                # Lowest unused suffix, as in spec2nexus
+                i = 1
+                while f"{number}.{i}" in self.scans:
+                    i += 1
+                number = f"{number}.{i}"
+            self.scans[number] = {
+                "offset": offset,
+                "length": end - offset,
+                "header": len(self.headers) - 1 if self.headers else None,
+                "n_pts": n_pts,
+                "command": command.split(None, 1)[1].strip()
+                    if len(command.split(None, 1)) > 1 else ""
+            }
+
+    def _isScanStart(self, entry: dict) -> bool:
+        """Checks if a scan section still starts where it was indexed."""
+
+        with open(self.path, "rb") as f:
+            f.seek(entry["offset"])
+            line = f.readline()
+
+        line = line.decode("utf-8", errors="replace").strip()
+
+        return line.startswith("#S") and line.endswith(entry["command"])
+
+    def _load(self) -> None:
+        """Reads a saved index, ignoring it if it is missing or outdated."""
+
+        try:
+            with open(self.index_path, "r") as f:
+                saved = json.load(f)
+            if saved["version"] != INDEX_VERSION:
+                return
+            self.headers = [tuple(h) for h in saved["headers"]]
+            self.scans = {
+                number: dict(zip(
+                    ["offset", "length", "header", "n_pts", "command"], entry
+                ))
+                for number, *entry in saved["scans"]
+            }
+            self.size = saved["size"]
+            self.mtime_ns = saved["mtime_ns"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.headers, self.scans = [], {}
+            self.size, self.mtime_ns = 0, 0
+
+    def _save(self) -> None:
+        """Saves the index next to the SPEC file, if it is writable."""
+
+        saved = {
+            "version": INDEX_VERSION,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "headers": self.headers,
+            "scans": [
+                [number, e["offset"], e["length"], e["header"], e["n_pts"],
+                 e["command"]]
+                for number, e in self.scans.items()
+            ]
+        }
+        try:
+            with open(self.index_path, "w") as f:
+                json.dump(saved, f)
+        except OSError:
+            pass # Read-only directories are indexed every time
+
+
+class LazySpecScan:
+    """Stands in for a spec2nexus SpecDataFileScan until it is needed.
+
+    - Scan number, command, and point count come from the index
+    - Any other attribute parses the scan
+    """
+
+    def __init__(self, index: SpecFileIndex, scan_number: str) -> None:
+
+        self.index = index
+        self.scanNum = str(scan_number)
+        self.scanCmd = index.getScanCommand(scan_number)
+        self.n_pts = index.getNumberOfPoints(scan_number)
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not set in __init__
+        if name == "index":
+            raise AttributeError(name)
+
+        return getattr(self.index.getScan(self.scanNum), name)
@@ -0,0 +1,112 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import numpy as np
+
+
+# Target number of values kept for histograms and percentiles
+MAX_SAMPLES = 2 ** 20
+
+
+class DataStatistics:
+    """Minimum, maximum, histogram, and percentiles of a dataset.
+
+    - Values are added with update, e.g. frame by frame while loading
+    - Minimum and maximum are exact over every value added
+    - Histogram and percentiles come from a strided sample of nonzero,
+      finite values, since zeros are displayed as empty pixels
+    """
+
+    def __init__(self, sample_step: int=1, n_bins: int=256) -> None:
+
+        self.min = None
+        self.max = None
+        self.sample_step = max(1, int(sample_step))
+        self.n_bins = n_bins
+        self.samples = [] # Sampled values from each update
+        self.sample = None # Sorted sample, built on demand
+        self.histogram = None # Counts and bin edges, built on demand
+
+    def update(self, data: np.ndarray) -> None:
+        """Adds the values of an array of any shape."""
+
+        if data.size == 0:
+            return
+
+        data_min, data_max = float(np.nanmin(data)), float(np.nanmax(data))
+        self.min = data_min if self.min is None else min(self.min, data_min)
+        self.max = data_max if self.max is None else max(self.max, data_max)
+
+        # ravel only copies if the array is not contiguous in any order
+        sample = np.ravel(data, order="K")[::self.sample_step]
+        sample = sample[np.isfinite(sample) & (sample != 0)]
+        self.samples.append(sample)
+
+        self.sample = None
+        self.histogram = None
+
+    def getSample(self) -> np.ndarray:
+        """Returns sampled values in ascending order."""
+
+        if self.sample is None:
+            if len(self.samples) == 0:
+                self.sample = np.array([])
+            else:
+                self.sample = np.sort(np.concatenate(self.samples))
+            self.samples = [self.sample]
+
+        return self.sample
+
+    def getPercentile(self, q: float) -> float:
+        """Returns a percentile (0-100) of sampled values."""
+
+        sample = self.getSample()
+        if len(sample) == 0:
+            return 0.0 if self.max is None else self.max
+
+        # Linear interpolation between closest ranks of the sorted sample
+        position = np.clip(q, 0, 100) / 100 * (len(sample) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(sample) - 1)
+
+        return float(
+            sample[lower] + (sample[upper] - sample[lower]) * (position - lower)
+        )
+
+    def getHistogram(self) -> tuple:
+        """Returns counts and bin edges of sampled values."""
+
+        if self.histogram is None:
+            sample = self.getSample()
+            if len(sample) == 0:
+                bin_range = (0, 1)
+            else:
+                bin_range = (sample[0], sample[-1])
+            self.histogram = np.histogram(
+                sample,
+                bins=self.n_bins,
+                range=bin_range
+            )
+
+        return self.histogram
+
+
+def getSampleStep(size: int, max_samples: int=MAX_SAMPLES) -> int:
+    """Returns a stride that samples at most max_samples values."""
+
+    return max(1, int(np.ceil(size / max_samples)))
+
+
+def computeStatistics(
+    data: np.ndarray,
+    max_samples: int=MAX_SAMPLES
+) -> DataStatistics:
+    """Returns statistics for an entire array."""
+
+    statistics = DataStatistics(sample_step=getSampleStep(data.size, max_samples))
+    statistics.update(data)
+
+    return statistics
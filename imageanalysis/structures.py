@@ -6,13 +6,26 @@ See LICENSE file.
 
 import numpy as np
 import os
-from PIL import Image
-from spec2nexus import spec
-from rsMap3D.datasource.InstForXrayutilitiesReader import \
-    InstForXrayutilitiesReader
-
-from imageanalysis.gridding import gridScan
-from imageanalysis.mapping import mapScan
+from typing import TYPE_CHECKING
+
+from imageanalysis.consolidation import consolidateScan, openConsolidatedScan
+from imageanalysis.frames import (
+    FrameStore, SparseFrameStore, createFrameStore
+)
+from imageanalysis.gridding import GridAccumulator, getFrameBounds, gridScan
+from imageanalysis.io import (
+    FrameIndex, getDetectorShape, readFrame, reduceFrame
+)
+from imageanalysis.projections import (
+    Projections, createSparseProjections, getBlocks
+)
+from imageanalysis.slicing import GridSlicer
+from imageanalysis.spec_index import LazySpecScan, SpecFileIndex
+from imageanalysis.statistics import DataStatistics, getSampleStep
+
+# spec2nexus, rsMap3D, and xrayutilities are imported when first used
+if TYPE_CHECKING:
+    from spec2nexus import spec
 
 
 class Project:
@@ -24,15 +37,18 @@ class Project:
     instrument_path = None # Instrument config XML
     image_path = None # Raw image directory
     name = None # Visible project name
-    spec_data = None # spec2nexus.SpecDataFile for project
+    spec_data = None # SpecFileIndex for project SPEC file
     scans = None # Dict of Scan objects for project
+    detector_shape = None # Detector pixels in each direction, read when used
+    q_bases = None # DetectorQBasis for each detector region and binning
 
     def __init__(
         self,
         project_path: str,
         spec_path: str,
         instrument_path: str,
-        detector_path: str
+        detector_path: str,
+        scan_dirs: set=None
     ) -> None:
 
         # Parameters
@@ -55,11 +71,39 @@ class Project:
         # Name
         self.name = os.path.basename(image_path)
 
-        # Creates SpecDataFile based on SPEC file contents
-        self.spec_data = spec.SpecDataFile(spec_path)
+        # Indexes SPEC file sections, scans are parsed when first used
+        self.spec_data = SpecFileIndex(spec_path)
 
         # Creates Scans
-        self._createScans()
+        # Scan directory names may come from a ProjectIndex, so the image
+        # path is not listed again
+        self._createScans(scan_dirs)
+
+    def getDetectorShape(self) -> tuple:
+        """Returns the number of pixels along each detector direction."""
+
+        if self.detector_shape is None:
+            self.detector_shape = getDetectorShape(self.detector_path)
+
+        return self.detector_shape
+
+    def getDetectorQBasis(self, roi: list=None, binning: int=1):
+        """Returns pixel directions for mapping with NumPy, see mapScan.
+
+        - Directions are computed once for each detector region and binning
+        """
+
+        from imageanalysis.mapping import createDetectorQBasis
+
+        if self.q_bases is None:
+            self.q_bases = {}
+        key = (None if roi is None else tuple(roi), binning)
+        if key not in self.q_bases:
+            self.q_bases[key] = createDetectorQBasis(
+                self.instrument_path, self.detector_path, roi, binning
+            )
+
+        return self.q_bases[key]
 
     def _validateParameters(
         self,
@@ -112,52 +156,106 @@ class Project:
         if image_path is None:
             raise NotADirectoryError(f"Path '{image_path}' not found.")
 
-    def _createScans(self) -> None:
+    def update(self) -> list:
+        """Adds scans appended since the project was created or updated.
+
+        - The SPEC file is indexed from its last scan if it has grown
+        - Scans are added once their image directory exists
+        - Point counts of scans without raw data are refreshed, since the
+          last scan may still be acquiring
+        - Returns new Scan objects
+        """
+
+        self.spec_data.update()
+
+        for scan in self.scans.values():
+            if scan.raw_data is None and \
+                    isinstance(scan.spec_scan, LazySpecScan):
+                scan.n_pts = self.spec_data.getNumberOfPoints(scan.number)
+                scan.spec_scan.n_pts = scan.n_pts
+
+        return self._addScans()
+
+    def _createScans(self, scan_dirs: set=None) -> None:
         """Creates a dict of Scan objects created from SPEC and image data."""
 
-        scans = {}
+        self.scans = {}
+        self._addScans(scan_dirs)
+
+    def _addScans(self, scan_dirs: set=None) -> list:
+        """Creates Scan objects for indexed scans that are not yet added.
+
+        - Scan directories are listed unless given
+        """
+
+        new_scans = []
+
+        # Image directory is listed once instead of checking each scan
+        if scan_dirs is None:
+            with os.scandir(self.image_path) as entries:
+                scan_dirs = {e.name for e in entries if e.is_dir()}
 
         for n in self.spec_data.getScanNumbers():
-            scan_image_path = self.image_path + f"/S{str(n).zfill(3)}"
-            spec_scan = self.spec_data.getScan(n)
+            scan_dir = f"S{str(n).zfill(3)}"
+            scan_image_path = self.image_path + f"/{scan_dir}"
 
-            if os.path.exists(scan_image_path):
+            if scan_dir in scan_dirs and int(n) not in self.scans:
+                spec_scan = LazySpecScan(self.spec_data, n)
                 scan = Scan(
                     project=self,
                     image_path=scan_image_path,
                     spec_scan=spec_scan
                 )
-                scans.update({int(n): scan})
+                self.scans.update({int(n): scan})
+                new_scans.append(scan)
+
+        return new_scans
 
-        self.scans = scans
 
 class Scan:
     """Houses data for a scan."""
 
     project = None # Parent project
     image_path = None # Directory with raw images for scan
-    spec_scan = None # SpecDataFileScan
+    frame_index = None # FrameIndex of raw image files, keyed by point
+    spec_scan = None # SpecDataFileScan, or LazySpecScan until parsed
     number = None # Number assigned in SPEC data
     n_pts = None # Number of points in scan
     name = None # Visible name for scan
-    raw_data = None # 3D NumPy array for raw image data
+    raw_data = None # 3D NumPy array or FrameStore for raw image data
+    raw_storage = "dense" # Form of raw data, "dense" or a FRAME_STORES key
+    detector_roi = None # Detector region [x_min, x_max, y_min, y_max] or None
+    pixel_binning = 1 # Side of pixel blocks averaged in frames and the RSM
+    mapping_backend = "xrayutilities" # RSM backend, "xrayutilities" or "numpy"
     rsm = None # 4D NumPy array with reciprocal space map
     grid_data = None # 3D NumPy array for gridded image data
     grid_coords = None # 2D list of gridded coordinates for HKL, respectively
     grid_params = None # Parameters for gridding raw image data
+    grid_slicer = None # GridSlicer with cached views of gridded data
+    frame_bounds = None # HKL bounding box of every raw frame
+    raw_stats = None # DataStatistics for raw image data
+    grid_stats = None # DataStatistics for gridded image data
+    raw_projections = None # Max/sum Projections of raw image data
+    grid_projections = None # Max/sum Projections of gridded image data
+    grid_accumulator = None # GridAccumulator for frames added while acquiring
     
     def __init__(
         self,
         project: Project,
         image_path: str,
-        spec_scan: spec.SpecDataFileScan
+        spec_scan: "spec.SpecDataFileScan"
     ) -> None:
         
         self.project = project
         self.image_path = image_path
+        self.frame_index = FrameIndex(image_path, project.name)
         self.spec_scan = spec_scan
         self.number = spec_scan.scanNum
-        self.n_pts = len(spec_scan.data[spec_scan.L[0]])
+        # Indexed scans know their point count without being parsed
+        if isinstance(spec_scan, LazySpecScan):
+            self.n_pts = spec_scan.n_pts
+        else:
+            self.n_pts = len(spec_scan.data[spec_scan.L[0]])
         self.name = f"{self.number} ({project.name})"
         self.grid_params = {
             "H": {"min": -4.0, "max": 4.0, "n": 250},
@@ -166,36 +264,196 @@ class Scan:
         }
 
     def loadRawData(self) -> None:
-        """Loads raw images from image path directory."""
+        """Loads raw images from image path directory.
+
+        - A consolidated HDF5 file is read instead of frame files if the
+          scan has one, see consolidate
+        - Each SPEC point is read from its own frame file, so frames stay
+          aligned with points even if files are missing or extra
+        """
+
+        consolidated = openConsolidatedScan(self.image_path, self.n_pts)
+        if consolidated is not None:
+            with consolidated:
+                self._loadConsolidatedData(consolidated)
+            return
 
         # Determines image files to read
-        image_files = []
-        for file in sorted(os.listdir(self.image_path)):
-            if self.project.name in file and file.endswith("tif"):
-                image_files.append(file)
+        self.frame_index.refresh()
+        missing_points = self.frame_index.getMissingPoints(self.n_pts)
+        if len(missing_points) > 0:
+            raise FileNotFoundError(
+                f"Frames for points {missing_points} not found in "
+                f"'{self.image_path}'."
+            )
+        image_files = [
+            self.frame_index.getPath(point) for point in range(self.n_pts)
+        ]
 
         # Reads and normalizes images
-        raw_images = []
+        # Mapped images are normalized straight into the raw data array,
+        # or into a scratch frame that is added to a frame store
+        # Statistics and projections are gathered while each image is
+        # still in cache
+        raw_data = np.array([])
+        raw_stats = None
+        raw_projections = Projections()
+        frame = None
         for i in range(len(image_files)): 
-            basepath = image_files[i]
-            path = f"{self.image_path}/{basepath}"
+            path = image_files[i]
             image = self._readImageFromPath(path)
-            norm_image = self._normalizeRawImage(image, point=i)
-            raw_images.append(norm_image)
+            if raw_stats is None:
+                raw_data = self._createRawData(len(image_files), image.shape)
+                if isinstance(raw_data, FrameStore):
+                    frame = np.empty(image.shape)
+                raw_stats = DataStatistics(
+                    sample_step=getSampleStep(image.size * len(image_files))
+                )
+            if frame is None:
+                norm_image = self._normalizeRawImage(
+                    image, point=i, out=raw_data[i]
+                )
+            else:
+                norm_image = self._normalizeRawImage(image, point=i, out=frame)
+                raw_data.append(norm_image)
+            if not isinstance(raw_data, SparseFrameStore):
+                raw_stats.update(norm_image)
+                raw_projections.update(norm_image[np.newaxis])
+
+        self._setRawData(raw_data, raw_stats, raw_projections)
+
+    def consolidate(self) -> str:
+        """Writes frames, normalization, and SPEC data to one HDF5 file.
+
+        - Later loads read the file instead of every frame file
+        - Returns the path of the file
+        """
+
+        return consolidateScan(self)
+
+    def _loadConsolidatedData(self, consolidated) -> None:
+        """Loads normalized raw images from a ConsolidatedScan.
+
+        - Frames are reduced to the scan's detector region and binning
+        """
+
+        raw_data = None
+        raw_stats = None
+        raw_projections = Projections()
+        for start, block in consolidated.getBlocks():
+            if self.detector_roi is not None or self.pixel_binning > 1:
+                block = np.array([
+                    reduceFrame(frame, self.detector_roi, self.pixel_binning)
+                    for frame in block
+                ])
+            if raw_data is None:
+                raw_data = self._createRawData(
+                    consolidated.n_frames, block.shape[1:]
+                )
+                raw_stats = DataStatistics(sample_step=getSampleStep(
+                    consolidated.n_frames * block[0].size
+                ))
+            if isinstance(raw_data, FrameStore):
+                for frame in block:
+                    raw_data.append(frame)
+            else:
+                raw_data[start:start + block.shape[0]] = block
+            if not isinstance(raw_data, SparseFrameStore):
+                raw_stats.update(block)
+                raw_projections.update(block)
+
+        self._setRawData(raw_data, raw_stats, raw_projections)
+
+    def _createRawData(self, n_frames: int, frame_shape: tuple):
+        """Returns an empty array or frame store for raw image data."""
+
+        if self.raw_storage == "dense":
+            return np.empty((n_frames,) + tuple(frame_shape))
+
+        return createFrameStore(self.raw_storage, frame_shape)
+
+    def _setRawData(
+        self,
+        raw_data,
+        raw_stats: DataStatistics,
+        raw_projections: Projections
+    ) -> None:
+        """Sets raw data with its statistics and projections.
+
+        - Statistics and projections of sparse frame stores are gathered
+          from stored pixels
+        """
 
-        self.raw_data = np.array(raw_images)
+        if isinstance(raw_data, SparseFrameStore):
+            raw_stats = raw_data.computeStatistics()
+            raw_projections = createSparseProjections(raw_data)
+
+        self.raw_data = raw_data
+        self.raw_stats = raw_stats
+        self.raw_projections = raw_projections
 
     def map(self) -> None:
         """Creates a reciprocal space map."""
 
+        from imageanalysis.mapping import mapScan
+
         self.rsm = mapScan(
             spec_scan=self.spec_scan,
             instrument_path=self.project.instrument_path,
-            detector_path=self.project.detector_path
+            detector_path=self.project.detector_path,
+            roi=self.detector_roi,
+            binning=self.pixel_binning,
+            basis=self._getDetectorQBasis()
         )
 
         self._setDefaultGridParameters()
 
+    def setDetectorRegion(self, roi: list=None, binning: int=1) -> None:
+        """Sets the detector region and pixel binning used by the scan.
+
+        - roi is [x_min, x_max, y_min, y_max] in detector pixels, or None
+          for the full detector
+        - Region starts are moved down to a multiple of binning, so binned
+          pixels line up with the binned detector geometry of
+          xrayutilities
+        - Loaded raw data, RSM, and gridded data no longer match and are
+          released
+        """
+
+        if int(binning) != binning or binning < 1:
+            raise ValueError("Pixel binning must be a positive integer.")
+        binning = int(binning)
+
+        shape = self.project.getDetectorShape()
+        if roi is not None:
+            roi = [int(i) for i in roi]
+            if len(roi) != 4 or not (
+                0 <= roi[0] < roi[1] <= shape[0] and
+                0 <= roi[2] < roi[3] <= shape[1]
+            ):
+                raise ValueError(
+                    f"Detector region {roi} not valid for a detector with "
+                    f"shape {shape}."
+                )
+            roi[0] -= roi[0] % binning
+            roi[2] -= roi[2] % binning
+            if roi == [0, shape[0], 0, shape[1]]:
+                roi = None
+
+        self.detector_roi = roi
+        self.pixel_binning = binning
+
+        self.raw_data = None
+        self.raw_stats = None
+        self.raw_projections = None
+        self.rsm = None
+        self.frame_bounds = None
+        self.grid_data = None
+        self.grid_slicer = None
+        self.grid_stats = None
+        self.grid_projections = None
+        self.grid_accumulator = None
+
     def setGridSize(
         self, 
         h_n: int, 
@@ -232,35 +490,215 @@ class Scan:
             rsm=self.rsm,
             grid_params=self.grid_params
         )
-    
+        self.grid_slicer = GridSlicer(self.grid_data, self.grid_coords)
+        self.grid_accumulator = None
+        self.frame_bounds = getFrameBounds(self.rsm)
+        self._setGridStatistics()
+
+    def loadNewFrames(self) -> int:
+        """Adds frames written since raw data was last loaded.
+
+        - Frames are read in point order while both their image file and
+          their SPEC data line exist, so partial scans can be viewed
+        - Only new points are mapped and added to an accumulating grid with
+          the current grid parameters
+        - Returns the number of frames added
+        """
+
+        from imageanalysis.mapping import mapScan
+
+        # Point count grows with the SPEC file while the scan is acquiring
+        self.project.spec_data.update()
+        self.n_pts = self.project.spec_data.getNumberOfPoints(self.number)
+        if isinstance(self.spec_scan, LazySpecScan):
+            self.spec_scan.n_pts = self.n_pts
+
+        start = 0 if self.raw_data is None else self.raw_data.shape[0]
+        frames = []
+        for point in range(start, self.n_pts):
+            path = self.frame_index.getPath(point)
+            if not os.path.exists(path):
+                break
+            try:
+                image = self._readImageFromPath(path)
+            except OSError:
+                break # Frame is still being written
+            frames.append(self._normalizeRawImage(image, point=point))
+
+        if len(frames) == 0:
+            return 0
+
+        frames = np.array(frames)
+        if self.raw_stats is None:
+            self.raw_stats = DataStatistics(
+                sample_step=getSampleStep(frames[0].size * self.n_pts)
+            )
+            self.raw_projections = Projections()
+        self.raw_stats.update(frames)
+        self.raw_projections.update(frames)
+        self._appendFrames("raw_data", frames)
+        n_frames = self.raw_data.shape[0]
+
+        # Maps points that do not have an RSM yet
+        n_mapped = 0 if self.rsm is None else min(self.rsm.shape[0], n_frames)
+        if self.rsm is not None:
+            self.rsm = self.rsm[:n_mapped]
+        self._appendFrames("rsm", mapScan(
+            spec_scan=self.spec_scan,
+            instrument_path=self.project.instrument_path,
+            detector_path=self.project.detector_path,
+            points=range(n_mapped, n_frames),
+            roi=self.detector_roi,
+            binning=self.pixel_binning,
+            basis=self._getDetectorQBasis()
+        ))
+        if n_mapped > 0 and self.frame_bounds is not None:
+            self.frame_bounds = np.concatenate([
+                self.frame_bounds[:, :n_mapped],
+                getFrameBounds(self.rsm[n_mapped:])
+            ], axis=1)
+        else:
+            self.frame_bounds = getFrameBounds(self.rsm)
+
+        # Grids frames that have not been added to the accumulating grid
+        if self.grid_accumulator is None:
+            self.grid_accumulator = GridAccumulator(self.grid_params)
+        n_gridded = self.grid_accumulator.n_frames
+        self.grid_accumulator.update(
+            self.raw_data[n_gridded:], self.rsm[n_gridded:]
+        )
+        self.grid_data, self.grid_coords = self.grid_accumulator.getData()
+        self.grid_slicer = GridSlicer(self.grid_data, self.grid_coords)
+        self._setGridStatistics()
+
+        return len(frames)
+
+    def _setGridStatistics(self) -> None:
+        """Gathers statistics and projections in one pass over the grid."""
+
+        self.grid_stats = DataStatistics(
+            sample_step=getSampleStep(self.grid_data.size)
+        )
+        self.grid_projections = Projections(
+            frame_shape=self.grid_data.shape[1:]
+        )
+        for block in getBlocks(self.grid_data):
+            self.grid_stats.update(block)
+            self.grid_projections.update(block)
+
+    def _appendFrames(self, name: str, frames: np.ndarray) -> None:
+        """Appends frames to an array attribute along its first dimension.
+
+        - The array is a view of a buffer whose capacity doubles when full,
+          so each frame is copied a constant number of times on average
+        """
+
+        data = getattr(self, name)
+
+        # Raw data may be kept in a frame store instead
+        if name == "raw_data" and (
+            isinstance(data, FrameStore) or
+            (data is None and self.raw_storage != "dense")
+        ):
+            if data is None:
+                data = self._createRawData(0, frames.shape[1:])
+            for frame in frames:
+                data.append(frame)
+            self.raw_data = data
+            return
+
+        n = 0 if data is None else data.shape[0]
+        n_total = n + frames.shape[0]
+
+        # Arrays that are not a leading view of a matching buffer are copied
+        buffer = None if data is None else data.base
+        if not (
+            isinstance(buffer, np.ndarray) and
+            buffer.flags.c_contiguous and
+            buffer.dtype == frames.dtype and
+            buffer.shape[1:] == frames.shape[1:] and
+            buffer.ctypes.data == data.ctypes.data
+        ):
+            buffer = None
+
+        if buffer is None or buffer.shape[0] < n_total:
+            capacity = n_total if buffer is None else max(
+                n_total, 2 * buffer.shape[0]
+            )
+            new_buffer = np.empty(
+                (capacity,) + frames.shape[1:], dtype=frames.dtype
+            )
+            if n > 0:
+                new_buffer[:n] = data
+            buffer = new_buffer
+
+        buffer[n:n_total] = frames
+        setattr(self, name, buffer[:n_total])
+
     def _readImageFromPath(
         self, 
         image_path: str
     ) -> np.ndarray:
-        """Reads image from given path."""
+        """Reads image from given path.
 
-        image = Image.open(image_path)
-        image_array = np.array(image).T
+        - Images are reduced to the scan's detector region and binning
+        - Uncompressed images are memory-mapped views, not copies, unless
+          they are binned
+        """
 
-        return image_array
+        return reduceFrame(
+            readFrame(image_path), self.detector_roi, self.pixel_binning
+        )
 
     def _normalizeRawImage(
         self, 
         image: np.ndarray, 
-        point: int
+        point: int,
+        out: np.ndarray=None
     ) -> np.ndarray:
-        """Normalizes raw image with SPEC values."""
+        """Normalizes raw image with SPEC values.
 
-        instrument_reader = InstForXrayutilitiesReader(self.project.instrument_path)
-        
+        - The normalized image is written to out if given
+        """
 
-        monitor_norm_factor = self.spec_scan.data["Ion_Ch_2"][point] * instrument_reader.getMonitorScaleFactor()
-        filter_norm_factor = self.spec_scan.data["transm"][point] * instrument_reader.getFilterScaleFactor()
-        norm_factor = monitor_norm_factor * filter_norm_factor
-        norm_image = image * norm_factor
+        norm_factor = self._getNormalizationFactors(points=[point])[0]
+        norm_image = np.multiply(image, norm_factor, out=out)
 
         return norm_image
 
+    def _getNormalizationFactors(self, points: list=None) -> np.ndarray:
+        """Returns the factor each point's raw image is scaled by.
+
+        - Monitor counts and filter transmission are scaled by factors from
+          the instrument configuration
+        """
+
+        from rsMap3D.datasource.InstForXrayutilitiesReader import \
+            InstForXrayutilitiesReader
+
+        instrument_reader = InstForXrayutilitiesReader(self.project.instrument_path)
+
+        monitor = self.spec_scan.data["Ion_Ch_2"]
+        transmission = self.spec_scan.data["transm"]
+        if points is None:
+            points = range(len(monitor))
+        monitor_norm_factors = np.array([monitor[i] for i in points]) * \
+            instrument_reader.getMonitorScaleFactor()
+        filter_norm_factors = np.array([transmission[i] for i in points]) * \
+            instrument_reader.getFilterScaleFactor()
+
+        return monitor_norm_factors * filter_norm_factors
+
+    def _getDetectorQBasis(self):
+        """Returns the project's DetectorQBasis if mapping with NumPy."""
+
+        if self.mapping_backend != "numpy":
+            return None
+
+        return self.project.getDetectorQBasis(
+            self.detector_roi, self.pixel_binning
+        )
+
     def _setDefaultGridParameters(self) -> None:
         """Changes grid parameters to default bounds and size.
         
@@ -7,38 +7,116 @@ See LICENSE file.
 from PyQt5 import QtWidgets
 from pyqtgraph import QtCore
 
+from imageanalysis.memory import MemoryManager
 from imageanalysis.structures import Scan
 from imageanalysis.ui.data_view.gridded_data import GriddedDataWidget
 from imageanalysis.ui.data_view.raw_data import RawDataWidget
+from imageanalysis.ui.data_view.watch import ScanWatcher
 
 
 class DataView(QtWidgets.QTabWidget):
-    """Houses a tab widget for DataViewTab objects."""
+    """Houses a tab widget for DataViewTab objects.
+
+    - Arrays of scans in hidden tabs are evicted by a MemoryManager when
+      its budget is exceeded, and restored when their tab is shown
+    - Scans that are still acquiring are watched for new frames, which
+      are added to their tabs as they arrive
+    """
 
     def __init__(self, parent=None) -> None:
         super(DataView, self).__init__()
         self.parent = parent
 
         self.scan_list = []
+        self.memory_manager = MemoryManager()
+        self.watchers = {} # ScanWatchers, keyed by scan
         self.setTabsClosable(True)
         self.tabCloseRequested.connect(self._closeTab)
+        self.currentChanged.connect(self._activateTab)
 
     def _addScan(self, scan: Scan) -> None:
-        """Adds new DataViewTab."""
+        """Adds new DataViewTab and shows it."""
 
         tab_title = str(scan.number)
-        self.addTab(DataViewTab(scan=scan, parent=self), tab_title)
+        tab = DataViewTab(scan=scan, parent=self)
+        self.addTab(tab, tab_title)
+        self.setCurrentWidget(tab)
+
+    def _watchScan(self, scan: Scan) -> None:
+        """Adds frames of a scan as they are written.
+
+        - The scan's tab is added once it has its first frame
+        """
+
+        if scan in self.watchers:
+            return
+
+        watcher = ScanWatcher(scan=scan, parent=self)
+        watcher.framesAdded.connect(lambda n: self._updateWatchedScan(scan))
+        self.watchers[scan] = watcher
+        watcher._loadNewFrames()
+        if watcher.isFinished():
+            self._stopWatching(scan)
+        else:
+            watcher.start()
+
+    def _stopWatching(self, scan: Scan) -> None:
+        """Stops adding frames to a scan."""
+
+        watcher = self.watchers.pop(scan, None)
+        if watcher is not None:
+            watcher.stop()
+            watcher.deleteLater()
+
+    def _updateWatchedScan(self, scan: Scan) -> None:
+        """Shows frames added to a watched scan."""
+
+        for i in range(self.count()):
+            if self.widget(i).scan is scan:
+                self.widget(i)._refreshData()
+                return
+
+        self._addScan(scan)
+
+    def _activateTab(self, index: int) -> None:
+        """Restores data for the tab in view."""
+
+        w = self.widget(index)
+        if w is None:
+            return
+        try:
+            self.memory_manager.activate(w.scan)
+        except FileNotFoundError as e:
+            # Frame files of an evicted scan were removed since it was loaded
+            msg = QtWidgets.QMessageBox()
+            msg.setIcon(QtWidgets.QMessageBox.Critical)
+            msg.setWindowTitle("Error")
+            msg.setText(f"Scan could not be reloaded: {e}")
+            msg.exec_()
+            self._closeTab(index)
+            return
+        w._load()
+
+        # Frames are not added to scans with evicted arrays
+        for scan, watcher in self.watchers.items():
+            watcher.paused = self.memory_manager.isEvicted(scan)
 
     def _closeTab(self, index: int) -> None:
         """Closes DataViewTab at specific index."""
 
         w = self.widget(index)
+        self._stopWatching(w.scan)
+        self.memory_manager.unregister(w.scan, w._unload)
         w.deleteLater()
         self.removeTab(index)
 
 
 class DataViewTab(QtWidgets.QWidget):
-    """Houses various widgets to view data with."""
+    """Houses various widgets to view data with.
+
+    - Data widgets are unloaded while the scan's arrays are evicted and
+      created again when the tab is shown
+    """
 
     def __init__(self, scan: Scan, parent=None) -> None:
         super(DataViewTab, self).__init__()
@@ -47,19 +125,57 @@ class DataViewTab(QtWidgets.QWidget):
         self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
 
         self.scan = scan
+        self.loaded = False
+        self.tab_index = 0 # Raw or gridded tab in view
 
         # Child widgets
         self.tab_widget = QtWidgets.QTabWidget()
+
+        # Layout
+        self.layout = QtWidgets.QGridLayout()
+        self.setLayout(self.layout)
+        self.layout.addWidget(self.tab_widget)
+
+        self._load()
+        if parent is not None:
+            parent.memory_manager.register(scan, self._unload)
+
+    def _load(self) -> None:
+        """Creates data widgets if they are not loaded."""
+
+        if self.loaded:
+            return
+
         self.tab_widget.addTab(
-            RawDataWidget(scan=scan, parent=self),
+            RawDataWidget(scan=self.scan, parent=self),
             "Raw"
         )
         self.tab_widget.addTab(
-            GriddedDataWidget(scan=scan, parent=self), 
+            GriddedDataWidget(scan=self.scan, parent=self), 
             "Gridded"
         )
+        self.tab_widget.setCurrentIndex(self.tab_index)
+        self.loaded = True
 
-        # Layout
-        self.layout = QtWidgets.QGridLayout()
-        self.setLayout(self.layout)
-        self.layout.addWidget(self.tab_widget)
+    def _refreshData(self) -> None:
+        """Shows frames added to the scan in loaded data widgets."""
+
+        if not self.loaded:
+            return
+
+        for i in range(self.tab_widget.count()):
+            self.tab_widget.widget(i).controller._refreshData()
+
+    def _unload(self) -> None:
+        """Deletes data widgets so the scan's arrays can be released."""
+
+        if not self.loaded:
+            return
+
+        self.tab_index = self.tab_widget.currentIndex()
+        while self.tab_widget.count() > 0:
+            w = self.tab_widget.widget(0)
+            self.tab_widget.removeTab(0)
+            w.close()
+            w.deleteLater()
+        self.loaded = False
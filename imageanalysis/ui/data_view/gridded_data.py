@@ -9,8 +9,10 @@ from PyQt5 import QtGui, QtWidgets
 from pyqtgraph import QtCore
 from pyqtgraph.dockarea import Dock, DockArea
 
+from imageanalysis.slicing import ObliquePlane, ObliqueSlicer, getOffsetRange
 from imageanalysis.structures import Scan
 from imageanalysis.ui.data_view.image_tool import ImageTool
+from imageanalysis.ui.data_view.playback import PlaybackController
 
 
 class GriddedDataWidget(DockArea):
@@ -31,6 +33,7 @@ class GriddedDataWidget(DockArea):
             image_tool=self.image_tool,
             scan=scan
         )
+        self.oblique_ctrl = ObliqueSliceController(parent=self.controller)
 
         # Child docks
         self.controller_dock = Dock(
@@ -47,8 +50,18 @@ class GriddedDataWidget(DockArea):
             hideTitle=True,
             closable=False
         )
+        self.oblique_dock = Dock(
+            name="Oblique Slice",
+            size=(1, 1),
+            widget=self.oblique_ctrl,
+            hideTitle=True,
+            closable=False
+        )
         self.controller_dock.setMaximumHeight(200)
+        self.oblique_dock.setMaximumHeight(200)
+        self.oblique_dock.setMaximumWidth(300)
         self.addDock(self.controller_dock)
+        self.addDock(self.oblique_dock, "right", self.controller_dock)
         self.addDock(self.image_tool_dock, "bottom", self.controller_dock)
 
 
@@ -71,8 +84,13 @@ class GriddedDataController(QtWidgets.QWidget):
         self.scan = scan
         self.data = scan.grid_data
         self.coords = scan.grid_coords
+        self.slicer = scan.grid_slicer
         self.dim_order = (0, 1, 2)
+        self.slicer.setActiveOrder(self.dim_order, background=True)
         self.slice_index = 0
+        self.projection = None # "max" or "sum" when a projection is shown
+        self.oblique_slicer = ObliqueSlicer(self.data, self.coords)
+        self.oblique = None # ObliquePlane when an oblique slice is shown
 
         # For dragging and dropping
         self.setAcceptDrops(True)
@@ -81,17 +99,17 @@ class GriddedDataController(QtWidgets.QWidget):
         self.h_ctrl = GriddedDimensionController(
             parent=self,
             label="H",
-            coords=list(self.coords[0])
+            coords=self.coords[0]
         )
         self.k_ctrl = GriddedDimensionController(
             parent=self,
             label="K",
-            coords=list(self.coords[1])
+            coords=self.coords[1]
         )
         self.l_ctrl = GriddedDimensionController(
             parent=self,
             label="L",
-            coords=list(self.coords[2])
+            coords=self.coords[2]
         )
         self.controllers = [self.h_ctrl, self.k_ctrl, self.l_ctrl]
         self.h_ctrl._setEnabled(enabled=False)
@@ -108,15 +126,54 @@ class GriddedDataController(QtWidgets.QWidget):
         # Connections
         for ctrl in self.controllers:
             ctrl.indexChanged.connect(self._setSliceIndex)
+            ctrl.modeChanged.connect(self._setSliceIndex)
         self.dimensionOrderChanged.connect(self._setDimensionOrder)
 
         # Sets initial image
         self._setImage()
 
+    def _refreshData(self) -> None:
+        """Shows gridded data after frames are added to the scan.
+
+        - Grid coordinates are fixed while frames are added, so dimension
+          controllers keep their positions
+        """
+
+        self.data = self.scan.grid_data
+        self.slicer = self.scan.grid_slicer
+        self.slicer.setActiveOrder(self.dim_order, background=True)
+        self.oblique_slicer = ObliqueSlicer(self.data, self.coords)
+        self.image_tool.data = self.data
+        self.image_tool.data_version += 1
+
+        if self.oblique is not None:
+            self._setObliquePlane(self.oblique)
+        else:
+            self._setSliceIndex()
+
     def _setSliceIndex(self) -> None:
-        """Updates index to match index of last dimension controller."""
+        """Updates index and projection to match last dimension controller."""
+
+        ctrl = self.layout.itemAt(2).widget()
+        self.slice_index = ctrl.index
+
+        if ctrl.mode == "Slice":
+            self.projection = None
+            statistics = self.scan.grid_stats
+        else:
+            self.projection = ctrl.mode.lower()
+            statistics = self.scan.grid_projections.getStatistics(
+                self.projection, self.dim_order[2]
+            )
+
+        # Color map bounds only follow changes between slices and projections
+        if (
+            self.image_tool.data is not None and
+            statistics is not None and
+            statistics is not self.image_tool.statistics
+        ):
+            self.image_tool._setStatistics(statistics)
 
-        self.slice_index = self.layout.itemAt(2).widget().index
         self._setImage()
 
     def _setDimensionOrder(self) -> None:
@@ -128,26 +185,75 @@ class GriddedDataController(QtWidgets.QWidget):
             dim = self.controllers.index(ctrl)
             dim_order.append(dim)
         self.dim_order = tuple(dim_order)
-        self._setSliceIndex()
+        self.slicer.setActiveOrder(self.dim_order, background=True)
+
+        if self.oblique is not None:
+            return
 
         # Enables/disables dimension controllers based on order
         self.layout.itemAt(0).widget()._setEnabled(False)
         self.layout.itemAt(1).widget()._setEnabled(False)
         self.layout.itemAt(2).widget()._setEnabled(True)
 
+        self._setSliceIndex()
+
         if self.image_tool.controller.plot_3d_roi_ctrl.roi is not None:
             self.image_tool.controller.plot_3d_roi_ctrl.roi._center()
         self.image_tool.plot_3d.autoRange()
 
-    def _setImage(self) -> None:
-        """Loads image in connected image tool."""
+    def _setObliquePlane(self, plane: ObliquePlane=None) -> None:
+        """Shows an oblique slice, or axis-aligned slices if plane is None.
+
+        - Dimension controllers are disabled while an oblique slice is shown
+        - ROIs are removed and disabled while an oblique slice is shown,
+          since they sample axis-aligned slices
+        """
+
+        self.oblique = plane
+        roi_ctrl = self.image_tool.controller.plot_3d_roi_ctrl
 
-        data = np.transpose(self.data, self.dim_order)
-        image = data[:, :, self.slice_index]
-        x_label = ["H", "K", "L"][self.dim_order[0]]
-        y_label = ["H", "K", "L"][self.dim_order[1]]
-        x_coords = self.coords[self.dim_order[0]]
-        y_coords = self.coords[self.dim_order[1]]
+        if plane is None:
+            roi_ctrl.roi_type_cbx.setEnabled(True)
+            self._setDimensionOrder()
+            return
+
+        roi_ctrl.roi_type_cbx.setCurrentText("none")
+        roi_ctrl.roi_type_cbx.setEnabled(False)
+        for ctrl in self.controllers:
+            ctrl._setEnabled(False)
+        self.projection = None
+        statistics = self.scan.grid_stats
+        if (
+            statistics is not None and
+            statistics is not self.image_tool.statistics
+        ):
+            self.image_tool._setStatistics(statistics)
+        self._setImage()
+
+    def _setImage(self, image: np.ndarray=None) -> None:
+        """Loads image in connected image tool.
+
+        - An image prepared during playback is shown as is
+        - Oblique slices are labeled with the HKL direction of each axis
+        """
+
+        if self.oblique is not None:
+            image = self.oblique_slicer.getImage(self.oblique)
+            x_label = getDirectionLabel(self.oblique.u)
+            y_label = getDirectionLabel(self.oblique.v)
+            x_coords = self.oblique.u_coords
+            y_coords = self.oblique.v_coords
+        else:
+            if image is None and self.projection is None:
+                image = self.slicer.getSlice(self.dim_order, self.slice_index)
+            elif image is None:
+                image = self.scan.grid_projections.getImage(
+                    self.projection, self.dim_order
+                )
+            x_label = ["H", "K", "L"][self.dim_order[0]]
+            y_label = ["H", "K", "L"][self.dim_order[1]]
+            x_coords = self.coords[self.dim_order[0]]
+            y_coords = self.coords[self.dim_order[1]]
 
         self.image_tool._setImage(
             image=image,
@@ -155,7 +261,8 @@ class GriddedDataController(QtWidgets.QWidget):
             x_label=x_label,
             y_label=y_label,
             x_coords=x_coords,
-            y_coords=y_coords
+            y_coords=y_coords,
+            statistics=self.scan.grid_stats
         )
 
         self.image_tool.plot_3d._setCoordinateIntervals(
@@ -195,22 +302,26 @@ class GriddedDimensionController(QtWidgets.QGroupBox):
     """Child class for DataViewController.
 
     Three of these are created to control each dimension (H, K, L).
-    Houses a slider and combobox to control a single dimension's index.
+    Houses a slider and coordinate spinbox to control a single dimension's
+    index.
     """
 
     # Signal for changing indices
     indexChanged = QtCore.pyqtSignal()
+    # Signal for switching between slices and projections
+    modeChanged = QtCore.pyqtSignal()
 
     def __init__(
         self,
         parent: GriddedDataController,
         label: str,
-        coords: list
+        coords: np.ndarray
     ) -> None:
         super(GriddedDimensionController, self).__init__()
 
         self.parent = parent
         self.index = 0
+        self.mode = "Slice" # "Slice", "Max", or "Sum"
         self.label = label
         self.coords = coords
 
@@ -218,19 +329,30 @@ class GriddedDimensionController(QtWidgets.QGroupBox):
         self.dim_lbl = QtWidgets.QLabel(label)
         self.dim_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
         self.dim_slider.setMaximum(len(coords) - 1)
-        self.dim_cbx = QtWidgets.QComboBox()
-        self.dim_cbx.addItems([str(round(i, 5)) for i in coords])
+        self.dim_sbx = CoordinateSpinBox(coords)
+        self.mode_cbx = QtWidgets.QComboBox()
+        self.mode_cbx.addItems(["Slice", "Max", "Sum"])
+        self.playback = PlaybackController(
+            getFrame=lambda index: self.parent.slicer.getSlice(
+                self.parent.dim_order, index
+            ),
+            n_frames=len(coords)
+        )
 
         # Layout
         self.layout = QtWidgets.QGridLayout()
         self.setLayout(self.layout)
         self.layout.addWidget(self.dim_lbl, 0, 0)
         self.layout.addWidget(self.dim_slider, 0, 1, 1, 5)
-        self.layout.addWidget(self.dim_cbx, 0, 6, 1, 1)
+        self.layout.addWidget(self.dim_sbx, 0, 6, 1, 1)
+        self.layout.addWidget(self.mode_cbx, 0, 7, 1, 1)
+        self.layout.addWidget(self.playback, 0, 8, 1, 2)
 
         # Connections
         self.dim_slider.valueChanged.connect(self._setIndex)
-        self.dim_cbx.currentIndexChanged.connect(self._setIndex)
+        self.dim_sbx.indexChanged.connect(self._setIndex)
+        self.mode_cbx.currentIndexChanged.connect(self._setMode)
+        self.playback.frameChanged.connect(self._showFrame)
 
     def _setIndex(self) -> None:
         """Sets index value."""
@@ -239,22 +361,60 @@ class GriddedDimensionController(QtWidgets.QGroupBox):
         index = None
         if sender == self.dim_slider:
             index = sender.value()
-            self.dim_cbx.setCurrentIndex(index)
-        elif sender == self.dim_cbx:
-            index = sender.currentIndex()
+            self.dim_sbx.setIndex(index)
+        elif sender == self.dim_sbx:
+            index = sender.index
+            self.dim_slider.blockSignals(True)
             self.dim_slider.setValue(index)
+            self.dim_slider.blockSignals(False)
         self.index = index
+        self.playback.index = index
         self.indexChanged.emit()
 
+    def _showFrame(self, index: int, image: np.ndarray) -> None:
+        """Shows a slice prepared during playback."""
+
+        self.index = index
+        self.dim_slider.blockSignals(True)
+        self.dim_slider.setValue(index)
+        self.dim_slider.blockSignals(False)
+        self.dim_sbx.setIndex(index)
+
+        self.parent.slice_index = index
+        self.parent._setImage(image)
+
+    def _setMode(self) -> None:
+        """Sets whether a slice or a projection is shown."""
+
+        self.mode = self.mode_cbx.currentText()
+        if self.mode != "Slice":
+            self.playback.stop()
+        self.dim_slider.setEnabled(self.mode == "Slice")
+        self.dim_sbx.setEnabled(self.mode == "Slice")
+        self.playback.setEnabled(self.mode == "Slice")
+        self.modeChanged.emit()
+
     def _setEnabled(self, enabled: bool) -> None:
-        """Enables/disables slider and combobox."""
+        """Enables/disables slider, spinbox, mode combobox, and playback.
+
+        - Disabled controllers are reset to show slices
+        """
 
         if enabled:
-            self.dim_slider.setEnabled(True)
-            self.dim_cbx.setEnabled(True)
+            self.dim_slider.setEnabled(self.mode == "Slice")
+            self.dim_sbx.setEnabled(self.mode == "Slice")
+            self.mode_cbx.setEnabled(True)
+            self.playback.setEnabled(self.mode == "Slice")
         else:
+            self.playback.stop()
+            self.playback.setEnabled(False)
             self.dim_slider.setEnabled(False)
-            self.dim_cbx.setEnabled(False)
+            self.dim_sbx.setEnabled(False)
+            self.mode_cbx.blockSignals(True)
+            self.mode_cbx.setCurrentIndex(0)
+            self.mode_cbx.blockSignals(False)
+            self.mode_cbx.setEnabled(False)
+            self.mode = "Slice"
 
     def mouseMoveEvent(self, e) -> None:
         """Checks if dimension controller is being dragged."""
@@ -265,3 +425,195 @@ class GriddedDimensionController(QtWidgets.QGroupBox):
                 mime = QtCore.QMimeData()
                 drag.setMimeData(mime)
                 drag.exec_(QtCore.Qt.MoveAction)
+
+
+class ObliqueSliceController(QtWidgets.QGroupBox):
+    """Controls the plane of an oblique slice through gridded data.
+
+    - The plane holds every point where normal . (h, k, l) = offset
+    - The offset slider steps about one voxel along the normal
+    """
+
+    def __init__(self, parent: GriddedDataController) -> None:
+        super(ObliqueSliceController, self).__init__("Oblique Slice")
+
+        self.parent = parent
+        self.normal = (0.0, 0.0, 1.0)
+        self.offset_range = (0.0, 1.0)
+        self.n_steps = 1
+
+        self.setCheckable(True)
+        self.setChecked(False)
+
+        # Child widgets
+        self.normal_lbl = QtWidgets.QLabel("Normal:")
+        self.normal_sbxs = []
+        for value in self.normal:
+            sbx = QtWidgets.QDoubleSpinBox()
+            sbx.setDecimals(3)
+            sbx.setRange(-100, 100)
+            sbx.setSingleStep(0.1)
+            sbx.setValue(value)
+            sbx.setKeyboardTracking(False)
+            self.normal_sbxs.append(sbx)
+        self.offset_lbl = QtWidgets.QLabel("Offset:")
+        self.offset_sbx = QtWidgets.QDoubleSpinBox()
+        self.offset_sbx.setDecimals(5)
+        self.offset_sbx.setKeyboardTracking(False)
+        self.offset_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+
+        # Layout
+        self.layout = QtWidgets.QGridLayout()
+        self.setLayout(self.layout)
+        self.layout.addWidget(self.normal_lbl, 0, 0)
+        for i, sbx in enumerate(self.normal_sbxs):
+            self.layout.addWidget(sbx, 0, i + 1)
+        self.layout.addWidget(self.offset_lbl, 1, 0)
+        self.layout.addWidget(self.offset_sbx, 1, 1, 1, 3)
+        self.layout.addWidget(self.offset_slider, 2, 0, 1, 4)
+
+        self._setNormal()
+
+        # Connections
+        self.toggled.connect(self._setPlane)
+        for sbx in self.normal_sbxs:
+            sbx.valueChanged.connect(self._setNormal)
+        self.offset_sbx.valueChanged.connect(self._setOffset)
+        self.offset_slider.valueChanged.connect(self._setOffset)
+
+    def _setNormal(self) -> None:
+        """Updates offset range for a new normal, keeping the plane centered."""
+
+        normal = tuple(sbx.value() for sbx in self.normal_sbxs)
+        if not any(normal):
+            # Restores previous normal
+            for sbx, value in zip(self.normal_sbxs, self.normal):
+                sbx.blockSignals(True)
+                sbx.setValue(value)
+                sbx.blockSignals(False)
+            return
+        self.normal = normal
+
+        coords = self.parent.coords
+        self.offset_range = getOffsetRange(self.normal, coords)
+
+        # About one step per voxel along the normal
+        normal = np.array(self.normal)
+        spacing = np.array([abs(c[-1] - c[0]) / max(1, len(c) - 1) for c in coords])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.nanmin(spacing / np.abs(normal / np.linalg.norm(normal)))
+        span = self.offset_range[1] - self.offset_range[0]
+        if np.isfinite(step) and step > 0:
+            self.n_steps = max(1, int(round(span / (step * np.linalg.norm(normal)))))
+        else:
+            self.n_steps = 1
+
+        for widget in [self.offset_sbx, self.offset_slider]:
+            widget.blockSignals(True)
+        self.offset_sbx.setRange(*self.offset_range)
+        self.offset_sbx.setSingleStep(span / self.n_steps)
+        self.offset_sbx.setValue(sum(self.offset_range) / 2)
+        self.offset_slider.setMaximum(self.n_steps)
+        self.offset_slider.setValue(self.n_steps // 2)
+        for widget in [self.offset_sbx, self.offset_slider]:
+            widget.blockSignals(False)
+
+        self._setPlane()
+
+    def _setOffset(self) -> None:
+        """Syncs offset spinbox and slider."""
+
+        lo, hi = self.offset_range
+        if self.sender() == self.offset_slider:
+            offset = lo + (hi - lo) * self.offset_slider.value() / self.n_steps
+            self.offset_sbx.blockSignals(True)
+            self.offset_sbx.setValue(offset)
+            self.offset_sbx.blockSignals(False)
+        else:
+            offset = self.offset_sbx.value()
+            self.offset_slider.blockSignals(True)
+            self.offset_slider.setValue(
+                int(round((offset - lo) / (hi - lo) * self.n_steps))
+                if hi > lo else 0
+            )
+            self.offset_slider.blockSignals(False)
+
+        self._setPlane()
+
+    def _setPlane(self) -> None:
+        """Sends the plane to the controller, or None if unchecked."""
+
+        if not self.isChecked():
+            if self.parent.oblique is not None:
+                self.parent._setObliquePlane(None)
+            return
+
+        plane = self.parent.oblique_slicer.getPlane(
+            normal=self.normal,
+            offset=self.offset_sbx.value()
+        )
+        self.parent._setObliquePlane(plane)
+
+
+class CoordinateSpinBox(QtWidgets.QDoubleSpinBox):
+    """Spinbox that snaps to the coordinates of a grid dimension.
+
+    - Steps move one coordinate at a time
+    - Typed values snap to the nearest coordinate
+    - Coordinates are looked up in the grid array instead of being
+      stored as one item per coordinate
+    """
+
+    # Emits index of selected coordinate
+    indexChanged = QtCore.pyqtSignal(int)
+
+    def __init__(self, coords: np.ndarray, decimals: int=5) -> None:
+        super(CoordinateSpinBox, self).__init__()
+
+        self.coords = np.asarray(coords)
+        self.index = 0
+
+        self.setDecimals(decimals)
+        self.setRange(float(self.coords.min()), float(self.coords.max()))
+        self.setKeyboardTracking(False)
+        self.setValue(float(self.coords[0]))
+
+        self.valueChanged.connect(self._snapValue)
+
+    def setIndex(self, index: int) -> None:
+        """Shows the coordinate at an index without emitting indexChanged."""
+
+        self.index = int(index)
+        self.blockSignals(True)
+        self.setValue(float(self.coords[self.index]))
+        self.blockSignals(False)
+
+    def stepBy(self, steps: int) -> None:
+        """Moves by whole coordinates."""
+
+        index = min(max(0, self.index + steps), len(self.coords) - 1)
+        if index != self.index:
+            self.setIndex(index)
+            self.indexChanged.emit(index)
+
+    def _snapValue(self, value: float) -> None:
+        """Snaps an entered value to the nearest coordinate."""
+
+        index = getNearestIndex(self.coords, value)
+        changed = index != self.index
+        self.setIndex(index)
+        if changed:
+            self.indexChanged.emit(index)
+
+
+def getNearestIndex(coords: np.ndarray, value: float) -> int:
+    """Returns the index of the coordinate closest to a value."""
+
+    return int(np.argmin(np.abs(np.asarray(coords) - value)))
+
+
+def getDirectionLabel(direction: np.ndarray) -> str:
+    """Returns an HKL direction formatted as an axis label."""
+
+    values = np.round(direction, 3) + 0.0 # Avoids "-0"
+    return "(" + ", ".join(f"{value:g}" for value in values) + ")"
@@ -10,8 +10,12 @@ import pyqtgraph as pg
 from pyqtgraph import QtCore
 from pyqtgraph.dockarea import Dock, DockArea
 
+from imageanalysis.gridding import getContributingFrames
+from imageanalysis.statistics import DataStatistics, computeStatistics
 from imageanalysis.ui.data_view.image_tool.color_mapping import \
-    ColorMapController
+    ColorMapController, createLookupTable, getLevels
+from imageanalysis.ui.data_view.image_tool.level_of_detail import \
+    ImagePyramid, LevelOfDetailImageItem
 
 
 class ImageTool(DockArea):
@@ -25,11 +29,15 @@ class ImageTool(DockArea):
 
         self.parent = parent
         self.data = None
+        self.data_version = 0 # Incremented whenever data is replaced
         self.data_range = None
+        self.statistics = None
         self.color_map = None
         self.color_bar_3d = None
         self.color_bar_2d = None
         self.color_map_range = None
+        self.lut = None # RGBA lookup table for color map
+        self.levels = None # Image levels for lookup table
 
         # Child docks
         self.plot_3d_dock = Dock(
@@ -96,9 +104,13 @@ class ImageTool(DockArea):
         x_label: str=None,
         y_label: str=None,
         x_coords: list=None,
-        y_coords: list=None
+        y_coords: list=None,
+        statistics: DataStatistics=None
     ) -> None:
-        """Sets an image with given parameters to the 3D ImagePlot"""
+        """Sets an image with given parameters to the 3D ImagePlot
+
+        - Statistics are computed from the data if not provided
+        """
 
         self.image = image
         self.x_label = x_label
@@ -106,6 +118,15 @@ class ImageTool(DockArea):
         self.x_coords = x_coords
         self.y_coords = y_coords
 
+        # For first runthrough
+        # Applies a color map before the image is plotted
+        if self.data is None:
+            self.data = data
+            if statistics is None:
+                statistics = computeStatistics(data)
+            self.controller._setColorMap()
+            self._setStatistics(statistics)
+
         self.plot_3d._plot(
             image=self.image,
             x_label=self.x_label,
@@ -114,70 +135,69 @@ class ImageTool(DockArea):
             y_coords=self.y_coords,
         )
 
-        # For first runthrough
-        # Applies a color map to the image
-        if self.data is None:
-            self.data = data
-            self.data_range = (np.amin(data), np.amax(data))
-            self.controller._setColorMap()
+    def _setStatistics(self, statistics: DataStatistics) -> None:
+        """Sets statistics for data in view and updates color map bounds."""
+
+        self.statistics = statistics
+        self.data_range = (statistics.min, statistics.max)
+        self.controller.color_map_ctrl._setStatistics(statistics)
 
     def _setColorMap(
         self,
         color_map: pg.ColorMap,
-        range: tuple
+        range: tuple=None
     ) -> None:
-        """Applies a color map and color bar object to the plots."""
+        """Applies a color map to the plots and color bars.
+
+        - Only the lookup tables of displayed images change, so no data is
+          re-plotted or re-extracted
+        """
 
         self.color_map = color_map
-        self.color_map_range = range
+        self.lut = createLookupTable(color_map)
 
         # For first runthrough
         if self.color_bar_3d is None:
-            # Creates color bar for plot
-            self.color_bar_3d = pg.ColorBarItem(
-                values=range,
-                cmap=color_map,
-                interactive=False,
-                width=15,
-                orientation="v"
-            )
-            self.color_bar_3d.setImageItem(
-                img=self.plot_3d.image,
-                insert_in=self.plot_3d.getView()
-            )
-        # Applys color map to plot
-        self.plot_3d.setColorMap(color_map)
-        self.color_bar_3d.setColorMap(color_map)
-        # Adjusts color map range in color bar
-        self.color_bar_3d.setLevels(range)
-
-        if self.plot_2d.isVisible():
-            if self.color_bar_2d is None:
-                self.color_bar_2d = pg.ColorBarItem(
-                    values=range,
-                    cmap=color_map,
-                    interactive=False,
-                    width=15,
-                    orientation="v"
-                )
-                self.color_bar_2d.setImageItem(
-                    img=self.plot_2d.image,
-                    insert_in=self.plot_2d.getView()
-                )
-            self.plot_2d.setColorMap(color_map)
-            self.color_bar_2d.setColorMap(color_map)
-            self.color_bar_2d.setLevels(range)
+            # Creates color bars for plots
+            # Color bars are display only, images are colored by the LUT
+            self.color_bar_3d = self._createColorBar(self.plot_3d, range)
+            self.color_bar_2d = self._createColorBar(self.plot_2d, range)
 
-        self.plot_3d._plot(
-            image=self.image,
-            x_label=self.x_label,
-            y_label=self.y_label,
-            x_coords=self.x_coords,
-            y_coords=self.y_coords,
-        )
+        for color_bar in [self.color_bar_3d, self.color_bar_2d]:
+            color_bar.setColorMap(color_map)
+        for plot in [self.plot_3d, self.plot_2d]:
+            plot._setLookupTable(self.lut)
+
+        if range is not None:
+            self._setLevels(range)
 
         self.colorMapUpdated.emit()
 
+    def _setLevels(self, range: tuple) -> None:
+        """Applies a color map range to the plots and color bars."""
+
+        self.color_map_range = range
+        self.levels = getLevels(range[-1])
+
+        for color_bar in [self.color_bar_3d, self.color_bar_2d]:
+            color_bar.setLevels(range)
+        for plot in [self.plot_3d, self.plot_2d]:
+            plot._setLevels(self.levels)
+
+    def _createColorBar(self, plot, range: tuple) -> pg.ColorBarItem:
+        """Creates a display only color bar next to a plot."""
+
+        color_bar = pg.ColorBarItem(
+            values=range,
+            cmap=self.color_map,
+            interactive=False,
+            width=15,
+            orientation="v"
+        )
+        color_bar.setImageItem(img=[], insert_in=plot.getView())
+
+        return color_bar
+
 
 class ImageToolController(QtWidgets.QWidget):
     """Handles color mapping, mouse info, and ROI's."""
@@ -240,49 +260,65 @@ class ImageToolController(QtWidgets.QWidget):
 
         # Connections
         self.color_map_ctrl.colorMapChanged.connect(self._setColorMap)
+        self.color_map_ctrl.colorMapBoundsChanged.connect(
+            self._setColorMapBounds
+        )
 
     def _setMouseInfo(self, x, y, sender) -> None:
+        """Displays HKL coordinates, value, and source frames for a pixel.
+
+        - Only the single element under the mouse is read from the data
+        """
+
+        if x is None or y is None or sender != self.image_tool.plot_3d:
+            self.mouse_info_widget._setMouseInfo()
+            return
+
+        from imageanalysis.ui.data_view.gridded_data import \
+            GriddedDataWidget
+        from imageanalysis.ui.data_view.raw_data import \
+            RawDataWidget
+
+        h, k, l, value, frames = None, None, None, None, None
+        parent = self.image_tool.parent
+        scan = parent.scan
+        i = parent.controller.slice_index
+
+        # Oblique slices have values and HKL of the sampled point
+        if (
+            type(parent) == GriddedDataWidget and
+            parent.controller.oblique is not None
+        ):
+            value = self.image_tool.plot_3d.image_data[x, y]
+            h, k, l = parent.controller.oblique.getHKL(x, y)
+        # Projections only have values and in-plane coordinates
+        elif parent.controller.projection is not None:
+            value = self.image_tool.plot_3d.image_data[x, y]
+            if type(parent) == GriddedDataWidget:
+                ctrl = parent.controller
+                hkl = [None, None, None]
+                hkl[ctrl.dim_order[0]] = ctrl.coords[ctrl.dim_order[0]][x]
+                hkl[ctrl.dim_order[1]] = ctrl.coords[ctrl.dim_order[1]][y]
+                h, k, l = hkl
+        elif type(parent) == RawDataWidget:
+            value = scan.raw_data[i, x, y]
+            if scan.rsm is not None:
+                h, k, l = scan.rsm[i, x, y]
+            frames = np.array([i])
+        elif type(parent) == GriddedDataWidget:
+            ctrl = parent.controller
+            indices = ctrl.slicer.getIndices(ctrl.dim_order, x, y, i)
+            value = ctrl.slicer.data[indices]
+            h, k, l = [scan.grid_coords[d][indices[d]] for d in range(3)]
+            if scan.frame_bounds is not None:
+                frames = getContributingFrames(
+                    scan.frame_bounds, scan.grid_coords, indices
+                )
 
-        if x is None or y is None:
-            self.mouse_info_widget._setMouseInfo(None, None, None, None)
-        else:
-            from imageanalysis.ui.data_view.gridded_data import \
-                GriddedDataWidget
-            from imageanalysis.ui.data_view.raw_data import \
-                RawDataWidget
-
-            h, k, l, value = None, None, None, None
-
-            try:
-                # RawDataWidget
-                if type(self.image_tool.parent) == RawDataWidget:
-                    if sender == self.image_tool.plot_3d:
-                        i = self.image_tool.parent.controller.slice_index
-                        scan = self.image_tool.parent.scan
-                        h, k, l = scan.rsm[i, x, y]
-                        value = scan.raw_data[i, x, y]
-                    elif sender == self.image_tool.plot_2d:
-                        h, k, l, value = None, None, None, None
-                # GriddedDataWidget
-                elif type(self.image_tool.parent) == GriddedDataWidget:
-                    if sender == self.image_tool.plot_3d:
-                        ctrl = self.image_tool.parent.controller
-                        dim_order = ctrl.dim_order
-                        data = np.transpose(self.image_tool.data, dim_order)
-                        i = ctrl.slice_index
-                        value = data[x, y, i]
-                        scan = self.image_tool.parent.scan
-                        coords = scan.grid_coords
-                        h = coords[0][[x, y, i][dim_order.index(0)]]
-                        k = coords[1][[x, y, i][dim_order.index(1)]]
-                        l = coords[2][[x, y, i][dim_order.index(2)]]
-                    elif sender == self.image_tool.plot_2d:
-                        h, k, l, value = None, None, None, None
-            except:
-                pass
-
-            # HKL and intensity information passed to ImageToolController
-            self.mouse_info_widget._setMouseInfo(h=h, k=k, l=l, value=value)
+        # HKL and intensity information passed to ImageToolController
+        self.mouse_info_widget._setMouseInfo(
+            h=h, k=k, l=l, value=value, frames=frames
+        )
 
     def _setColorMap(self) -> None:
         """Applies color map from ColorMapController to ImageTool."""
@@ -292,6 +328,13 @@ class ImageToolController(QtWidgets.QWidget):
             range=(0, self.color_map_ctrl.color_map_max)
         )
 
+    def _setColorMapBounds(self) -> None:
+        """Applies color map range from ColorMapController to ImageTool."""
+
+        self.image_tool._setLevels(
+            range=(0, self.color_map_ctrl.color_map_max)
+        )
+
 
 class ImagePlot(pg.ImageView):
     """An adapted pyqtgraph ImageView object."""
@@ -300,7 +343,8 @@ class ImagePlot(pg.ImageView):
 
     def __init__(self, parent, dock, n_dim) -> None:
         super(ImagePlot, self).__init__(
-            view=pg.PlotItem()
+            view=pg.PlotItem(),
+            imageItem=LevelOfDetailImageItem(np.zeros((1, 1)))
         )
 
         # Sets parent widget
@@ -312,10 +356,11 @@ class ImagePlot(pg.ImageView):
         # Class variables for plotting
         self.data = None
         self.image_data = None
-        self.norm_image = None
         self.x_label, self.y_label = None, None
         self.x_coords, self.y_coords = None, None
         self.transform = None
+        self.pyramid = None # ImagePyramid for image in view
+        self.lod_region = None # Rendered (level, x_0, x_1, y_0, y_1)
 
         # Removing UI clutter
         self.ui.histogram.hide()
@@ -325,8 +370,20 @@ class ImagePlot(pg.ImageView):
         self.getView().setAspectLocked(False)
         self.getView().ctrlMenu = None
 
+        # Hidden histogram does not need to follow image changes
+        self.getImageItem().sigImageChanged.disconnect(
+            self.ui.histogram.imageChanged
+        )
+
         # Connections
-        self.getView().scene().sigMouseMoved.connect(self._updateMousePoint)
+        # Mouse movement is handled at most once per display refresh
+        self.mouse_proxy = pg.SignalProxy(
+            self.getView().scene().sigMouseMoved,
+            rateLimit=getRefreshRate(),
+            slot=self._updateMousePoint
+        )
+        self.getView().vb.sigRangeChanged.connect(self._updateLevelOfDetail)
+        self.getView().vb.sigResized.connect(self._updateLevelOfDetail)
 
     def _hide(self) -> None:
         """Hides plot and parent dock."""
@@ -350,7 +407,7 @@ class ImagePlot(pg.ImageView):
         x_axis: bool=True,
         y_axis: bool=True
     ) -> None:
-        """Normalizes and plots image with proper labels and axes."""
+        """Plots image with proper labels and axes."""
 
         self.image_data = image
         self.x_label = x_label
@@ -360,14 +417,11 @@ class ImagePlot(pg.ImageView):
 
         self._setLabels(x_label, y_label)
         self._setCoordinates(x_coords, y_coords)
-        self._normalizeImage()
 
-        self.setImage(
-            img=self.norm_image,
-            autoRange=False,
-            autoLevels=False,
-            transform=self.transform
-        )
+        # Image is displayed without copies and colored by the LUT
+        self.pyramid = ImagePyramid(self.image_data)
+        self.lod_region = None
+        self._updateLevelOfDetail()
         
         if x_axis:
             self.getView().showAxis("bottom")
@@ -381,18 +435,101 @@ class ImagePlot(pg.ImageView):
 
         self.updated.emit()
 
-    def _normalizeImage(self) -> None:
-        """Normalizes image values for color mapping."""
+    def _updateLevelOfDetail(self) -> None:
+        """Renders the pyramid level and region that match the view.
+
+        - Zoomed out views render a coarser max-pooled level
+        - Zoomed in views render only the visible region, with a margin of
+          half the visible size so that small pans do not re-render
+        """
+
+        if self.pyramid is None:
+            return
+
+        vb = self.getView().vb
+        n_x, n_y = self.image_data.shape[:2]
+        x_0, y_0 = self.x_coords[0], self.y_coords[0]
+        dx = self.x_coords[1] - self.x_coords[0]
+        dy = self.y_coords[1] - self.y_coords[0]
+
+        # Visible region in full resolution pixels
+        (x_min, x_max), (y_min, y_max) = vb.viewRange()
+        i_min, i_max = sorted([(x_min - x_0) / dx, (x_max - x_0) / dx])
+        j_min, j_max = sorted([(y_min - y_0) / dy, (y_max - y_0) / dy])
 
-        image = np.copy(self.image_data)
-        if self.image_tool.color_map_range is None:
-            norm_max = 1
+        if vb.width() > 0 and vb.height() > 0:
+            scale = min(
+                (i_max - i_min) / vb.width(),
+                (j_max - j_min) / vb.height()
+            )
         else:
-            norm_max = self.image_tool.color_map_range[-1]
-        image[image > norm_max] = norm_max
-        image[image == 0] = np.NAN
-        image = image / norm_max
-        self.norm_image = image
+            scale = 1
+        level = self.pyramid.getLevelForScale(scale)
+        factor = 2 ** level
+
+        visible = [
+            int(np.clip(np.floor(i_min), 0, n_x)),
+            int(np.clip(np.ceil(i_max), 0, n_x)),
+            int(np.clip(np.floor(j_min), 0, n_y)),
+            int(np.clip(np.ceil(j_max), 0, n_y))
+        ]
+        if visible[0] >= visible[1] or visible[2] >= visible[3]:
+            visible = [0, n_x, 0, n_y]
+
+        # Skips rendering if the visible region is already rendered
+        if self.lod_region is not None:
+            rendered_level, x_0_r, x_1_r, y_0_r, y_1_r = self.lod_region
+            if (
+                rendered_level == level and
+                x_0_r * factor <= visible[0] and
+                min(x_1_r * factor, n_x) >= visible[1] and
+                y_0_r * factor <= visible[2] and
+                min(y_1_r * factor, n_y) >= visible[3]
+            ):
+                return
+
+        image = self.pyramid.getLevel(level)
+        margin_x = (visible[1] - visible[0]) // 2
+        margin_y = (visible[3] - visible[2]) // 2
+        x_start = max(0, (visible[0] - margin_x) // factor)
+        x_stop = min(image.shape[0], -(-(visible[1] + margin_x) // factor))
+        y_start = max(0, (visible[2] - margin_y) // factor)
+        y_stop = min(image.shape[1], -(-(visible[3] + margin_y) // factor))
+
+        transform = QtGui.QTransform(self.transform)
+        transform.translate(x_start * factor, y_start * factor)
+        transform.scale(factor, factor)
+
+        image_item = self.getImageItem()
+        image_item.extent = (
+            (-x_start, n_x / factor - x_start),
+            (-y_start, n_y / factor - y_start)
+        )
+        image_item.setImage(
+            image=image[x_start:x_stop, y_start:y_stop],
+            autoLevels=False,
+            levels=self.image_tool.levels,
+            lut=self.image_tool.lut
+        )
+        image_item.setTransform(transform)
+        self.lod_region = (level, x_start, x_stop, y_start, y_stop)
+
+    def _setLookupTable(self, lut: np.ndarray) -> None:
+        """Recolors the displayed image with a new lookup table."""
+
+        if self.image_data is not None:
+            self.getImageItem().setLookupTable(lut)
+
+    def _setLevels(self, levels: tuple) -> None:
+        """Recolors the displayed image with new levels."""
+
+        if self.image_data is not None:
+            self.getImageItem().setLevels(levels)
+
+    def autoRange(self) -> None:
+        """Fits view to the image."""
+
+        self.getView().autoRange()
 
     def _setLabels(self, x_label, y_label) -> None:
         """Sets x and y axis labels."""
@@ -436,33 +573,31 @@ class ImagePlot(pg.ImageView):
         self.transform.translate(*pos)
         self.transform.scale(*scale)
 
-    def _updateMousePoint(self, scene_point=None) -> None:
+    def _updateMousePoint(self, args: tuple) -> None:
         """Updates mouse coordinates."""
 
         if self.controller is None:
             self.controller = self.image_tool.controller
-
-        if scene_point is not None:
-            view_point = self.getView().vb.mapSceneToView(scene_point)
-            x_point = int(
-                self.image_data.shape[0] * (
-                    (view_point.x() - self.x_coords[0]) /
-                    (self.x_coords[-1] - self.x_coords[0])
-                )
-            )
-            y_point = int(
-                self.image_data.shape[1] * (
-                    (view_point.y() - self.y_coords[0]) /
-                    (self.y_coords[-1] - self.y_coords[0])
-                )
-            )
-            if (
-                0 <= x_point < self.image_data.shape[0] and
-                0 <= y_point < self.image_data.shape[1]
-            ):
-                self.controller._setMouseInfo(x_point, y_point, sender=self)
-            else:
-                self.controller._setMouseInfo(None, None, sender=self)
+        if self.image_data is None:
+            return
+
+        # Pixel i covers [c0 + i * dc, c0 + (i + 1) * dc), as in the transform
+        view_point = self.getView().vb.mapSceneToView(args[0])
+        x_point = int(np.floor(
+            (view_point.x() - self.x_coords[0]) /
+            (self.x_coords[1] - self.x_coords[0])
+        ))
+        y_point = int(np.floor(
+            (view_point.y() - self.y_coords[0]) /
+            (self.y_coords[1] - self.y_coords[0])
+        ))
+        if (
+            0 <= x_point < self.image_data.shape[0] and
+            0 <= y_point < self.image_data.shape[1]
+        ):
+            self.controller._setMouseInfo(x_point, y_point, sender=self)
+        else:
+            self.controller._setMouseInfo(None, None, sender=self)
 
     def _setCoordinateIntervals(self, coords, labels):
         """Adds coord intervals to plot."""
@@ -518,7 +653,12 @@ class LinePlot(pg.PlotWidget):
     ) -> None:
         """Plots data points as a line."""
 
-        self.plot(data, clear=True)
+        if x_coords is not None:
+            self.plot(x_coords, data, clear=True)
+        else:
+            self.plot(data, clear=True)
+        if x_label is not None:
+            self.setLabel("bottom", x_label)
 
         if x_axis:
             self.showAxis("bottom")
@@ -567,6 +707,11 @@ class MouseInfoWidget(QtWidgets.QGroupBox):
             QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter
         )
         self.value_txt = QtWidgets.QLineEdit()
+        self.frames_lbl = QtWidgets.QLabel("Frames: ")
+        self.frames_lbl.setAlignment(
+            QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter
+        )
+        self.frames_txt = QtWidgets.QLineEdit()
 
         # Layout
         self.layout = QtWidgets.QGridLayout()
@@ -579,6 +724,8 @@ class MouseInfoWidget(QtWidgets.QGroupBox):
         self.layout.addWidget(self.l_txt, 2, 1, 1, 5)
         self.layout.addWidget(self.value_lbl, 3, 0)
         self.layout.addWidget(self.value_txt, 3, 1, 1, 5)
+        self.layout.addWidget(self.frames_lbl, 4, 0)
+        self.layout.addWidget(self.frames_txt, 4, 1, 1, 5)
         self.layout.setColumnStretch(0, 1)
         self.layout.setColumnStretch(1, 1)
         self.layout.setColumnStretch(2, 1)
@@ -586,16 +733,44 @@ class MouseInfoWidget(QtWidgets.QGroupBox):
         self.layout.setColumnStretch(4, 1)
         self.layout.setColumnStretch(5, 1)
 
-    def _setMouseInfo(self, h=None, k=None, l=None, value=None) -> None:
+    def _setMouseInfo(
+        self,
+        h: float=None,
+        k: float=None,
+        l: float=None,
+        value: float=None,
+        frames: np.ndarray=None
+    ) -> None:
         """Sets values to respective textboxes."""
 
-        if value is not None:
-            self.h_txt.setText(str(round(h, 7)))
-            self.k_txt.setText(str(round(k, 7)))
-            self.l_txt.setText(str(round(l, 7) or ""))
+        for txt, coord in ((self.h_txt, h), (self.k_txt, k), (self.l_txt, l)):
+            txt.setText("" if coord is None else str(round(coord, 7)))
+
+        if value is None:
+            self.value_txt.setText("")
+        elif np.isfinite(value):
             self.value_txt.setText(str(int(value)))
         else:
-            self.h_txt.setText("")
-            self.k_txt.setText("")
-            self.l_txt.setText("")
-            self.value_txt.setText("")
+            self.value_txt.setText(str(value))
+
+        # Frames are listed as a range with a count
+        if frames is None:
+            self.frames_txt.setText("")
+        elif len(frames) == 0:
+            self.frames_txt.setText("None")
+        elif len(frames) == 1:
+            self.frames_txt.setText(str(frames[0]))
+        else:
+            self.frames_txt.setText(
+                f"{frames[0]}-{frames[-1]} ({len(frames)})"
+            )
+
+
+def getRefreshRate() -> float:
+    """Returns the refresh rate of the primary screen in Hz."""
+
+    screen = QtWidgets.QApplication.primaryScreen()
+    if screen is None or screen.refreshRate() <= 0:
+        return 60.0
+
+    return screen.refreshRate()
@@ -8,13 +8,13 @@ import numpy as np
 from PyQt5 import QtWidgets
 import pyqtgraph as pg
 from pyqtgraph import QtCore
-from sklearn import preprocessing
 
 
 class ColorMapController(QtWidgets.QGroupBox):
     """Allows user to apply a colormap to an image."""
 
     colorMapChanged = QtCore.pyqtSignal()
+    colorMapBoundsChanged = QtCore.pyqtSignal()
 
     def __init__(self, parent) -> None:
         super(ColorMapController, self).__init__()
@@ -22,6 +22,8 @@ class ColorMapController(QtWidgets.QGroupBox):
         self.parent = parent
         self.color_map = None
         self.color_map_max = None
+        self.statistics = None # DataStatistics for data in view
+        self.percentile = 99.9 # Percentile used for automatic bounds
 
         self.setTitle("Color Map")
 
@@ -82,6 +84,21 @@ class ColorMapController(QtWidgets.QGroupBox):
         self.max_value_sbx.setMaximum(1000000)
         self.max_value_sbx.setSingleStep(1)
         self.max_value_sbx.setValue(1000)
+        self.auto_max_btn = QtWidgets.QPushButton("Auto")
+        self.auto_max_btn.setEnabled(False)
+        self.histogram_plot = pg.PlotWidget()
+        self.histogram_plot.setFixedHeight(80)
+        self.histogram_plot.hideAxis("left")
+        self.histogram_plot.setMouseEnabled(x=False, y=False)
+        self.histogram_plot.hideButtons()
+        self.histogram_plot.hide()
+        self.histogram_curve = self.histogram_plot.plot(
+            stepMode="center",
+            fillLevel=0,
+            brush=(128, 128, 128, 128)
+        )
+        self.max_value_line = pg.InfiniteLine(angle=90, movable=False)
+        self.histogram_plot.addItem(self.max_value_line)
 
         # Layout
         self.layout = QtWidgets.QGridLayout()
@@ -94,6 +111,8 @@ class ColorMapController(QtWidgets.QGroupBox):
         self.layout.addWidget(self.gamma_sbx, 2, 1)
         self.layout.addWidget(self.max_value_lbl, 3, 0)
         self.layout.addWidget(self.max_value_sbx, 3, 1)
+        self.layout.addWidget(self.auto_max_btn, 4, 0, 1, 2)
+        self.layout.addWidget(self.histogram_plot, 5, 0, 1, 2)
 
         # Connections
         self.name_cbx.currentIndexChanged.connect(self._setColorMap)
@@ -103,6 +122,7 @@ class ColorMapController(QtWidgets.QGroupBox):
         self.base_sbx.valueChanged.connect(self._setColorMap)
         self.gamma_sbx.valueChanged.connect(self._setColorMap)
         self.max_value_sbx.valueChanged.connect(self._setColorMapBounds)
+        self.auto_max_btn.clicked.connect(self._setAutoBounds)
 
         # Sets initial color map
         self._setColorMap()
@@ -149,7 +169,29 @@ class ColorMapController(QtWidgets.QGroupBox):
         """Sets maximum pixel value for color map."""
 
         self.color_map_max = self.max_value_sbx.value()
-        self.colorMapChanged.emit()
+        self.max_value_line.setValue(self.color_map_max)
+        self.colorMapBoundsChanged.emit()
+
+    def _setStatistics(self, statistics) -> None:
+        """Shows histogram of data in view and sets automatic bounds."""
+
+        self.statistics = statistics
+
+        counts, bin_edges = statistics.getHistogram()
+        self.histogram_curve.setData(bin_edges, np.log10(counts + 1))
+        self.histogram_plot.show()
+        self.auto_max_btn.setEnabled(True)
+
+        self._setAutoBounds()
+
+    def _setAutoBounds(self) -> None:
+        """Sets maximum pixel value to a percentile of the data."""
+
+        if self.statistics is None:
+            return
+
+        max_value = int(np.ceil(self.statistics.getPercentile(self.percentile)))
+        self.max_value_sbx.setValue(max_value)
 
 
 def createColorMap(
@@ -174,9 +216,7 @@ def createColorMap(
 
     if scale == "linear":
         stops = np.linspace(start=min, stop=max, num=n_pts)
-        stops = np.array([list(stops)])
-        stops = preprocessing.normalize(stops, norm="max")
-        stops = list(stops[0])
+        stops = list(normalizeByMax(stops))
     elif scale == "log":
         stops = np.logspace(
             start=0,
@@ -185,19 +225,58 @@ def createColorMap(
             num=n_pts,
             base=base
         )
-        stops = np.array([list(stops)])
-        stops = preprocessing.normalize(stops, norm="max")
-        stops = list(stops[0])
+        stops = list(normalizeByMax(stops))
     elif scale == "power":
         stops = np.linspace(start=min, stop=max, num=n_pts)
         stops -= min
         stops[stops < 0] = 0
         np.power(stops, gamma, stops)
         stops /= (max - min) ** gamma
-        stops = np.array([list(stops)])
-        stops = preprocessing.normalize(stops, norm="max")
-        stops = list(stops[0])
+        stops = list(normalizeByMax(stops))
     else:
         raise ValueError("Scale type not valid.")
 
     return pg.ColorMap(pos=stops, color=colors)
+
+
+def normalizeByMax(values: np.ndarray) -> np.ndarray:
+    """Returns values divided by their largest absolute value."""
+
+    values = np.asarray(values, dtype=float)
+    scale = np.max(np.abs(values)) if values.size > 0 else 0
+    if scale == 0:
+        return values
+
+    return values / scale
+
+
+def createLookupTable(color_map: pg.ColorMap, n_pts: int=256) -> np.ndarray:
+    """Returns an RGBA lookup table sampled from a color map.
+
+    - The first entry is transparent and is reserved for zero values
+    - Log and power scales are part of the color map stops, so the table
+      is sampled uniformly
+    """
+
+    lut = np.zeros((n_pts, 4), dtype=np.ubyte)
+    lut[1:] = color_map.getLookupTable(
+        start=0.0,
+        stop=1.0,
+        nPts=n_pts - 1,
+        alpha=True
+    )
+
+    return lut
+
+
+def getLevels(max_value: float, n_pts: int=256) -> tuple:
+    """Returns image levels for a table created by createLookupTable.
+
+    - Zero values map just inside the transparent first entry
+    - Values at or above max_value map to the last entry
+    """
+
+    delta = 1e-3
+    min_value = -max_value * (1 - delta) / (n_pts - 1 + delta)
+
+    return (min_value, max_value)
@@ -0,0 +1,92 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import numpy as np
+import pyqtgraph as pg
+
+
+class ImagePyramid:
+    """Max-pooled levels of an image for rendering at lower zoom.
+
+    - Level 0 is the image itself and each level halves both axes
+    - Levels are built on demand and cached
+    - Max pooling keeps isolated bright pixels visible when zoomed out
+    """
+
+    def __init__(self, image: np.ndarray, min_size: int=64) -> None:
+
+        self.levels = [image]
+        self.min_size = min_size
+
+        # Coarsest level keeps at least min_size pixels along each axis
+        min_dim = min(image.shape[:2])
+        if min_dim > min_size:
+            self.max_level = int(np.floor(np.log2(min_dim / min_size)))
+        else:
+            self.max_level = 0
+
+    def getLevel(self, level: int) -> np.ndarray:
+        """Returns the image at a pyramid level."""
+
+        level = min(max(0, level), self.max_level)
+        while len(self.levels) <= level:
+            self.levels.append(downsampleImage(self.levels[-1]))
+
+        return self.levels[level]
+
+    def getLevelForScale(self, scale: float) -> int:
+        """Returns the coarsest level with at least one pixel per screen pixel.
+
+        - scale is the number of full resolution pixels per screen pixel
+        """
+
+        if not np.isfinite(scale) or scale < 2:
+            return 0
+
+        return min(int(np.floor(np.log2(scale))), self.max_level)
+
+
+class LevelOfDetailImageItem(pg.ImageItem):
+    """An ImageItem that can show part of a larger image.
+
+    Views fit to the bounds of the full image rather than the region that
+    is currently rendered.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super(LevelOfDetailImageItem, self).__init__(*args, **kwargs)
+
+        self.extent = None # Bounds of full image in item coordinates
+
+    def dataBounds(self, axis: int, frac: float=1.0, orthoRange=None) -> tuple:
+        """Returns bounds of the full image along an axis."""
+
+        if self.extent is not None:
+            return self.extent[axis]
+        if self.image is None:
+            return None
+
+        return (0, self.image.shape[axis])
+
+
+def downsampleImage(image: np.ndarray) -> np.ndarray:
+    """Returns the maximum of every 2x2 block of an image.
+
+    - Odd rows and columns at the far edges are kept as they are
+    """
+
+    for axis in (0, 1):
+        n = image.shape[axis]
+        first, second = [slice(None)] * image.ndim, [slice(None)] * image.ndim
+        first[axis], second[axis] = slice(0, n - 1, 2), slice(1, n, 2)
+        pooled = np.maximum(image[tuple(first)], image[tuple(second)])
+        if n % 2:
+            last = [slice(None)] * image.ndim
+            last[axis] = slice(n - 1, n)
+            pooled = np.concatenate([pooled, image[tuple(last)]], axis=axis)
+        image = pooled
+
+    return image
@@ -9,6 +9,8 @@ from PyQt5 import QtWidgets
 import pyqtgraph as pg
 
 from imageanalysis.io import numpyToVTK
+from imageanalysis.roi import createPolygonMask, getLineCoords, \
+    getLinePoints, reduceMaskedStack, sampleLine, toPixelIndices
 from imageanalysis.structures import Curve
 
 
@@ -34,6 +36,8 @@ class ROIController(QtWidgets.QGroupBox):
         self.roi_type_lbl = QtWidgets.QLabel("ROI Type: ")
         self.roi_type_cbx = QtWidgets.QComboBox()
         self.roi_types = ["none", "line"]
+        if self.parent_plot.n_dim == 3:
+            self.roi_types.append("polygon")
         self.roi_type_cbx.addItems(self.roi_types)
         self.roi_details_gbx = QtWidgets.QGroupBox()
         self.roi_details_gbx_layout = QtWidgets.QGridLayout()
@@ -64,6 +68,7 @@ class ROIController(QtWidgets.QGroupBox):
 
         # Signals
         self.roi_type_cbx.currentTextChanged.connect(self._changeROIType)
+        self.calc_type_cbx.currentTextChanged.connect(self._changeCalcType)
         self.export_btn.clicked.connect(self._export)
         self.add_curve_btn.clicked.connect(self._addToCurveView)
 
@@ -78,10 +83,13 @@ class ROIController(QtWidgets.QGroupBox):
             self.child_plot._hide()
             self.roi_details_gbx.hide()
             if self.parent_plot.n_dim == 3:
+                self._resetChildControllers()
                 self.parent_plot.image_tool.controller.plot_2d_roi_ctrl.hide()
             if self.parent_plot.n_dim == 2:
                 self.parent_plot.image_tool.controller.plot_1d_roi_ctrl.hide()
         elif self.roi_type_cbx.currentText() == "line":
+            if self.parent_plot.n_dim == 3:
+                self._resetChildControllers()
             self.parent_plot.removeItem(self.roi)
             self.roi = LineSegmentROI(
                 parent_plot=self.parent_plot,
@@ -100,7 +108,41 @@ class ROIController(QtWidgets.QGroupBox):
                 self.parent_plot.image_tool.controller.plot_2d_roi_ctrl.show()
             if self.parent_plot.n_dim == 2:
                 self.parent_plot.image_tool.controller.plot_1d_roi_ctrl.show()
+        elif self.roi_type_cbx.currentText() == "polygon":
+            # Polygon results are plotted directly in the 1D plot
+            self._resetChildControllers()
+            self.child_plot._hide()
+            self.parent_plot.image_tool.controller.plot_2d_roi_ctrl.hide()
+            self.parent_plot.removeItem(self.roi)
+            self.roi = PolygonROI(
+                parent_plot=self.parent_plot,
+                child_plot=self.image_tool.plot_1d
+            )
+            self.parent_plot.addItem(self.roi)
+            self.center_btn.clicked.connect(self.roi._center)
+            self.calc_types = ["sum", "mean", "max"]
+            self.calc_type_cbx.clear()
+            self.calc_type_cbx.addItems(self.calc_types)
+            self.image_tool.plot_1d._show()
+            self.roi_details_gbx.show()
+            self.roi._getSlice()
+            self.parent_plot.image_tool.controller.plot_1d_roi_ctrl.show()
+
+    def _resetChildControllers(self) -> None:
+        """Removes ROI's from child plots and hides the 1D plot."""
+
+        controller = self.parent_plot.image_tool.controller
+        controller.plot_2d_roi_ctrl.roi_type_cbx.setCurrentText("none")
+        controller.plot_1d_roi_ctrl.hide()
+        self.image_tool.plot_1d._hide()
 
+    def _changeCalcType(self) -> None:
+        """Changes calculation applied to a polygon ROI."""
+
+        calc_type = self.calc_type_cbx.currentText()
+        if isinstance(self.roi, PolygonROI) and calc_type in self.calc_types:
+            self.roi.calculation = calc_type
+            self.roi._getSlice()
 
     def _export(self):
         """Exports data from imagetool."""
@@ -130,12 +172,14 @@ class ROIController(QtWidgets.QGroupBox):
 
 
     def _addToCurveView(self):
-        if self.roi is None:
-            self.roi = self.parent_plot.image_tool.controller.plot_2d_roi_ctrl.roi
+        controller = self.parent_plot.image_tool.controller
+        roi = controller.plot_3d_roi_ctrl.roi
+        if not isinstance(roi, PolygonROI):
+            roi = controller.plot_2d_roi_ctrl.roi
         curve = Curve(
-            data=self.roi.data,
-            labels=self.roi.labels,
-            coords=self.roi.coords,
+            data=roi.data,
+            labels=roi.labels,
+            coords=roi.coords,
             metadata=None
         )
         self.image_tool.parent.parent.parent.parent.plot_view._addCurve(curve)
@@ -161,7 +205,6 @@ class LineSegmentROI(pg.LineSegmentROI):
         )
 
         self.sigRegionChanged.connect(self._getSlice)
-        self.image_tool.colorMapUpdated.connect(self._getSlice)
 
     def _center(self) -> None:
         """Centers ROI diagonally across current image."""
@@ -172,6 +215,18 @@ class LineSegmentROI(pg.LineSegmentROI):
         self.movePoint(self.getHandles()[1], (x_2, y_2))
         self.parent_plot.autoRange()
 
+    def _getPoints(self) -> np.ndarray:
+        """Returns pixel indices along the line in the parent plot's image."""
+
+        start, end = [self.mapToParent(p) for p in self.listPoints()]
+        start, end = toPixelIndices(
+            [(start.x(), start.y()), (end.x(), end.y())],
+            self.parent_plot.x_coords,
+            self.parent_plot.y_coords
+        )
+
+        return getLinePoints(start, end)
+
     def _getSlice(self) -> None:
         """Retrieves and plots slice data."""
 
@@ -180,14 +235,13 @@ class LineSegmentROI(pg.LineSegmentROI):
         from imageanalysis.ui.data_view.raw_data import \
             RawDataWidget
 
-        data, coords = self.getArrayRegion(
-            data=self.parent_plot.image_tool.data,
-            img=self.parent_plot.getImageItem(),
-            returnMappedCoords=True
-        )
-        self.x_coords, self.y_coords = coords.astype(int)
-        
+        points = self._getPoints()
+        if points.shape[1] == 0:
+            return
+        self.x_coords, self.y_coords = points
+
         if type(self.image_tool.parent) == RawDataWidget:
+            labels = ["x", "y", "t"]
             if self.parent_plot.n_dim == 3:
                 data = self.image_tool.parent.scan.raw_data
                 coords = [
@@ -195,23 +249,12 @@ class LineSegmentROI(pg.LineSegmentROI):
                     np.linspace(0, data.shape[2]-1, data.shape[2]), 
                     np.linspace(0, data.shape[0]-1, data.shape[0])
                 ]
-                self.parent_plot._setCoordinateIntervals(coords, ["x", "y", "t"])
-                slice = []
-                slice_coords = [[], [], []]
-                for i in range(data.shape[0]):
-                    for x, y in zip(self.x_coords, self.y_coords):
-                        if 0 <= x < data.shape[1] and 0 <= y < data.shape[2]:
-                            slice.append(data[i, x, y])
-                        else:
-                            slice.append(0)
-                slice_coords[0] = self.x_coords
-                slice_coords[1] = self.y_coords
-                slice_coords[2] = range(data.shape[0])
-                self.child_plot._setCoordinateIntervals(slice_coords, ["x", "y", "t"])
-                            
-                slice_array = np.array(slice)
-                slice = slice_array.reshape((data.shape[0], len(self.x_coords)))
-                
+                self.parent_plot._setCoordinateIntervals(coords, labels)
+
+                slice = sampleLine(data, points)
+                slice_coords = [self.x_coords, self.y_coords, range(data.shape[0])]
+                self.child_plot._setCoordinateIntervals(slice_coords, labels)
+
                 self.child_plot._plot(
                     image=slice,
                     x_label="t",
@@ -219,62 +262,50 @@ class LineSegmentROI(pg.LineSegmentROI):
                 )
 
                 self.data = slice
-                self.labels = ["x", "y", "t"]
+                self.labels = labels
                 self.coords = slice_coords
 
                 if self.image_tool.plot_1d.isVisible():
                     self.image_tool.controller.plot_2d_roi_ctrl.roi._getSlice()
 
-
             elif self.parent_plot.n_dim == 2:
                 data = self.parent_plot.image_data
-
-                slice = []
-                slice_coords = [[], [], []]
-                for x, y in zip(self.x_coords, self.y_coords):
-                    if 0 <= x < data.shape[0] and 0 <= y < data.shape[1]:
-                        slice.append(data[x, y])
-                        slice_coords[2].append(self.parent_plot.intervals["t"][x])
-                        slice_coords[0].append(self.parent_plot.intervals["x"][y])
-                        slice_coords[1].append(self.parent_plot.intervals["y"][y])
-                    else:
-                        slice.append(0)
-                
-                
-                
-                self.child_plot._setCoordinateIntervals(slice_coords, ["x", "y", "t"])
+                slice = sampleLine(data[np.newaxis], points)[0]
+
+                # Image axes are (t, position along parent line)
+                intervals = self.parent_plot.intervals
+                slice_coords = [
+                    getLineCoords(intervals["x"], self.y_coords),
+                    getLineCoords(intervals["y"], self.y_coords),
+                    getLineCoords(intervals["t"], self.x_coords)
+                ]
+                self.child_plot._setCoordinateIntervals(slice_coords, labels)
 
                 self.child_plot._plot(data=slice, x_axis=False)
 
                 self.data = slice
-                self.labels = ["x", "y", "t"]
+                self.labels = labels
                 self.coords = slice_coords
 
-
         elif type(self.image_tool.parent) == GriddedDataWidget:
+            labels = ["H", "K", "L"]
+            controller = self.image_tool.parent.controller
+            dim_order = controller.dim_order
             if self.parent_plot.n_dim == 3:
-                dim_order = self.image_tool.parent.controller.dim_order
-                data = np.transpose(self.image_tool.data, dim_order)
-                x_label = ["H", "K", "L"][dim_order[2]]
-                x_coords = self.image_tool.parent.controller.coords[dim_order[2]]
-
-                slice = []
-                slice_coords = [[], [], []]
-                for i in range(data.shape[2]):
-                    for x, y in zip(self.x_coords, self.y_coords):
-                        if 0 <= x < data.shape[0] and 0 <= y < data.shape[1]:
-                            slice.append(data[x, y, i])
-                            slice_coords[0].append(self.image_tool.parent.controller.coords[dim_order[0]][x])
-                            slice_coords[1].append(self.image_tool.parent.controller.coords[dim_order[1]][y])
-                        else:
-                            slice.append(0)
-                slice_coords[2] = x_coords
-                slice_coords[0], slice_coords[1], slice_coords[2] = slice_coords[dim_order[0]], slice_coords[dim_order[1]], slice_coords[dim_order[2]]
-                self.child_plot._setCoordinateIntervals(slice_coords, ["H", "K", "L"])
-
-                slice_array = np.array(slice)
-                slice = slice_array.reshape((data.shape[2], len(self.x_coords)))
-
+                stack = controller.slicer.getStack(dim_order)
+                x_label = labels[dim_order[2]]
+                x_coords = controller.coords[dim_order[2]]
+
+                slice = sampleLine(stack, points)
+                slice_coords = [None, None, None]
+                slice_coords[dim_order[0]] = getLineCoords(
+                    controller.coords[dim_order[0]], self.x_coords
+                )
+                slice_coords[dim_order[1]] = getLineCoords(
+                    controller.coords[dim_order[1]], self.y_coords
+                )
+                slice_coords[dim_order[2]] = x_coords
+                self.child_plot._setCoordinateIntervals(slice_coords, labels)
 
                 self.child_plot._plot(
                     image=slice,
@@ -284,7 +315,7 @@ class LineSegmentROI(pg.LineSegmentROI):
                 )
 
                 self.data = slice
-                self.labels = ["H", "K", "L"]
+                self.labels = labels
                 self.coords = slice_coords
 
                 if self.image_tool.plot_1d.isVisible():
@@ -292,24 +323,150 @@ class LineSegmentROI(pg.LineSegmentROI):
                     
             elif self.parent_plot.n_dim == 2:
                 data = self.parent_plot.image_data
-                dim_order = self.image_tool.parent.controller.dim_order
-                slice = []
-                slice_coords = [[], [], []]
-                for x, y in zip(self.x_coords, self.y_coords):
-                    if 0 <= x < data.shape[0] and 0 <= y < data.shape[1]:
-                        slice.append(data[x, y])
-                        slice_coords[2].append(self.parent_plot.intervals["L"][x])
-                        slice_coords[0].append(self.parent_plot.intervals["H"][y])
-                        slice_coords[1].append(self.parent_plot.intervals["K"][y])
-                    else:
-                        slice.append(0)
-
-                slice_coords[0], slice_coords[1], slice_coords[2] = slice_coords[dim_order[0]], slice_coords[dim_order[1]], slice_coords[dim_order[2]]
-                self.child_plot._setCoordinateIntervals(slice_coords, ["H", "K", "L"])
-
-                slice = np.array(slice)
+                slice = sampleLine(data[np.newaxis], points)[0]
+
+                # Image axes are (stack dimension, position along parent line)
+                intervals = self.parent_plot.intervals
+                slice_coords = [None, None, None]
+                for i in range(3):
+                    idx = self.x_coords if i == dim_order[2] else self.y_coords
+                    slice_coords[i] = getLineCoords(intervals[labels[i]], idx)
+                self.child_plot._setCoordinateIntervals(slice_coords, labels)
+
                 self.child_plot._plot(data=slice, x_axis=False)
 
                 self.data = slice
-                self.labels = ["H", "K", "L"]
+                self.labels = labels
                 self.coords = slice_coords
+
+
+class PolygonROI(pg.PolyLineROI):
+    """A closed polygon that reduces the region it covers for every image.
+
+    The polygon is rasterized into a mask at the current image resolution.
+    The mask is cached by vertex list and applied to every frame of raw data
+    or every slice of gridded data at once.
+    """
+
+    def __init__(
+        self,
+        parent_plot,
+        child_plot
+    ) -> None:
+
+        self.parent_plot = parent_plot
+        self.child_plot = child_plot
+        self.image_tool = self.parent_plot.image_tool
+        self.calculation = "sum"
+
+        # Cached mask and reduction
+        self.mask = None
+        self.mask_key = None
+        self.result_key = None
+
+        super(PolygonROI, self).__init__(
+            positions=self._getDefaultPositions(),
+            closed=True
+        )
+
+        self.sigRegionChanged.connect(self._getSlice)
+
+    def _getDefaultPositions(self) -> list:
+        """Returns vertices of a diamond inscribed in the current image."""
+
+        x_1, y_1 = self.parent_plot.x_coords[0], self.parent_plot.y_coords[0]
+        x_2, y_2 = self.parent_plot.x_coords[-1], self.parent_plot.y_coords[-1]
+        x_c, y_c = (x_1 + x_2) / 2, (y_1 + y_2) / 2
+        dx, dy = (x_2 - x_1) / 4, (y_2 - y_1) / 4
+
+        return [
+            (x_c - dx, y_c), (x_c, y_c - dy), (x_c + dx, y_c), (x_c, y_c + dy)
+        ]
+
+    def _center(self) -> None:
+        """Resets ROI to a diamond centered in the current image."""
+
+        self.setPoints(self._getDefaultPositions(), closed=True)
+        self.parent_plot.autoRange()
+        self._getSlice()
+
+    def _getVertices(self) -> np.ndarray:
+        """Returns vertices in fractional pixel coordinates of the image."""
+
+        points = [
+            self.mapToParent(pos) for _, pos in self.getLocalHandlePositions()
+        ]
+
+        return toPixelIndices(
+            [(point.x(), point.y()) for point in points],
+            self.parent_plot.x_coords,
+            self.parent_plot.y_coords
+        )
+
+    def _getMask(self, shape: tuple) -> np.ndarray:
+        """Returns mask for current vertices, rasterizing only if they moved."""
+
+        vertices = self._getVertices()
+        mask_key = (tuple(np.round(vertices, 6).flatten()), tuple(shape))
+        if mask_key != self.mask_key:
+            self.mask = createPolygonMask(vertices, shape)
+            self.mask_key = mask_key
+
+        return self.mask
+
+    def _getSlice(self) -> None:
+        """Reduces the masked region of every image and plots the result."""
+
+        from imageanalysis.ui.data_view.gridded_data import \
+            GriddedDataWidget
+        from imageanalysis.ui.data_view.raw_data import \
+            RawDataWidget
+
+        # Stack is indexed as (image, x, y)
+        if type(self.image_tool.parent) == RawDataWidget:
+            stack = self.image_tool.parent.scan.raw_data
+            dim_order = (0, 1, 2)
+            labels = ["x", "y", "t"]
+            coords = [np.arange(n) for n in stack.shape[1:] + stack.shape[:1]]
+        elif type(self.image_tool.parent) == GriddedDataWidget:
+            controller = self.image_tool.parent.controller
+            dim_order = controller.dim_order
+            stack = controller.slicer.getStack(dim_order)
+            labels = ["H", "K", "L"]
+            coords = controller.coords
+        else:
+            return
+
+        mask = self._getMask(stack.shape[1:])
+
+        # Skips reduction if nothing relevant has changed
+        result_key = (
+            self.mask_key,
+            dim_order,
+            self.calculation,
+            self.image_tool.data_version
+        )
+        if result_key == self.result_key:
+            return
+        self.result_key = result_key
+
+        self.data = reduceMaskedStack(stack, mask, self.calculation)
+
+        # Coordinates of the mask centroid are used for in-plane dimensions
+        x_idx, y_idx = np.nonzero(mask)
+        stack_coords = coords[dim_order[2]]
+        slice_coords = [None, None, None]
+        slice_coords[dim_order[2]] = np.array(stack_coords)
+        for i, idx in ((0, x_idx), (1, y_idx)):
+            dim_coords = coords[dim_order[i]]
+            center = dim_coords[int(np.mean(idx))] if len(idx) else np.nan
+            slice_coords[dim_order[i]] = np.full(len(self.data), center)
+        self.labels = labels
+        self.coords = slice_coords
+
+        self.child_plot._setCoordinateIntervals(slice_coords, labels)
+        self.child_plot._plot(
+            data=self.data,
+            x_label=labels[dim_order[2]],
+            x_coords=stack_coords
+        )
@@ -0,0 +1,251 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+from collections import deque
+import queue
+import threading
+import time
+
+import numpy as np
+from PyQt5 import QtWidgets
+from pyqtgraph import QtCore
+
+
+class FrameProducer(threading.Thread):
+    """Prepares frames ahead of playback on a background thread.
+
+    - Frames are queued with their playback step so late frames can be
+      dropped by the consumer
+    - A None item is queued after the last frame when playback does not loop
+    """
+
+    def __init__(
+        self,
+        getFrame,
+        n_frames: int,
+        start_index: int,
+        loop: bool=True,
+        buffer_size: int=8
+    ) -> None:
+        super(FrameProducer, self).__init__(daemon=True)
+
+        self.getFrame = getFrame
+        self.n_frames = n_frames
+        self.start_index = start_index
+        self.loop = loop
+        self.buffer = queue.Queue(maxsize=buffer_size)
+        self.step = 0 # Next playback step to produce
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def run(self) -> None:
+        """Produces frames until stopped or out of frames."""
+
+        while not self.stop_event.is_set():
+            with self.lock:
+                step = self.step
+                self.step += 1
+
+            index = self.getIndex(step)
+            if index is None:
+                self._put(None)
+                return
+
+            # Non-contiguous slices are gathered here instead of on render
+            frame = np.ascontiguousarray(self.getFrame(index))
+            self._put((step, index, frame))
+
+    def getIndex(self, step: int) -> int:
+        """Returns the frame index for a playback step."""
+
+        index = self.start_index + step
+        if index < self.n_frames:
+            return index
+        elif self.loop:
+            return index % self.n_frames
+        else:
+            return None
+
+    def seek(self, step: int) -> None:
+        """Skips production ahead to a playback step."""
+
+        with self.lock:
+            self.step = max(self.step, step)
+
+    def stop(self) -> None:
+        """Stops production."""
+
+        self.stop_event.set()
+
+    def _put(self, item) -> None:
+        """Adds an item to the buffer, waiting while it is full."""
+
+        while not self.stop_event.is_set():
+            try:
+                self.buffer.put(item, timeout=0.05)
+                return
+            except queue.Full:
+                continue
+
+
+class PlaybackController(QtWidgets.QWidget):
+    """Plays through frames at a target frame rate.
+
+    - Frames are read ahead by a FrameProducer
+    - Each timer tick shows the newest frame that is due, so frames are
+      dropped instead of delaying playback when rendering falls behind
+    - Achieved frame rate is shown next to the target
+    """
+
+    # Emits frame index and image
+    frameChanged = QtCore.pyqtSignal(int, object)
+
+    def __init__(self, getFrame, n_frames: int, loop: bool=True) -> None:
+        super(PlaybackController, self).__init__()
+
+        self.getFrame = getFrame
+        self.n_frames = n_frames
+        self.loop = loop
+        self.index = 0 # Index of frame in view
+        self.fps = 10
+        self.producer = None
+        self.pending = None # Produced frame that is not yet due
+        self.start_time = None
+        self.frame_times = deque()
+
+        self.timer = QtCore.QTimer()
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+
+        # Child widgets
+        self.play_btn = QtWidgets.QPushButton("Play")
+        self.play_btn.setCheckable(True)
+        self.fps_sbx = QtWidgets.QSpinBox()
+        self.fps_sbx.setMinimum(1)
+        self.fps_sbx.setMaximum(120)
+        self.fps_sbx.setValue(self.fps)
+        self.fps_sbx.setSuffix(" fps")
+        self.fps_lbl = QtWidgets.QLabel("")
+        self.fps_lbl.setMinimumWidth(50)
+
+        # Layout
+        self.layout = QtWidgets.QHBoxLayout()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(self.layout)
+        self.layout.addWidget(self.play_btn)
+        self.layout.addWidget(self.fps_sbx)
+        self.layout.addWidget(self.fps_lbl)
+
+        # Connections
+        self.play_btn.toggled.connect(self._setPlaying)
+        self.fps_sbx.valueChanged.connect(self._setFPS)
+        self.timer.timeout.connect(self._showNextFrame)
+
+    def stop(self) -> None:
+        """Stops playback."""
+
+        self.play_btn.setChecked(False)
+
+    def _setPlaying(self, playing: bool) -> None:
+        """Starts or stops playback."""
+
+        if playing:
+            self._start()
+        else:
+            self._stop()
+
+    def _start(self) -> None:
+        """Starts a producer after the frame in view."""
+
+        start_index = self.index + 1
+        if start_index >= self.n_frames:
+            if not self.loop:
+                self.play_btn.setChecked(False)
+                return
+            start_index = 0
+
+        self.producer = FrameProducer(
+            getFrame=self.getFrame,
+            n_frames=self.n_frames,
+            start_index=start_index,
+            loop=self.loop
+        )
+        self.destroyed.connect(self.producer.stop)
+        self.pending = None
+        self.frame_times.clear()
+        # First frame is due on the first timer tick
+        self.start_time = time.perf_counter() + 1 / self.fps
+
+        self.play_btn.setText("Pause")
+        self.producer.start()
+        self.timer.start(max(1, int(1000 / self.fps)))
+
+    def _stop(self) -> None:
+        """Stops timer and producer."""
+
+        self.timer.stop()
+        if self.producer is not None:
+            self.producer.stop()
+            self.destroyed.disconnect(self.producer.stop)
+            self.producer = None
+        self.play_btn.setText("Play")
+        self.fps_lbl.setText("")
+
+    def _setFPS(self) -> None:
+        """Sets target frame rate, restarting playback if needed."""
+
+        self.fps = self.fps_sbx.value()
+        if self.producer is not None:
+            self._stop()
+            self._start()
+
+    def _showNextFrame(self) -> None:
+        """Shows the newest frame that is due and drops late frames."""
+
+        due_step = int((time.perf_counter() - self.start_time) * self.fps)
+        frame = None
+        finished = False
+
+        while True:
+            if self.pending is not None:
+                item, self.pending = self.pending, None
+            else:
+                try:
+                    item = self.producer.buffer.get_nowait()
+                except queue.Empty:
+                    break
+            if item is None:
+                finished = True
+                break
+            if item[0] > due_step:
+                self.pending = item
+                break
+            frame = item
+
+        if frame is None:
+            # Production is behind playback, so late steps are skipped
+            if self.pending is None and not finished:
+                self.producer.seek(due_step)
+        else:
+            _, self.index, image = frame
+            self.frameChanged.emit(self.index, image)
+            self._updateFrameRate()
+
+        if finished:
+            self.stop()
+
+    def _updateFrameRate(self) -> None:
+        """Shows frame rate achieved over the last second."""
+
+        now = time.perf_counter()
+        self.frame_times.append(now)
+        while now - self.frame_times[0] > 1:
+            self.frame_times.popleft()
+
+        if len(self.frame_times) > 1:
+            span = self.frame_times[-1] - self.frame_times[0]
+            self.fps_lbl.setText(
+                f"{(len(self.frame_times) - 1) / span:.1f} fps"
+            )
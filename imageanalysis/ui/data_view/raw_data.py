@@ -4,12 +4,14 @@ See LICENSE file.
 """
 
 
+import numpy as np
 from PyQt5 import QtWidgets
 from pyqtgraph import QtCore
 from pyqtgraph.dockarea import Dock, DockArea
 
 from imageanalysis.structures import Scan
 from imageanalysis.ui.data_view.image_tool import ImageTool
+from imageanalysis.ui.data_view.playback import PlaybackController
 
 
 class RawDataWidget(DockArea):
@@ -68,28 +70,60 @@ class RawDataController(QtWidgets.QWidget):
 
         self.data = scan.raw_data
         self.slice_index = 0
+        self.projection = None # "max" or "sum" when a projection is shown
 
         # Child widgets
         self.data_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
         self.data_slider.setMaximum(self.data.shape[0] - 1)
         self.data_sbx = QtWidgets.QSpinBox()
         self.data_sbx.setMaximum(self.data.shape[0] - 1)
+        self.mode_cbx = QtWidgets.QComboBox()
+        self.mode_cbx.addItems(["Slice", "Max", "Sum"])
+        self.playback = PlaybackController(
+            getFrame=lambda index: self.data[index],
+            n_frames=self.data.shape[0]
+        )
 
         # Layout
         self.layout = QtWidgets.QGridLayout()
         self.setLayout(self.layout)
         self.layout.addWidget(self.data_slider, 0, 0, 1, 3)
         self.layout.addWidget(self.data_sbx, 0, 3, 1, 1)
+        self.layout.addWidget(self.mode_cbx, 0, 4, 1, 1)
+        self.layout.addWidget(self.playback, 0, 5, 1, 2)
         for i in range(self.layout.columnCount()):
             self.layout.setColumnStretch(i, 1)
 
         # Connections
         self.data_slider.valueChanged.connect(self._setSliceIndex)
         self.data_sbx.valueChanged.connect(self._setSliceIndex)
+        self.mode_cbx.currentIndexChanged.connect(self._setProjection)
+        self.playback.frameChanged.connect(self._showFrame)
 
         # Display first image
         self._setImage()
 
+    def _refreshData(self) -> None:
+        """Shows raw data after frames are added to the scan."""
+
+        self.data = self.scan.raw_data
+        n_frames = self.data.shape[0]
+        self.data_slider.setMaximum(n_frames - 1)
+        self.data_sbx.setMaximum(n_frames - 1)
+        self.playback.n_frames = n_frames
+
+        self.image_tool.data = self.data
+        self.image_tool.data_version += 1
+        if self.projection is None:
+            statistics = self.scan.raw_stats
+        else:
+            statistics = self.scan.raw_projections.getStatistics(
+                self.projection, 0
+            )
+        self.image_tool._setStatistics(statistics)
+
+        self._setImage()
+
     def _setSliceIndex(self) -> None:
         """Sets index for slice in view."""
 
@@ -101,13 +135,57 @@ class RawDataController(QtWidgets.QWidget):
             self.data_slider.setValue(index)
 
         self.slice_index = index
+        self.playback.index = index
+        self._setImage()
+
+    def _showFrame(self, index: int, image: np.ndarray) -> None:
+        """Shows a frame prepared during playback."""
+
+        self.slice_index = index
+        for widget in [self.data_slider, self.data_sbx]:
+            widget.blockSignals(True)
+            widget.setValue(index)
+            widget.blockSignals(False)
+
+        self._setImage(image)
+
+    def _setProjection(self) -> None:
+        """Switches between single images and projections along t."""
+
+        mode = self.mode_cbx.currentText()
+        if mode != "Slice":
+            self.playback.stop()
+        self.data_slider.setEnabled(mode == "Slice")
+        self.data_sbx.setEnabled(mode == "Slice")
+        self.playback.setEnabled(mode == "Slice")
+
+        if mode == "Slice":
+            self.projection = None
+            statistics = self.scan.raw_stats
+        else:
+            self.projection = mode.lower()
+            statistics = self.scan.raw_projections.getStatistics(
+                self.projection, 0
+            )
+        if statistics is not None:
+            self.image_tool._setStatistics(statistics)
+
         self._setImage()
 
-    def _setImage(self) -> None:
-        """Sets image for connected ImageTool."""
+    def _setImage(self, image: np.ndarray=None) -> None:
+        """Sets image for connected ImageTool.
+
+        - An image prepared during playback is shown as is
+        """
 
-        image = self.data[self.slice_index]
+        if image is None and self.projection is None:
+            image = self.data[self.slice_index]
+        elif image is None:
+            image = self.scan.raw_projections.getImage(
+                self.projection, (1, 2, 0)
+            )
         self.image_tool._setImage(
             image=image,
-            data=self.data
+            data=self.data,
+            statistics=self.scan.raw_stats
         )
@@ -0,0 +1,102 @@
+"""Copyright (c) UChicago Argonne, LLC. All rights reserved.
+
+See LICENSE file.
+"""
+
+
+import os
+
+from pyqtgraph import QtCore
+
+from imageanalysis.structures import Scan
+
+
+# Interval between checks for new frames on file systems without
+# change notifications
+POLL_INTERVAL_MS = 1000
+# Delay for gathering change notifications into one batch of frames
+BATCH_DELAY_MS = 100
+
+
+class ScanWatcher(QtCore.QObject):
+    """Adds frames to a scan while it is acquiring.
+
+    - Changes to the image directory and SPEC file are reported by a
+      QFileSystemWatcher, which uses inotify where available
+    - A timer also polls, for file systems without change notifications
+    - Notifications are gathered so frames are added in batches
+    - Watching stops once every point of a finished scan has a frame
+    """
+
+    # Emits number of frames added
+    framesAdded = QtCore.pyqtSignal(int)
+
+    def __init__(
+        self,
+        scan: Scan,
+        poll_interval_ms: int=POLL_INTERVAL_MS,
+        parent=None
+    ) -> None:
+        super(ScanWatcher, self).__init__(parent)
+
+        self.scan = scan
+        self.paused = False # Frames are not added while paused
+
+        self.file_watcher = QtCore.QFileSystemWatcher()
+        self.batch_timer = QtCore.QTimer()
+        self.batch_timer.setSingleShot(True)
+        self.batch_timer.setInterval(BATCH_DELAY_MS)
+        self.poll_timer = QtCore.QTimer()
+        self.poll_timer.setInterval(poll_interval_ms)
+
+        # Connections
+        self.file_watcher.directoryChanged.connect(self.batch_timer.start)
+        self.file_watcher.fileChanged.connect(self.batch_timer.start)
+        self.batch_timer.timeout.connect(self._loadNewFrames)
+        self.poll_timer.timeout.connect(self._loadNewFrames)
+
+    def start(self) -> None:
+        """Starts watching the scan's image directory and SPEC file."""
+
+        for path in [self.scan.image_path, self.scan.project.spec_path]:
+            if os.path.exists(path):
+                self.file_watcher.addPath(path)
+        self.poll_timer.start()
+
+    def stop(self) -> None:
+        """Stops watching."""
+
+        self.poll_timer.stop()
+        self.batch_timer.stop()
+        paths = self.file_watcher.files() + self.file_watcher.directories()
+        if len(paths) > 0:
+            self.file_watcher.removePaths(paths)
+
+    def isWatching(self) -> bool:
+        """Returns whether the watcher is running."""
+
+        return self.poll_timer.isActive()
+
+    def isFinished(self) -> bool:
+        """Checks if a later scan has started and every point has a frame."""
+
+        spec_data = self.scan.project.spec_data
+        last_number = spec_data.getScanNumbers()[-1]
+        n_frames = 0 if self.scan.raw_data is None else \
+            self.scan.raw_data.shape[0]
+
+        return str(last_number) != str(self.scan.number) and \
+            n_frames >= self.scan.n_pts
+
+    def _loadNewFrames(self) -> None:
+        """Adds new frames to the scan and reports them."""
+
+        if self.paused:
+            return
+
+        n_frames = self.scan.loadNewFrames()
+        if n_frames > 0:
+            self.framesAdded.emit(n_frames)
+
+        if self.isFinished():
+            self.stop()
@@ -4,13 +4,18 @@ See LICENSE file.
 """
 
 
+import copy
+
 from PyQt5 import QtWidgets
 from pyqtgraph import QtCore
 
-from imageanalysis.io import \
-    isValidProjectPath, getSPECPaths, getXMLPaths
+from imageanalysis.io import ProjectIndex
 from imageanalysis.structures import Project, Scan
 
+
+# Interval between checks for new scans in live mode
+LIVE_UPDATE_INTERVAL_MS = 2000
+
 class ProjectSelectionWidget(QtWidgets.QWidget):
     """QtWidget that allows user to:
     
@@ -21,6 +26,7 @@ class ProjectSelectionWidget(QtWidgets.QWidget):
 
     main_window = None # Main window of application
     project_path = None # Absolute path of project directory
+    project_index = None # ProjectIndex of project directory
     spec_path = None # Absolute path of project SPEC file
     instrument_path = None # Absolute path of project instrument config XML
     detector_path = None # Absolute path of project detector config XML
@@ -96,8 +102,11 @@ class ProjectSelectionWidget(QtWidgets.QWidget):
         # Omits empty paths from cancelling out of file dialog
         if project_path != "":
             # Checks if project path is valid
-            if isValidProjectPath(project_path):
+            # Directory is listed and classified once for all comboboxes
+            project_index = ProjectIndex(project_path)
+            if project_index.isValid():
                 self.project_path = project_path
+                self.project_index = project_index
                 self.select_project_txt.setText(project_path)
                 self._addSPECFilesToComboBox()
                 self._addInstrumentFilesToComboBox()
@@ -115,33 +124,31 @@ class ProjectSelectionWidget(QtWidgets.QWidget):
     def _addSPECFilesToComboBox(self) -> None:
         """Adds valid SPEC files to combobox."""
         
-        spec_paths = getSPECPaths(self.project_path) 
+        spec_paths = self.project_index.spec_paths
         self.spec_cbx.clear()
         self.spec_cbx.addItems(spec_paths)
 
     def _addInstrumentFilesToComboBox(self) -> None:
-        """Adds valid XML files to combobox."""
+        """Adds XML files to combobox, selecting a valid instrument file."""
 
-        xml_paths = getXMLPaths(self.project_path)
+        xml_paths = self.project_index.xml_paths
         self.instrument_cbx.clear()
         self.instrument_cbx.addItems(xml_paths)
 
         for i in range(len(xml_paths)):
-            if "Instrument" in str(xml_paths[i]) or \
-                "instrument" in str(xml_paths[i]):
+            if xml_paths[i] in self.project_index.instrument_paths:
                 self.instrument_cbx.setCurrentIndex(i)
                 break
 
     def _addDetectorFilesToComboBox(self) -> None:
-        """Adds valid XML files to combobox."""
+        """Adds XML files to combobox, selecting a valid detector file."""
 
-        xml_paths = getXMLPaths(self.project_path)
+        xml_paths = self.project_index.xml_paths
         self.detector_cbx.clear()
         self.detector_cbx.addItems(xml_paths)
 
         for i in range(len(xml_paths)):
-            if "Detector" in str(xml_paths[i]) or \
-                "detector" in str(xml_paths[i]):
+            if xml_paths[i] in self.project_index.detector_paths:
                 self.detector_cbx.setCurrentIndex(i)
                 break
 
@@ -187,7 +194,8 @@ class ProjectSelectionWidget(QtWidgets.QWidget):
             project_path=self.project_path,
             spec_path=self.spec_path,
             instrument_path=self.instrument_path,
-            detector_path=self.detector_path
+            detector_path=self.detector_path,
+            scan_dirs=self.project_index.getScanDirectories(self.spec_path)
         )
         self.project = project
         self.main_window.scan_selection_widget._loadProject(project)
@@ -207,6 +215,9 @@ class ScanSelectionWidget(QtWidgets.QWidget):
     scan_table_items = None # Scan items in table widget
     preview_table = None # Groupbox to hold basic scan preview information
     load_selected_scans_btn = None # Button to load all selected scans
+    watch_scan_btn = None # Button to load a scan as its frames are written
+    live_chkbx = None # CheckBox to follow new scans in the project
+    live_timer = None # Timer for checking the project for new scans
     
     layout = None # Grid layout
 
@@ -221,6 +232,9 @@ class ScanSelectionWidget(QtWidgets.QWidget):
         self.scan_table = QtWidgets.QTableWidget(0, 4)
         self.preview_table = QtWidgets.QTableWidget(8, 1)
         self.load_selected_scan_btn = QtWidgets.QPushButton("Load Scan")
+        self.watch_scan_btn = QtWidgets.QPushButton("Watch Scan")
+        self.live_chkbx = QtWidgets.QCheckBox("Live")
+        self.live_timer = QtCore.QTimer()
 
         # Widget options
         self.setEnabled(False)
@@ -238,18 +252,28 @@ class ScanSelectionWidget(QtWidgets.QWidget):
         self.preview_table.setVerticalHeaderLabels(["Scan", "nPts", "Start Value", "End Value", "Grid Size", "H Grid Bounds", "K Grid Bounds", "L Grid Bounds"])
         self.preview_table.horizontalHeader().setSectionResizeMode(
             0, QtWidgets.QHeaderView.Stretch)
+        self.live_chkbx.setToolTip("Add scans as they are written")
+        self.live_timer.setInterval(LIVE_UPDATE_INTERVAL_MS)
+        self.watch_scan_btn.setToolTip(
+            "Load frames while the scan is acquiring"
+        )
         
         # Layout
         self.layout = QtWidgets.QGridLayout()
         self.setLayout(self.layout)
         self.layout.addWidget(self.scan_table, 0, 0, 3, 12)
         self.layout.addWidget(self.preview_table, 3, 0, 4, 12)
-        self.layout.addWidget(self.load_selected_scan_btn, 7, 0, 1, 12)
+        self.layout.addWidget(self.load_selected_scan_btn, 7, 0, 1, 5)
+        self.layout.addWidget(self.watch_scan_btn, 7, 5, 1, 5)
+        self.layout.addWidget(self.live_chkbx, 7, 10, 1, 2)
 
         # Connections
         self.scan_table.cellClicked.connect(self._previewScan)
         self.scan_table.entered.connect(self._previewScan)
         self.load_selected_scan_btn.clicked.connect(self._loadScan)
+        self.watch_scan_btn.clicked.connect(self._watchScan)
+        self.live_chkbx.toggled.connect(self._setLive)
+        self.live_timer.timeout.connect(self._updateProject)
 
     def _loadProject(self, project: Project) -> None:
         self.setEnabled(True)
@@ -259,9 +283,34 @@ class ScanSelectionWidget(QtWidgets.QWidget):
         self.scan_table.setRowCount(0)
         self.scan_table_items = []
 
+        # Scans are parsed and mapped when selected
         for scan_number in project.scans.keys():
             scan = project.scans[scan_number]
-            scan.map()
+            self._addScanToTable(scan=scan)
+
+    def _setLive(self, live: bool) -> None:
+        """Starts or stops following new scans in the project."""
+
+        if live:
+            self._updateProject()
+            self.live_timer.start()
+        else:
+            self.live_timer.stop()
+
+    def _updateProject(self) -> None:
+        """Adds rows for new scans in the project.
+
+        - Existing rows are kept, and only their point counts are refreshed
+        """
+
+        if self.project is None:
+            return
+
+        new_scans = self.project.update()
+
+        for sti in self.scan_table_items:
+            sti.n_pts_lbl.setText(str(sti.scan.n_pts))
+        for scan in new_scans:
             self._addScanToTable(scan=scan)
 
     def _addScanToTable(self, scan: Scan) -> None:
@@ -291,6 +340,9 @@ class ScanSelectionWidget(QtWidgets.QWidget):
         h_bounds = f"({round(h_min, 5)}, {round(h_max, 5)})"
         k_bounds = f"({round(k_min, 5)}, {round(k_max, 5)})"
         l_bounds = f"({round(l_min, 5)}, {round(l_max, 5)})"
+        # Default bounds come from the RSM, which is made on load or options
+        if scan.rsm is None:
+            h_bounds, k_bounds, l_bounds = "", "", ""
 
         self.preview_table.setCellWidget(0, 0, QtWidgets.QLabel(str(scan.number)))
         self.preview_table.setCellWidget(1, 0, QtWidgets.QLabel(str(scan.n_pts)))
@@ -307,11 +359,33 @@ class ScanSelectionWidget(QtWidgets.QWidget):
         i = self.scan_table.currentRow()
         scan_item = self.scan_table_items[i]
         scan = scan_item.scan    
-        scan.loadRawData()
+        if scan.rsm is None:
+            scan.map()
+        try:
+            scan.loadRawData()
+        except FileNotFoundError as e:
+            # Points without a frame file are listed in the error
+            msg = QtWidgets.QMessageBox()
+            msg.setIcon(QtWidgets.QMessageBox.Critical)
+            msg.setWindowTitle("Error")
+            msg.setText(f"Scan could not be loaded: {e}")
+            msg.exec_()
+            return
         scan.grid()
         self.main_window.data_view._addScan(scan=scan)
         self.main_window.plot_view.setEnabled(True)
 
+    def _watchScan(self) -> None:
+        """Loads a Scan into the DataView as its frames are written.
+
+        - Frames are gridded with the scan's current grid options
+        """
+
+        i = self.scan_table.currentRow()
+        scan = self.scan_table_items[i].scan
+        self.main_window.data_view._watchScan(scan=scan)
+        self.main_window.plot_view.setEnabled(True)
+
 
 class ScanSelectionWidgetItem:
 
@@ -359,6 +433,11 @@ class ScanSelectionWidgetItem:
         self.options_btn.clicked.connect(self._setOptions)
 
     def _setOptions(self) -> None:
+        # Default grid bounds come from the RSM
+        if self.scan.rsm is None:
+            self.scan.map()
+            self.options_dialog._resetOptions()
+        self.options_dialog._refreshLoadedState()
         self.options_dialog.exec_()
         self.parent._previewScan()
 
@@ -379,9 +458,20 @@ class ScanOptionsDialogWidget(QtWidgets.QDialog):
     grid_l_min_sbx = None
     grid_l_max_sbx = None
     grid_l_n_sbx = None
+    raw_storage_lbl = None
+    raw_storage_cbx = None
+    mapping_backend_lbl = None
+    mapping_backend_cbx = None
+    detector_gbx = None
+    detector_x_min_sbx = None
+    detector_x_max_sbx = None
+    detector_y_min_sbx = None
+    detector_y_max_sbx = None
+    pixel_binning_sbx = None
     save_options_btn = None
     layout = None
     grid_options_gbx_layout = None
+    detector_gbx_layout = None
     
     def __init__(self, scan) -> None:
         super(ScanOptionsDialogWidget, self).__init__()
@@ -401,8 +491,19 @@ class ScanOptionsDialogWidget(QtWidgets.QDialog):
         self.grid_l_min_sbx = QtWidgets.QDoubleSpinBox()
         self.grid_l_max_sbx = QtWidgets.QDoubleSpinBox()
         self.grid_l_n_sbx = QtWidgets.QSpinBox()
+        self.raw_storage_lbl = QtWidgets.QLabel("Raw Data Storage:")
+        self.raw_storage_cbx = QtWidgets.QComboBox()
+        self.mapping_backend_lbl = QtWidgets.QLabel("Mapping:")
+        self.mapping_backend_cbx = QtWidgets.QComboBox()
+        self.detector_gbx = QtWidgets.QGroupBox("Detector Region")
+        self.detector_x_min_sbx = QtWidgets.QSpinBox()
+        self.detector_x_max_sbx = QtWidgets.QSpinBox()
+        self.detector_y_min_sbx = QtWidgets.QSpinBox()
+        self.detector_y_max_sbx = QtWidgets.QSpinBox()
+        self.pixel_binning_sbx = QtWidgets.QSpinBox()
         self.reset_btn = QtWidgets.QPushButton("Reset")
         self.save_options_btn = QtWidgets.QPushButton("Save Options")
+        self.consolidate_btn = QtWidgets.QPushButton("Consolidate Frames")
         
         # Widget options
         self.grid_options_table.setCellWidget(0, 0, self.grid_h_min_sbx)
@@ -455,23 +556,57 @@ class ScanOptionsDialogWidget(QtWidgets.QDialog):
         self.grid_l_n_sbx.setMinimum(10)
         self.grid_l_n_sbx.setMaximum(750)
 
+        self.raw_storage_cbx.addItems(["Dense", "Sparse", "Compressed"])
+        self.mapping_backend_cbx.addItems(["xrayutilities", "NumPy"])
+        self.mapping_backend_cbx.setToolTip(
+            "NumPy maps every point at once from precomputed pixel directions"
+        )
+        self.pixel_binning_sbx.setMinimum(1)
+        self.pixel_binning_sbx.setMaximum(16)
+        self.pixel_binning_sbx.setToolTip(
+            "Average blocks of N x N pixels in frames and the RSM"
+        )
         self.reset_btn.setDefault(False)
+        self.consolidate_btn.setToolTip(
+            "Write frames to one HDF5 file that is read on later loads"
+        )
         
         # Layout
         self.layout = QtWidgets.QGridLayout()
         self.setLayout(self.layout)
         self.layout.addWidget(self.grid_options_gbx, 0, 0, 1, 2)
-        self.layout.addWidget(self.save_options_btn, 1, 0, 1, 2)
-        self.layout.addWidget(self.reset_btn, 2, 0, 1, 2)
+        self.layout.addWidget(self.raw_storage_lbl, 1, 0, 1, 1)
+        self.layout.addWidget(self.raw_storage_cbx, 1, 1, 1, 1)
+        self.layout.addWidget(self.mapping_backend_lbl, 2, 0, 1, 1)
+        self.layout.addWidget(self.mapping_backend_cbx, 2, 1, 1, 1)
+        self.layout.addWidget(self.detector_gbx, 3, 0, 1, 2)
+        self.layout.addWidget(self.save_options_btn, 4, 0, 1, 2)
+        self.layout.addWidget(self.reset_btn, 5, 0, 1, 2)
+        self.layout.addWidget(self.consolidate_btn, 6, 0, 1, 2)
 
         # Grid options layout
         self.grid_options_gbx_layout = QtWidgets.QGridLayout()
         self.grid_options_gbx.setLayout(self.grid_options_gbx_layout)
         self.grid_options_gbx_layout.addWidget(self.grid_options_table)
 
+        # Detector region layout
+        self.detector_gbx_layout = QtWidgets.QGridLayout()
+        self.detector_gbx.setLayout(self.detector_gbx_layout)
+        self.detector_gbx_layout.addWidget(QtWidgets.QLabel("Min"), 0, 1)
+        self.detector_gbx_layout.addWidget(QtWidgets.QLabel("Max"), 0, 2)
+        self.detector_gbx_layout.addWidget(QtWidgets.QLabel("x"), 1, 0)
+        self.detector_gbx_layout.addWidget(self.detector_x_min_sbx, 1, 1)
+        self.detector_gbx_layout.addWidget(self.detector_x_max_sbx, 1, 2)
+        self.detector_gbx_layout.addWidget(QtWidgets.QLabel("y"), 2, 0)
+        self.detector_gbx_layout.addWidget(self.detector_y_min_sbx, 2, 1)
+        self.detector_gbx_layout.addWidget(self.detector_y_max_sbx, 2, 2)
+        self.detector_gbx_layout.addWidget(QtWidgets.QLabel("Binning"), 3, 0)
+        self.detector_gbx_layout.addWidget(self.pixel_binning_sbx, 3, 1)
+
         # Connections
         self.reset_btn.clicked.connect(self._resetOptions)
         self.save_options_btn.clicked.connect(self.accept)
+        self.consolidate_btn.clicked.connect(self._consolidate)
 
         self._resetOptions()
 
@@ -486,7 +621,64 @@ class ScanOptionsDialogWidget(QtWidgets.QDialog):
         self.grid_l_min_sbx.setValue(self.grid_options["L"]["min"])
         self.grid_l_max_sbx.setValue(self.grid_options["L"]["max"])
         self.grid_l_n_sbx.setValue(self.grid_options["L"]["n"])
+        self.raw_storage_cbx.setCurrentText(self.scan.raw_storage.title())
+        self.mapping_backend_cbx.setCurrentIndex(
+            int(self.scan.mapping_backend == "numpy")
+        )
+
+        # Detector region covers the full detector unless one is set
+        shape = self.scan.project.getDetectorShape()
+        roi = self.scan.detector_roi or [0, shape[0], 0, shape[1]]
+        for sbx, value, n in [
+            (self.detector_x_min_sbx, roi[0], shape[0]),
+            (self.detector_x_max_sbx, roi[1], shape[0]),
+            (self.detector_y_min_sbx, roi[2], shape[1]),
+            (self.detector_y_max_sbx, roi[3], shape[1])
+        ]:
+            sbx.setMaximum(n)
+            sbx.setValue(value)
+        self.pixel_binning_sbx.setValue(self.scan.pixel_binning)
+
+        self._refreshLoadedState()
+
+    def _refreshLoadedState(self) -> None:
+        """Updates options that depend on whether the scan's data is loaded.
+
+        - Called each time the dialog is shown, since the scan may have been
+          loaded or closed since the options were reset
+        """
+
+        # Region of a scan with loaded data is only changed once it is closed
+        loaded = self.scan.raw_data is not None
+        self.detector_gbx.setEnabled(not loaded)
+        self.detector_gbx.setToolTip(
+            "Close the scan to change its detector region" if loaded else
+            "Process only a region of the detector, e.g. for quick surveys"
+        )
+
+        # Compressed raw data reports how much memory it saves
+        tooltip = "Sparse storage keeps only nonzero pixels of each " \
+            "frame\nCompressed storage keeps frames compressed in memory"
+        if hasattr(self.scan.raw_data, "getCompressionRatio"):
+            ratio = self.scan.raw_data.getCompressionRatio()
+            tooltip += f"\nCompression ratio of loaded frames: {ratio:.1f}"
+        self.raw_storage_cbx.setToolTip(tooltip)
         
+    def _consolidate(self) -> None:
+        """Consolidates the scan's frames, displaying errors in a dialog."""
+
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            self.scan.consolidate()
+        except (ImportError, KeyError, OSError) as e:
+            msg = QtWidgets.QMessageBox()
+            msg.setIcon(QtWidgets.QMessageBox.Critical)
+            msg.setWindowTitle("Error")
+            msg.setText(f"Frames could not be consolidated: {e}")
+            msg.exec_()
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+
     def _validateOptions(self) -> None:
         ...
 
@@ -522,4 +714,36 @@ class ScanOptionsDialogWidget(QtWidgets.QDialog):
             self.grid_options["L"]["min"],
             self.grid_options["L"]["max"]
         )
+        # Takes effect the next time raw data is loaded
+        self.scan.raw_storage = self.raw_storage_cbx.currentText().lower()
+        # Takes effect the next time the scan is mapped
+        self.scan.mapping_backend = \
+            self.mapping_backend_cbx.currentText().lower()
+
+        # Changing the region releases the scan's RSM, which is remade with
+        # the grid options above
+        shape = self.scan.project.getDetectorShape()
+        roi = [
+            self.detector_x_min_sbx.value(), self.detector_x_max_sbx.value(),
+            self.detector_y_min_sbx.value(), self.detector_y_max_sbx.value()
+        ]
+        binning = self.pixel_binning_sbx.value()
+        if roi == [0, shape[0], 0, shape[1]]:
+            roi = None
+        if self.scan.raw_data is None and (
+            roi != self.scan.detector_roi or binning != self.scan.pixel_binning
+        ):
+            try:
+                self.scan.setDetectorRegion(roi, binning)
+            except ValueError as e:
+                msg = QtWidgets.QMessageBox()
+                msg.setIcon(QtWidgets.QMessageBox.Critical)
+                msg.setWindowTitle("Error")
+                msg.setText(str(e))
+                msg.exec_()
+                return
+            grid_params = copy.deepcopy(self.scan.grid_params)
+            self.scan.map()
+            self.scan.grid_params = grid_params
+
         return super().accept()
\ No newline at end of file
@@ -17,12 +17,12 @@ setup(
     packages=find_packages(),
     python_requires= "== 3.8.*",
     install_requires=[
+        "h5py",
         "matplotlib",
         "numpy",
         "PyQt5",
         "pyqtgraph",
         "rsMap3D",
-        "scikit-learn",
         "spec2nexus",
         "tifffile",
         "xrayutilities",
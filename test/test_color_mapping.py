@@ -0,0 +1,22 @@
+import numpy as np
+
+from imageanalysis.ui.data_view.image_tool.color_mapping import \
+    createColorMap, createLookupTable, getLevels
+
+
+def test_createLookupTable():
+    for scale in ["linear", "log", "power"]:
+        lut = createLookupTable(createColorMap("magma", scale), n_pts=64)
+        assert lut.shape == (64, 4)
+        assert lut[0, 3] == 0
+        assert np.all(lut[1:, 3] == 255)
+
+
+def test_getLevels():
+    # Same index mapping as pyqtgraph's rescaling of float images
+    n_pts = 64
+    min_value, max_value = getLevels(100, n_pts)
+    values = np.array([0, 0.5, 50, 100, 1000])
+    scale = n_pts / (max_value - min_value)
+    indices = np.clip((values - min_value) * scale, 0, n_pts - 1).astype(int)
+    assert list(indices) == [0, 1, 32, 63, 63]
@@ -0,0 +1,107 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from imageanalysis.consolidation import (
+    ConsolidatedScan, getChunkShape, getConsolidatedPath
+)
+from imageanalysis.io import reduceFrame
+from imageanalysis.structures import Project
+
+
+def createProject(path, n_pts):
+    # Scan 839 of the sample project, cut to its first points
+    with open("sample_project/pmn_pt011_2_1.spec") as f:
+        lines = f.read()[:-1].split("\n")
+    start = next(i for i, l in enumerate(lines) if l.startswith("#S 839"))
+    end = next(i for i, l in enumerate(lines) if i > start and l[:2] == "#L")
+    with open(path / "pmn_pt011_2_1.spec", "w") as f:
+        f.write("\n".join(lines[:end + 1 + n_pts]) + "\n")
+
+    for name in ["6IDB_Instrument.xml", "6IDB_DetectorGeometry.xml"]:
+        shutil.copy(f"sample_project/{name}", path)
+    image_path = path / "images" / "pmn_pt011_2_1" / "S839"
+    os.makedirs(image_path)
+    for i in range(n_pts):
+        name = f"pmn_pt011_2_1_S839_{str(i).zfill(5)}.tif"
+        shutil.copy(
+            f"sample_project/images/pmn_pt011_2_1/S839/{name}", image_path
+        )
+
+    return Project(
+        project_path=str(path),
+        spec_path=str(path / "pmn_pt011_2_1.spec"),
+        instrument_path=str(path / "6IDB_Instrument.xml"),
+        detector_path=str(path / "6IDB_DetectorGeometry.xml")
+    )
+
+
+def test_getChunkShape():
+    assert getChunkShape((401, 487, 195), 4) == (16, 128, 128)
+    assert getChunkShape((3, 10, 20), 4) == (3, 10, 20)
+
+
+def test_consolidateScan(tmp_path):
+    scan = createProject(tmp_path, n_pts=20).scans[839]
+    scan.loadRawData()
+    expected = scan.raw_data
+
+    path = scan.consolidate()
+    assert path == getConsolidatedPath(scan.image_path)
+    with ConsolidatedScan(path) as consolidated:
+        assert consolidated.frames.chunks[0] == 16
+        assert np.allclose(consolidated.getFrame(3), expected[3])
+        pixel = consolidated.getPixel(100, 50)
+        assert np.allclose(pixel, expected[:, 100, 50])
+        assert len(consolidated.file["spec/data/H"]) == 20
+
+    # Consolidated file is read instead of frame files
+    shutil.rmtree(scan.image_path)
+    os.makedirs(scan.image_path)
+    scan.loadRawData()
+    assert np.allclose(scan.raw_data, expected)
+    assert scan.raw_stats.max == np.max(expected)
+
+
+def test_consolidateScan_failure(tmp_path):
+    scan = createProject(tmp_path, n_pts=20).scans[839]
+
+    # Unreadable frame leaves no partial file behind
+    with open(scan.frame_index.getPath(10), "wb") as f:
+        f.write(b"not a tif")
+    with pytest.raises(OSError):
+        scan.consolidate()
+    path = getConsolidatedPath(scan.image_path)
+    assert not os.path.exists(f"{path}.tmp")
+    assert not os.path.exists(path)
+
+
+def test_setDetectorRegion(tmp_path):
+    scan = createProject(tmp_path, n_pts=20).scans[839]
+    scan.loadRawData()
+    full = scan.raw_data
+
+    # Region starts are aligned to the binning
+    scan.setDetectorRegion([101, 301, 50, 150], binning=4)
+    assert scan.detector_roi == [100, 301, 48, 150]
+    assert scan.raw_data is None
+    scan.loadRawData()
+    expected = np.array([
+        reduceFrame(frame, [100, 301, 48, 150], 4) for frame in full
+    ])
+    assert scan.raw_data.shape == (20, 51, 26)
+    assert np.allclose(scan.raw_data, expected)
+
+    # Consolidated frames are reduced in the same way
+    scan.consolidate()
+    scan.loadRawData()
+    assert np.allclose(scan.raw_data, expected)
+
+    scan.setDetectorRegion([0, 487, 0, 195])
+    assert scan.detector_roi is None
+    with pytest.raises(ValueError):
+        scan.setDetectorRegion([0, 500, 0, 195])
+    with pytest.raises(ValueError):
+        scan.setDetectorRegion(binning=0)
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from imageanalysis.frames import CompressedFrameStore, createFrameStore
+from imageanalysis.gridding import gridScan
+from imageanalysis.projections import createProjections, createSparseProjections
+from imageanalysis.roi import reduceMaskedStack
+
+
+def createFrames():
+    rng = np.random.default_rng(0)
+    frames = rng.random((6, 9, 7))
+    frames[frames < 0.8] = 0
+    frames[2] = 0
+    frames[3] = 0.5
+    return frames
+
+
+def createStore(frames, storage="sparse"):
+    store = createFrameStore(storage, frames.shape[1:])
+    for frame in frames:
+        store.append(frame)
+    return store
+
+
+def test_SparseFrameStore():
+    frames = createFrames()
+    store = createStore(frames)
+    assert store.shape == frames.shape and len(store) == 6
+    assert store.n_stored == np.count_nonzero(frames)
+    assert store.nbytes < frames.nbytes
+
+    # Indexing matches the dense array
+    assert np.array_equal(store[4], frames[4])
+    assert np.array_equal(store[1:5, 2:4, 3], frames[1:5, 2:4, 3])
+    assert np.array_equal(store[:, [1, 2], [3, 4]], frames[:, [1, 2], [3, 4]])
+    assert np.array_equal(np.asarray(store), frames)
+
+    with pytest.raises(ValueError):
+        store.append(np.zeros((7, 9)))
+
+
+def test_SparseFrameStore_reductions():
+    frames = createFrames()
+    store = createStore(frames)
+
+    expected = createProjections(frames)
+    projections = createSparseProjections(store)
+    for calculation in ["max", "sum"]:
+        for dim in (0, 1, 2):
+            assert np.allclose(
+                projections.getProjection(calculation, dim),
+                expected.getProjection(calculation, dim)
+            )
+
+    mask = np.zeros((9, 7), dtype=bool)
+    mask[2:6, 1:4] = True
+    for calculation in ["sum", "mean", "max"]:
+        assert np.allclose(
+            reduceMaskedStack(store, mask, calculation),
+            reduceMaskedStack(frames, mask, calculation)
+        )
+
+    statistics = store.computeStatistics()
+    assert statistics.min == 0 and statistics.max == frames.max()
+
+    rsm = np.random.default_rng(1).random((6, 9, 7, 3))
+    grid_params = {dim: {"min": 0.0, "max": 1.0, "n": 4} for dim in "HKL"}
+    assert np.allclose(
+        gridScan(store, rsm, grid_params)[0],
+        gridScan(frames, rsm, grid_params)[0]
+    )
+
+
+def test_CompressedFrameStore():
+    frames = createFrames()
+    store = createStore(frames, "compressed")
+    assert isinstance(store, CompressedFrameStore)
+    assert store.shape == frames.shape
+    assert store.getCompressionRatio() > 1
+
+    # Frames are lossless, and reads of single frames are cached
+    assert np.array_equal(np.asarray(store), frames)
+    assert len(store.cache) == 0
+    for point in [0, 1, 2, 0, -1]:
+        assert np.array_equal(store[point], frames[point])
+    assert list(store.cache.keys()) == [1, 2, 0, 5]
+
+    store.hot_frames = 2
+    store.getFrame(3)
+    assert list(store.cache.keys()) == [5, 3]
+    assert store.nbytes == store.compressed_nbytes + 2 * frames[0].nbytes
+
+    mask = np.zeros((9, 7), dtype=bool)
+    mask[2:6, 1:4] = True
+    assert np.allclose(
+        reduceMaskedStack(store, mask, "max"),
+        reduceMaskedStack(frames, mask, "max")
+    )
@@ -0,0 +1,11 @@
+import numpy as np
+
+from imageanalysis.ui.data_view.gridded_data import getNearestIndex
+
+
+def test_getNearestIndex():
+    coords = np.linspace(2, 3, 401)
+
+    assert getNearestIndex(coords, 2.0) == 0
+    assert getNearestIndex(coords, 2.5 + 0.001) == 200
+    assert getNearestIndex(coords, 5.0) == 400
@@ -0,0 +1,71 @@
+import numpy as np
+
+from imageanalysis.gridding import (
+    GridAccumulator, getContributingFrames, getFrameBounds, gridScan
+)
+from imageanalysis.slicing import GridSlicer
+from imageanalysis.structures import Project
+
+
+def test_getContributingFrames():
+    # Each frame covers a unit interval in H that shifts by 0.5 per frame
+    h = np.arange(4)[:, None, None] * 0.5 + np.linspace(0, 1, 6)[None, :, None]
+    rsm = np.zeros((4, 6, 5, 3))
+    rsm[..., 0] = h
+    rsm[..., 1] = np.linspace(0, 1, 5)[None, None, :]
+    frame_bounds = getFrameBounds(rsm)
+    assert frame_bounds.shape == (2, 4, 3)
+
+    coords = [np.linspace(0, 2.5, 11), np.linspace(0, 1, 5), np.array([0.0])]
+    frames = getContributingFrames(frame_bounds, coords, (0, 2, 0))
+    assert list(frames) == [0]
+    frames = getContributingFrames(frame_bounds, coords, (4, 2, 0))
+    assert list(frames) == [0, 1, 2]
+    frames = getContributingFrames(frame_bounds, coords, (10, 2, 0))
+    assert list(frames) == [3]
+
+
+def test_GridAccumulator():
+    rng = np.random.default_rng(0)
+    rsm = rng.random((6, 8, 7, 3))
+    raw_data = rng.random((6, 8, 7))
+    grid_params = {
+        "H": {"min": 0.0, "max": 1.0, "n": 5},
+        "K": {"min": 0.0, "max": 1.0, "n": 5},
+        "L": {"min": 0.0, "max": 1.0, "n": 5}
+    }
+    expected, expected_coords = gridScan(raw_data, rsm, grid_params)
+
+    # Frames added in blocks grid the same as all frames at once
+    accumulator = GridAccumulator(grid_params)
+    for start, end in [(0, 1), (1, 4), (4, 6)]:
+        accumulator.update(raw_data[start:end], rsm[start:end])
+    grid_data, coords = accumulator.getData()
+    assert accumulator.n_frames == 6
+    assert np.allclose(grid_data, expected)
+    assert np.allclose(coords, expected_coords)
+
+
+def test_scan_grid():
+    scan = Project(
+        project_path="sample_project/",
+        spec_path="sample_project/pmn_pt011_2_1.spec",
+        instrument_path="sample_project/6IDB_Instrument.xml",
+        detector_path="sample_project/6IDB_DetectorGeometry.xml"
+    ).scans[839]
+    rng = np.random.default_rng(0)
+    scan.raw_data = rng.random((6, 8, 7))
+    scan.rsm = rng.random((6, 8, 7, 3))
+    scan.grid_params = {
+        "H": {"min": 0.0, "max": 1.0, "n": 5},
+        "K": {"min": 0.0, "max": 1.0, "n": 5},
+        "L": {"min": 0.0, "max": 1.0, "n": 5}
+    }
+    scan.grid()
+
+    # Gridded data views slice the grid through the scan's slicer
+    assert isinstance(scan.grid_slicer, GridSlicer)
+    scan.grid_slicer.setActiveOrder((0, 1, 2))
+    assert np.array_equal(
+        scan.grid_slicer.getSlice((0, 1, 2), 1), scan.grid_data[:, :, 1]
+    )
@@ -0,0 +1,109 @@
+import os
+import shutil
+
+import numpy as np
+from PIL import Image
+import tifffile
+
+from imageanalysis import io
+
+
+def createProject(path):
+    shutil.copy("sample_project/6IDB_DetectorGeometry.xml", path)
+    (path / "data.spec").write_text("")
+    (path / "notes.xml").write_text("<notes/>")
+    for scan, n_images in [("S001", 3), ("S002", 0)]:
+        scan_path = path / "images" / "data" / scan
+        os.makedirs(scan_path)
+        for i in range(n_images):
+            (scan_path / f"data_{scan}_{i}.tif").write_bytes(b"")
+        (scan_path / "log.txt").write_text("")
+
+
+def test_ProjectIndex(tmp_path):
+    createProject(tmp_path)
+    index = io.ProjectIndex(str(tmp_path))
+
+    assert index.spec_paths == ["data.spec"]
+    assert index.xml_paths == ["6IDB_DetectorGeometry.xml", "notes.xml"]
+    assert index.detector_paths == ["6IDB_DetectorGeometry.xml"]
+    assert index.image_path == str(tmp_path / "images")
+    # Scan directories are listed when first requested
+    assert index.scan_directories == {} and index.image_directories == {}
+    assert index.getScanDirectories("data.spec") == {"S001", "S002"}
+    assert index.image_directories == {}
+    assert index.getScanImageDirectories("data.spec") == {"S001": 3, "S002": 0}
+    assert index.getScanImageDirectories("other.spec") == {}
+
+
+def test_classifyXMLFile(tmp_path, monkeypatch):
+    path = shutil.copy("sample_project/6IDB_DetectorGeometry.xml", tmp_path)
+    calls = []
+    isValidDetectorXMLFile = io.isValidDetectorXMLFile
+    monkeypatch.setattr(
+        io,
+        "isValidDetectorXMLFile",
+        lambda path: calls.append(path) or isValidDetectorXMLFile(path)
+    )
+
+    # Detector files are checked as detectors first and cached
+    assert io.classifyXMLFile(path) == "detector"
+    assert io.classifyXMLFile(path) == "detector"
+    assert len(calls) == 1
+
+    # Changed files are classified again
+    with open(path, "a") as f:
+        f.write(" ")
+    assert io.classifyXMLFile(path) == "detector"
+    assert len(calls) == 2
+
+
+def test_FrameIndex(tmp_path):
+    frame_index = io.FrameIndex(
+        "sample_project/images/pmn_pt011_2_1/S839", "pmn_pt011_2_1"
+    )
+    assert frame_index.getPath(12) == "sample_project/images/" \
+        "pmn_pt011_2_1/S839/pmn_pt011_2_1_S839_00012.tif"
+    assert frame_index.exists(400) and not frame_index.exists(401)
+    assert frame_index.getMissingPoints(401) == []
+    assert frame_index.getExtraPoints(401) == []
+
+    # Unpadded names are found by listing, other files are ignored
+    createProject(tmp_path)
+    frame_index = io.FrameIndex(str(tmp_path / "images/data/S001"), "data")
+    assert not frame_index.exists(1)
+    assert frame_index.getMissingPoints(4) == [3]
+    assert frame_index.getExtraPoints(2) == [2]
+    assert frame_index.exists(1)
+
+
+def test_readFrame(tmp_path):
+    path = "sample_project/images/pmn_pt011_2_1/S839/" \
+        "pmn_pt011_2_1_S839_00000.tif"
+    frame = io.readFrame(path)
+    assert isinstance(frame, np.memmap)
+    assert np.array_equal(frame, np.array(Image.open(path)).T)
+
+    # Compressed frames are decoded
+    image = np.arange(12, dtype=np.int32).reshape(3, 4)
+    tifffile.imwrite(tmp_path / "frame.tif", image, compression="zlib")
+    frame = io.readFrame(str(tmp_path / "frame.tif"))
+    assert not isinstance(frame, np.memmap)
+    assert np.array_equal(frame, image.T)
+
+
+def test_reduceFrame():
+    frame = np.arange(35).reshape(5, 7)
+    assert np.shares_memory(io.reduceFrame(frame, [1, 4, 2, 7]), frame)
+    assert np.array_equal(
+        io.reduceFrame(frame, [1, 4, 2, 7]), frame[1:4, 2:7]
+    )
+
+    # Edge blocks average the pixels they have
+    binned = io.reduceFrame(frame, [0, 5, 1, 7], binning=2)
+    assert binned.shape == (3, 3)
+    assert binned[0, 0] == np.mean(frame[0:2, 1:3])
+    assert binned[2, 2] == np.mean(frame[4:5, 5:7])
+
+    shape = io.getDetectorShape("sample_project/6IDB_DetectorGeometry.xml")
+    assert shape == (487, 195)
@@ -0,0 +1,24 @@
+import numpy as np
+
+from imageanalysis.ui.data_view.image_tool.level_of_detail import \
+    ImagePyramid, downsampleImage
+
+
+def test_downsampleImage():
+    image = np.zeros((7, 6))
+    image[6, 1] = 5
+    image[2, 3] = 3
+    pooled = downsampleImage(image)
+    assert pooled.shape == (4, 3)
+    assert pooled[3, 0] == 5
+    assert pooled[1, 1] == 3
+    assert pooled.sum() == 8
+
+
+def test_getLevelForScale():
+    pyramid = ImagePyramid(np.zeros((1024, 512)), min_size=64)
+    assert pyramid.max_level == 3
+    assert pyramid.getLevelForScale(0.5) == 0
+    assert pyramid.getLevelForScale(2.5) == 1
+    assert pyramid.getLevelForScale(100) == 3
+    assert pyramid.getLevel(2).shape == (256, 128)
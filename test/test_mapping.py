@@ -0,0 +1,90 @@
+import inspect
+
+import numpy as np
+import pytest
+import xrayutilities as xu
+
+from imageanalysis.mapping import DetectorQBasis, WAVELENGTH_ENERGY
+
+
+# Geometry of the sample project
+SAMPLE_CIRCLE_DIRS = ["x+", "z-", "y+", "z-"]
+DETECTOR_CIRCLE_DIRS = ["x+", "z-"]
+N_CHANNELS = (487, 195)
+CENTER_CHANNEL = (252, 107)
+PIXEL_WIDTH = (83.764 / 487, 33.54 / 195)
+DISTANCE = 900.644
+
+
+@pytest.fixture
+def reshape_copy(monkeypatch):
+    # Releases of xrayutilities written for NumPy 2 pass copy=False to
+    # reshape, which older NumPy does not accept. Reshaping already returns
+    # a view whenever one is possible.
+    if "copy" in inspect.signature(np.reshape).parameters:
+        return
+    reshape = np.reshape
+
+    def reshapeWithCopy(a, *args, copy=None, **kwargs):
+        return reshape(a, *args, **kwargs)
+
+    monkeypatch.setattr(np, "reshape", reshapeWithCopy)
+
+
+def createBasis(roi=None, binning=1, dtype=np.float64):
+    return DetectorQBasis(
+        SAMPLE_CIRCLE_DIRS, DETECTOR_CIRCLE_DIRS, [0, 1, 0], "z-", "x-",
+        CENTER_CHANNEL, N_CHANNELS, PIXEL_WIDTH, DISTANCE, roi, binning,
+        dtype
+    )
+
+
+def test_DetectorQBasis():
+    basis = createBasis()
+    assert basis.pixel_dirs.shape == (487, 195, 3)
+    assert createBasis([101, 301, 48, 150], binning=4).shape == (50, 26)
+
+    # Direct beam has no momentum transfer
+    hkl = basis.getHKL(np.zeros(4), np.zeros(2), 10000, np.eye(3))
+    assert hkl.shape == (1, 487, 195, 3)
+    assert np.allclose(hkl[0, 252, 107], 0)
+
+    # Center pixel scatters by the detector angle
+    delta = 30.0
+    hkl = basis.getHKL(np.zeros(4), [0, delta], 10000, np.eye(3))
+    k_0 = 2 * np.pi * 10000 / WAVELENGTH_ENERGY
+    q = 2 * k_0 * np.sin(np.radians(delta / 2))
+    assert np.isclose(np.linalg.norm(hkl[0, 252, 107]), q)
+
+
+def test_DetectorQBasis_xrayutilities(reshape_copy):
+    rng = np.random.default_rng(0)
+    sample_angles = rng.uniform(-30, 30, (3, 4))
+    detector_angles = rng.uniform(-5, 40, (3, 2))
+    ub = np.array([[1.5, 0.1, 0.02], [-0.05, 1.6, 0.1], [0.03, -0.02, 1.4]])
+    roi, binning = [100, 301, 48, 150], 3
+
+    q_conv = xu.experiment.QConversion(
+        SAMPLE_CIRCLE_DIRS, DETECTOR_CIRCLE_DIRS, [0, 1, 0]
+    )
+    hxrd = xu.HXRD([0, 1, 0], [0, 0, 1], en=15000, qconv=q_conv)
+    hxrd.Ang2Q.init_area(
+        "z-", "x-",
+        cch1=CENTER_CHANNEL[0], cch2=CENTER_CHANNEL[1],
+        Nch1=N_CHANNELS[0], Nch2=N_CHANNELS[1],
+        pwidth1=PIXEL_WIDTH[0], pwidth2=PIXEL_WIDTH[1],
+        distance=DISTANCE, roi=roi, Nav=[binning, binning]
+    )
+    expected = np.array([
+        np.stack(hxrd.Ang2Q.area(*s, *d, UB=ub), axis=-1)
+        for s, d in zip(sample_angles, detector_angles)
+    ])
+
+    basis = createBasis(roi, binning)
+    hkl = basis.getHKL(sample_angles, detector_angles, 15000, ub)
+    assert np.allclose(hkl, expected, rtol=0, atol=1e-12)
+
+    basis = createBasis(roi, binning, dtype=np.float32)
+    hkl = basis.getHKL(sample_angles, detector_angles, 15000, ub)
+    assert hkl.dtype == np.float32
+    assert np.allclose(hkl, expected, rtol=0, atol=1e-5)
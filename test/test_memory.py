@@ -0,0 +1,66 @@
+import numpy as np
+
+from imageanalysis.memory import MemoryManager
+from imageanalysis.slicing import GridSlicer
+
+
+class FakeScan:
+    def __init__(self, seed):
+        rng = np.random.default_rng(seed)
+        self.raw_data = rng.random((4, 5, 6))
+        self.rsm = rng.random((4, 5, 6, 3))
+        self.grid_data = rng.random((3, 3, 3))
+        self.grid_coords = [np.linspace(0, 1, 3)] * 3
+        self.grid_slicer = GridSlicer(self.grid_data, self.grid_coords)
+        self.grid_params = {"H": {"min": 0, "max": 1, "n": 3}}
+        self.loads = 0
+
+    def loadRawData(self):
+        self.loads += 1
+        self.raw_data = np.zeros((4, 5, 6))
+
+
+def test_spill(tmp_path):
+    scans = [FakeScan(0), FakeScan(1)]
+    raw_data = scans[0].raw_data.copy()
+    grid_data = scans[0].grid_data.copy()
+    unloads = []
+    callbacks = [lambda scan=scan: unloads.append(scan) for scan in scans]
+    manager = MemoryManager(cache_dir=str(tmp_path))
+    for scan, callback in zip(scans, callbacks):
+        manager.register(scan, callback)
+    manager.activate(scans[0])
+    manager.activate(scans[1])
+    assert unloads == []
+    manager.setBudget(manager.getUsage(scans[1]))
+
+    # Inactive scan is unloaded and spilled
+    assert unloads == [scans[0]]
+    assert manager.isEvicted(scans[0])
+    assert scans[0].raw_data is None and scans[0].grid_slicer is None
+    assert manager.getUsage(scans[0]) == 0
+    assert len(list(tmp_path.iterdir())) == 3
+
+    manager.activate(scans[0])
+    assert np.array_equal(scans[0].raw_data, raw_data)
+    assert np.array_equal(scans[0].grid_slicer.data, grid_data)
+    assert manager.isEvicted(scans[1])
+
+    # Released scans keep their RSM for the project
+    manager.unregister(scans[1], callbacks[1])
+    assert scans[1].rsm is not None and scans[1].raw_data is None
+    assert len(list(tmp_path.iterdir())) == 0
+
+
+def test_drop():
+    scans = [FakeScan(0), FakeScan(1)]
+    manager = MemoryManager(spill=False)
+    scans[0].rsm, scans[0].grid_data, scans[0].grid_slicer = None, None, None
+    for scan in scans:
+        manager.register(scan, lambda: None)
+    manager.activate(scans[1])
+    manager.setBudget(manager.getUsage(scans[1]))
+    assert scans[0].raw_data is None and manager.cache_dir is None
+
+    manager.activate(scans[0])
+    assert scans[0].loads == 1 and scans[0].raw_data is not None
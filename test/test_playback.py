@@ -0,0 +1,36 @@
+import numpy as np
+
+from imageanalysis.ui.data_view.playback import FrameProducer
+
+
+def test_FrameProducer():
+    data = np.arange(5 * 3 * 4).reshape(5, 3, 4)
+    producer = FrameProducer(
+        getFrame=lambda index: data[:, :, index],
+        n_frames=4,
+        start_index=2,
+        loop=False
+    )
+    producer.start()
+    items = []
+    while True:
+        item = producer.buffer.get(timeout=5)
+        if item is None:
+            break
+        items.append(item)
+    producer.join(timeout=5)
+
+    assert [(step, index) for step, index, _ in items] == [(0, 2), (1, 3)]
+    assert items[0][2].flags["C_CONTIGUOUS"]
+    assert np.array_equal(items[1][2], data[:, :, 3])
+
+
+def test_seek():
+    producer = FrameProducer(
+        getFrame=lambda index: np.zeros((2, 2)),
+        n_frames=10,
+        start_index=0
+    )
+    producer.seek(7)
+    assert producer.getIndex(producer.step) == 7
+    assert producer.getIndex(12) == 2
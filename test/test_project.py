@@ -1,3 +1,6 @@
+import os
+import shutil
+
 import pytest
 
 from imageanalysis.structures import Project
@@ -11,6 +14,18 @@ def test_project_creation_success():
     )
 
 
+def test_project_creation_with_scan_dirs():
+    # Scan directories from a ProjectIndex are used instead of listing
+    p = Project(
+        project_path="sample_project/",
+        spec_path="sample_project/pmn_pt011_2_1.spec",
+        instrument_path="sample_project/6IDB_Instrument.xml",
+        detector_path="sample_project/6IDB_DetectorGeometry.xml",
+        scan_dirs={"S840"}
+    )
+    assert list(p.scans.keys()) == [840]
+
+
 def test_project_creation_empty_project_path():
     with pytest.raises(ValueError) as ex_info:
         p = Project(
@@ -127,3 +142,43 @@ def test_project_creation_nonstring_detector_path():
             instrument_path="sample_project/6IDB_Instrument.xml",
             detector_path="INVALID_PATH_STRING"
         )
+
+
+def test_project_update(tmp_path):
+    with open("sample_project/pmn_pt011_2_1.spec") as f:
+        text = f.read()
+    start = text.index("#S 840")
+    middle = text.index("\n", text.index("#L", start) + 2000) + 1
+
+    for name in ["6IDB_Instrument.xml", "6IDB_DetectorGeometry.xml"]:
+        shutil.copy(f"sample_project/{name}", tmp_path)
+    spec_path = str(tmp_path / "pmn_pt011_2_1.spec")
+    with open(spec_path, "w") as f:
+        f.write(text[:start])
+    os.makedirs(tmp_path / "images" / "pmn_pt011_2_1" / "S839")
+
+    p = Project(
+        project_path=str(tmp_path),
+        spec_path=spec_path,
+        instrument_path=str(tmp_path / "6IDB_Instrument.xml"),
+        detector_path=str(tmp_path / "6IDB_DetectorGeometry.xml")
+    )
+    assert list(p.scans.keys()) == [839]
+    scan = p.scans[839]
+
+    # Scans are added once their images appear
+    with open(spec_path, "a") as f:
+        f.write(text[start:middle])
+    assert p.update() == []
+    os.makedirs(tmp_path / "images" / "pmn_pt011_2_1" / "S840")
+    new_scans = p.update()
+    assert [s.number for s in new_scans] == ["840"]
+    assert 0 < new_scans[0].n_pts < 401
+
+    # Acquiring scans are reindexed, existing scans are kept
+    with open(spec_path, "a") as f:
+        f.write(text[middle:])
+    assert p.update() == []
+    assert p.scans[839] is scan
+    assert p.scans[840].n_pts == 401
+    assert len(p.scans[840].spec_scan.data["H"]) == 401
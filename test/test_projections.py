@@ -0,0 +1,38 @@
+import numpy as np
+
+from imageanalysis.projections import Projections, createProjections
+
+
+def test_createProjections():
+    data = np.random.default_rng(0).random((10, 12, 14))
+    projections = createProjections(data, max_block_bytes=3 * 12 * 14 * 8)
+    for dim in range(3):
+        assert np.array_equal(
+            projections.getProjection("max", dim), data.max(axis=dim)
+        )
+        assert np.allclose(
+            projections.getProjection("sum", dim), data.sum(axis=dim)
+        )
+
+
+def test_getImage():
+    data = np.random.default_rng(0).random((4, 5, 6))
+    projections = Projections()
+    for frame in data:
+        projections.update(frame[np.newaxis])
+    for dim_order in [(0, 1, 2), (2, 0, 1), (1, 2, 0), (2, 1, 0)]:
+        expected = np.transpose(data, dim_order).max(axis=2)
+        assert np.array_equal(
+            projections.getImage("max", dim_order), expected
+        )
+
+
+def test_empty_projections():
+    # Projections of no frames keep the shape of the frames
+    projections = createProjections(np.zeros((0, 5, 6)))
+    for calculation in ["max", "sum"]:
+        assert np.array_equal(
+            projections.getProjection(calculation, 0), np.zeros((5, 6))
+        )
+        assert projections.getProjection(calculation, 1).shape == (0, 6)
+        assert projections.getImage(calculation, (1, 0, 2)).shape == (5, 0)
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from imageanalysis.roi import apply, applyToScans, BoxROI, \
+    createPolygonMask, LineROI, PolygonROI, RadialROI, reduceMaskedStack
+from imageanalysis.structures import Project
+
+
+def test_polygon_mask_square():
+    mask = createPolygonMask([(2, 3), (6, 3), (6, 8), (2, 8)], (10, 10))
+    expected = np.zeros((10, 10), dtype=bool)
+    expected[2:6, 3:8] = True
+    assert np.array_equal(mask, expected)
+
+
+def test_polygon_mask_outside_image():
+    mask = createPolygonMask([(-5, -5), (-1, -5), (-1, -1)], (10, 10))
+    assert not np.any(mask)
+
+
+def test_polygon_mask_too_few_vertices():
+    mask = createPolygonMask([(0, 0), (5, 5)], (10, 10))
+    assert not np.any(mask)
+
+
+def test_reduce_masked_stack():
+    stack = np.random.default_rng(0).random((5, 10, 10))
+    mask = createPolygonMask([(1, 1), (9, 2), (4, 9)], (10, 10))
+    masked = np.where(mask, stack, np.nan).reshape(5, -1)
+    assert np.allclose(
+        reduceMaskedStack(stack, mask, "sum"), np.nansum(masked, axis=1)
+    )
+    assert np.allclose(
+        reduceMaskedStack(stack, mask, "mean"), np.nanmean(masked, axis=1)
+    )
+    assert np.allclose(
+        reduceMaskedStack(stack, mask, "max"), np.nanmax(masked, axis=1)
+    )
+
+
+def test_reduce_masked_stack_invalid_calculation():
+    with pytest.raises(ValueError) as ex_info:
+        reduceMaskedStack(np.zeros((2, 3, 3)), np.ones((3, 3), bool), "median")
+
+
+def test_apply_box_roi():
+    volume = np.random.default_rng(0).random((10, 12, 4))
+    curve = apply(BoxROI((2, 5), (3, 9)), volume)
+    assert np.allclose(curve.data, volume[2:5, 3:9].sum(axis=(0, 1)))
+    assert curve.labels == ["x", "y", "z"]
+    assert len(curve.coords[2]) == 4
+
+
+def test_apply_box_roi_dim_order():
+    volume = np.random.default_rng(0).random((10, 12, 4))
+    curve = apply(BoxROI((0, 2), (1, 3), dim_order=(2, 0, 1)), volume)
+    assert np.allclose(curve.data, volume[1:3, :, 0:2].sum(axis=(0, 2)))
+
+
+def test_apply_line_roi_index():
+    volume = np.random.default_rng(0).random((10, 12, 4))
+    curve = apply(LineROI((0, 2), (8, 2), index=1), volume)
+    assert np.allclose(curve.data, volume[0:8, 2, 1])
+
+
+def test_apply_with_coordinates():
+    volume = np.random.default_rng(0).random((10, 10, 3))
+    coords = [np.linspace(-1, 1, 10), np.linspace(0, 2, 10), [0, 1, 2]]
+    roi = PolygonROI([(-1, 0), (1, 0), (1, 2), (-1, 2)], calculation="max")
+    curve = apply(roi, volume, coords=coords, labels=["H", "K", "L"])
+
+    # Mask is half-open, so the last row and column are outside, as in BoxROI
+    mask = roi.getMask(coords[0], coords[1])
+    assert np.count_nonzero(mask) == 81 and np.all(mask[:9, :9])
+    assert np.allclose(curve.data, volume[mask].max(axis=0))
+
+
+def test_radial_roi_ring_mask():
+    coords = np.arange(21)
+    mask = RadialROI((10, 10), 6, inner_radius=3).getMask(coords, coords)
+    assert not mask[10, 10]
+    assert mask[10, 15]
+    assert not mask[10, 19]
+
+
+def test_roi_invalid_dim_order():
+    with pytest.raises(ValueError) as ex_info:
+        BoxROI((0, 1), (0, 1), dim_order=(0, 0, 1))
+
+
+def test_applyToScans_keeps_grid_params(monkeypatch):
+    scan = Project(
+        project_path="sample_project/",
+        spec_path="sample_project/pmn_pt011_2_1.spec",
+        instrument_path="sample_project/6IDB_Instrument.xml",
+        detector_path="sample_project/6IDB_DetectorGeometry.xml"
+    ).scans[839]
+    rng = np.random.default_rng(0)
+
+    def loadRawData():
+        scan.raw_data = rng.random((6, 8, 7))
+
+    def map():
+        scan.rsm = rng.random((6, 8, 7, 3))
+        scan._setDefaultGridParameters()
+
+    monkeypatch.setattr(scan, "loadRawData", loadRawData)
+    monkeypatch.setattr(scan, "map", map)
+    scan.setGridSize(6, 6, 6)
+    scan.setGridBounds(0.0, 1.0, 0.0, 1.0, 0.0, 1.0)
+
+    # Data loaded for the ROI is gridded with the scan's grid parameters
+    curve = applyToScans(BoxROI((0, 6), (0, 6)), [scan], "gridded")[0]
+    assert len(curve.data) == 6
+    assert scan.grid_params["H"] == {"min": 0.0, "max": 1.0, "n": 6}
+    assert scan.rsm is None and scan.grid_data is None
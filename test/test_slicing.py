@@ -0,0 +1,98 @@
+import logging
+
+import numpy as np
+
+from imageanalysis.slicing import GridSlicer, ObliqueSlicer, getOffsetRange
+
+
+def test_getSlice():
+    data = np.random.default_rng(0).random((4, 5, 6))
+    slicer = GridSlicer(data)
+    for dim_order in [(0, 1, 2), (2, 0, 1), (1, 2, 0)]:
+        expected = np.transpose(data, dim_order)
+        for i in range(expected.shape[2]):
+            assert np.array_equal(
+                slicer.getSlice(dim_order, i), expected[:, :, i]
+            )
+
+
+def test_setActiveOrder(caplog):
+    data = np.random.default_rng(0).random((4, 5, 6))
+    slicer = GridSlicer(data)
+    slicer.setActiveOrder((2, 0, 1))
+    assert slicer.contiguous_stack.flags["C_CONTIGUOUS"]
+    assert slicer.getSlice((2, 0, 1), 3).flags["C_CONTIGUOUS"]
+    assert np.array_equal(slicer.getSlice((2, 0, 1), 3), data[:, 3, :].T)
+
+    # Views of the original data are used above the size limit
+    slicer = GridSlicer(data, max_contiguous_bytes=data.nbytes - 1)
+    with caplog.at_level(logging.INFO, logger="imageanalysis.slicing"):
+        slicer.setActiveOrder((0, 1, 2))
+        slicer.setActiveOrder((2, 0, 1))
+    assert slicer.contiguous_stack is None
+    assert np.shares_memory(slicer.getSlice((0, 1, 2), 0), data)
+    assert len(caplog.records) == 1
+
+
+def test_setActiveOrder_background():
+    data = np.random.default_rng(0).random((4, 5, 6))
+    slicer = GridSlicer(data)
+
+    # Copies of orders that are no longer active are not kept
+    slicer.setActiveOrder((2, 0, 1), background=True)
+    slicer.setActiveOrder((1, 2, 0), background=True)
+    slicer.copy_future.result()
+    assert slicer.contiguous_order == (1, 2, 0)
+    assert slicer.getSlice((1, 2, 0), 2).flags["C_CONTIGUOUS"]
+    assert np.array_equal(slicer.getSlice((1, 2, 0), 2), data[2])
+    assert np.shares_memory(slicer.getSlice((2, 0, 1), 0), data)
+
+
+def test_getValue():
+    data = np.random.default_rng(0).random((4, 5, 6))
+    slicer = GridSlicer(data)
+    for dim_order in [(0, 1, 2), (2, 0, 1), (1, 2, 0)]:
+        view = np.transpose(data, dim_order)
+        assert slicer.getValue(dim_order, 1, 2, 3) == view[1, 2, 3]
+
+
+def test_ObliqueSlicer():
+    coords = [np.linspace(0, 1, 6), np.linspace(-1, 1, 5), np.linspace(2, 3, 4)]
+    data = np.random.default_rng(0).random((6, 5, 4))
+    slicer = ObliqueSlicer(data, coords, max_chunk_points=7)
+
+    # Planes along a grid axis match axis-aligned slices
+    plane = slicer.getPlane((0, 0, 1), coords[2][2])
+    assert plane.shape == (6, 5)
+    assert np.allclose(slicer.getImage(plane), data[:, :, 2])
+    assert slicer.getImage(plane) is slicer.getImage(plane)
+
+    # Trilinear interpolation is exact for linear data
+    h, k, l = np.meshgrid(*coords, indexing="ij")
+    slicer = ObliqueSlicer(2 * h - k + 3 * l, coords, fill_value=np.nan)
+    plane = slicer.getPlane((1, 1, 1), 2.2)
+    image = slicer.getImage(plane)
+    hkl = np.array([
+        [plane.getHKL(i, j) for j in range(plane.shape[1])]
+        for i in range(plane.shape[0])
+    ])
+    inside = np.isfinite(image)
+    assert inside.any() and not inside.all()
+    assert np.allclose(image[inside], (hkl @ [2, -1, 3])[inside])
+    assert np.allclose(hkl @ [1, 1, 1], 2.2)
+
+    # Fortran ordered and strided grids interpolate the same values
+    points = hkl.reshape(-1, 3)
+    expected = slicer.interpolate(points)
+    linear = 2 * h - k + 3 * l
+    strided = np.pad(linear, 1)[1:-1, 1:-1, 1:-1]
+    for layout in [np.asfortranarray(linear), strided]:
+        slicer = ObliqueSlicer(layout, coords, fill_value=np.nan)
+        values = slicer.interpolate(points)
+        assert np.allclose(values, expected, equal_nan=True)
+
+
+def test_getOffsetRange():
+    coords = [np.linspace(0, 1, 6), np.linspace(-1, 1, 5), np.linspace(2, 3, 4)]
+    assert getOffsetRange((0, 0, 1), coords) == (2.0, 3.0)
+    assert getOffsetRange((1, -1, 0), coords) == (-1.0, 2.0)
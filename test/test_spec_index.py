@@ -0,0 +1,53 @@
+import os
+import shutil
+
+from spec2nexus import spec
+
+from imageanalysis.spec_index import LazySpecScan, SpecFileIndex
+
+
+SPEC_PATH = "sample_project/pmn_pt011_2_1.spec"
+
+
+def test_getScan(tmp_path):
+    path = shutil.copy(SPEC_PATH, tmp_path)
+    spec_data = spec.SpecDataFile(path)
+    index = SpecFileIndex(path)
+
+    assert index.getScanNumbers() == spec_data.getScanNumbers()
+    for n in spec_data.getScanNumbers():
+        expected, scan = spec_data.getScan(n), index.getScan(n)
+        assert scan.raw == expected.raw
+        assert scan.header.raw == expected.header.raw
+        assert scan.scanCmd == index.getScanCommand(n) == expected.scanCmd
+        assert index.getNumberOfPoints(n) == len(expected.data[expected.L[0]])
+        assert scan.positioner == expected.positioner
+
+    # Lazy scans are only parsed for attributes missing from the index
+    index = SpecFileIndex(path)
+    lazy_scan = LazySpecScan(index, "840")
+    assert lazy_scan.n_pts == 401 and index.parsed == {}
+    assert lazy_scan.L == spec_data.getScan("840").L
+    assert "840" in index.parsed
+
+
+def test_update(tmp_path):
+    path = shutil.copy(SPEC_PATH, tmp_path)
+    index = SpecFileIndex(path)
+    assert os.path.exists(path + ".index.json")
+
+    # Saved index is reused without reading the SPEC file
+    saved = SpecFileIndex(path)
+    assert saved.scans == index.scans and saved.headers == index.headers
+
+    # Appended scans are indexed, repeated numbers are suffixed
+    with open(SPEC_PATH) as f:
+        text = f.read()
+    last_scan = text[text.index("#S 840"):]
+    with open(path, "a") as f:
+        f.write("\n" + last_scan)
+    assert saved.update()
+    assert saved.getScanNumbers() == ["839", "840", "840.1"]
+    assert saved.getScan("840.1").scanNum == "840.1"
+    assert saved.scans == SpecFileIndex(path, persist=False).scans
+    assert not saved.update()
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+
+def test_deferred_imports():
+    # Heavy dependencies are imported when first used, not at startup
+    script = (
+        "import sys\n"
+        "import imageanalysis.app\n"
+        "modules = ['PIL', 'rsMap3D', 'sklearn', 'spec2nexus', 'tifffile', "
+        "'vtk', 'xrayutilities']\n"
+        "print([m for m in modules if m in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    assert result.stdout.strip() == "[]"
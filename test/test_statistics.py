@@ -0,0 +1,30 @@
+import numpy as np
+
+from imageanalysis.statistics import DataStatistics, computeStatistics
+
+
+def test_computeStatistics():
+    data = np.random.default_rng(0).exponential(10, size=(20, 30, 40))
+    data[:, :5] = 0
+    statistics = computeStatistics(data, max_samples=5000)
+    assert statistics.min == 0
+    assert statistics.max == data.max()
+    assert len(statistics.getSample()) <= 5000
+
+    # Sampled percentiles of nonzero values are close to exact ones
+    expected = np.percentile(data[data > 0], 99)
+    assert abs(statistics.getPercentile(99) - expected) / expected < 0.1
+
+    counts, bin_edges = statistics.getHistogram()
+    assert counts.sum() == len(statistics.getSample())
+    assert len(bin_edges) == len(counts) + 1
+
+
+def test_update():
+    data = np.random.default_rng(0).random((5, 10, 10))
+    statistics = DataStatistics()
+    for frame in data:
+        statistics.update(frame.T)
+    assert statistics.min == data.min()
+    assert statistics.max == data.max()
+    assert statistics.getPercentile(50) == np.percentile(data, 50)